@@ -9,6 +9,9 @@ from config import defaults as app_defaults
 from experiment_manager import ExperimentManager
 from timeit import default_timer as timer
 from simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+from simulation.event_dispatcher import EventDispatcher
+from simulation.area import Area
+from output_formatter import OutputFormatter
 
 
 def start_simulation_run(config, disable_output, disable_statistics = False):
@@ -20,9 +23,11 @@ def start_simulation_run(config, disable_output, disable_statistics = False):
 	#	It handles the rest.
 	experiment_manager = ExperimentManager(config, disable_output=disable_output, disable_statistics=disable_statistics)
 	if experiment_manager.validation_errors:
-		return
+		return None
 	experiment_manager.run_all()
 
+	return experiment_manager
+
 def run_experiments(config):
 	pass
 
@@ -37,7 +42,7 @@ if __name__ == '__main__':
 	parser.add_argument('-a', '--algorithm',
 		help='The algorithm to use.',
 		type=str,
-		choices=['greedy', 'priority', 'dynamic'],
+		choices=['greedy', 'priority', 'dynamic', 'savings'],
 		default=app_defaults['ALGORITHM']
 	)
 
@@ -54,6 +59,13 @@ if __name__ == '__main__':
 		type=int
 	)
 
+	# planned routes kept for recurring service sets
+	parser.add_argument('-rm', '--route-memo-size',
+		help='Set the number of planned routes kept for recurring service sets, 0 to disable',
+		default=app_defaults['ROUTE_MEMO_SIZE'],
+		type=int
+	)
+
 	# time benchmark (useful for external statistics)
 	parser.add_argument('-b', '--benchmark',
 		help='Benchmark the algorithm\s run time',
@@ -78,6 +90,86 @@ if __name__ == '__main__':
 		default=app_defaults['DYNAMIC_THRESHOLD']
 	)
 
+	# time for shortening routes after the algorithm
+	parser.add_argument('-ib', '--improvement-budget',
+		help='Time (ms) per route for shortening it with 2-opt and Or-opt, 0 to disable',
+		type=float,
+		default=app_defaults['IMPROVEMENT_BUDGET']
+	)
+
+	# how shortest paths are computed - on demand/all pairs up front
+	parser.add_argument('-sp', '--shortest-paths',
+		help='How shortest paths between locations are computed.',
+		type=str,
+		choices=['point', 'dijkstra', 'floyd_warshall', 'lazy', 'landmarks', 'auto'],
+		default=app_defaults['SHORTEST_PATHS']
+	)
+
+	# landmarks for goal directed (A*) shortest paths in large areas
+	parser.add_argument('-lm', '--landmarks',
+		help='Number of landmarks bounding A* shortest paths (-sp landmarks, or auto for large areas)',
+		type=int,
+		default=app_defaults['LANDMARKS']
+	)
+
+	parser.add_argument('-bi', '--bidirectional',
+		help='Search landmark shortest paths from both ends',
+		action='store_true'
+	)
+
+	# directory where shortest paths are saved, for later runs on the same map
+	parser.add_argument('-pc', '--persistent-cache',
+		help='Save shortest paths computed up front to this directory and load them in later runs',
+		type=str,
+		default=app_defaults['PERSISTENT_CACHE_DIR']
+	)
+
+	# event queue used by the dispatcher - sorted list/binary heap/calendar queue
+	parser.add_argument('-q', '--queue',
+		help='The event queue to use.',
+		type=str,
+		choices=['sorted', 'heap', 'calendar'],
+		default=app_defaults['QUEUE']
+	)
+
+	# events at the current time skip the event queue
+	parser.add_argument('-iq', '--immediate-queue',
+		help='Keep events at the current time in a separate FIFO queue',
+		action='store_true'
+	)
+
+	# emit informational events even if nothing is listening to them
+	parser.add_argument('-ae', '--all-events',
+		help='Emit all events, even those no observer is interested in',
+		action='store_true'
+	)
+
+	# one disposal event per area for exponential delays
+	parser.add_argument('-sd', '--superposed-disposals',
+		help='With exponential disposal delays (shape 1), keep one disposal event for all bins of an area',
+		action='store_true'
+	)
+
+	# output the locations passed between bins
+	parser.add_argument('-wp', '--waypoints',
+		help='Also output the locations the lorry passes on the way to a bin or the depot',
+		action='store_true'
+	)
+
+	# keep the unserved route after the lorry has to go to the depot
+	parser.add_argument('-ir', '--incremental-replanning',
+		help='After a trip to the depot when the lorry is full, keep the rest of the route and only add new bins',
+		action='store_true'
+	)
+
+	# disposal mode - every bag/aggregated bag arrivals/timelines until the stop time
+	parser.add_argument('-dm', '--disposal-mode',
+		help='How disposals are simulated. Aggregated/timeline are only used without detailed output.',
+		type=str,
+		choices=['per_bag', 'aggregated', 'timeline'],
+		default=app_defaults['DISPOSAL_MODE']
+	)
+
 	args = parser.parse_args()
 
 	file_path = args.file_name
@@ -86,7 +178,25 @@ if __name__ == '__main__':
 	DijkstraRoutePlanner.ALGORITHM = args.algorithm
 	DijkstraRoutePlanner.CACHE_ENABLED = not args.disable_cache
 	DijkstraRoutePlanner.CACHE_MAX_SIZE = args.cache_size
+	DijkstraRoutePlanner.ROUTE_MEMO_SIZE = args.route_memo_size
 	DijkstraRoutePlanner.DYNAMIC_BINS_THRESHOLD = args.dynamic_threshold
+	DijkstraRoutePlanner.IMPROVEMENT_BUDGET = args.improvement_budget
+	DijkstraRoutePlanner.SHORTEST_PATHS = args.shortest_paths
+	DijkstraRoutePlanner.PERSISTENT_CACHE_DIR = args.persistent_cache
+	DijkstraRoutePlanner.LANDMARKS = args.landmarks
+	DijkstraRoutePlanner.LANDMARKS_BIDIRECTIONAL = args.bidirectional
+
+	# set event dispatcher options
+	EventDispatcher.QUEUE = args.queue
+	EventDispatcher.IMMEDIATE_QUEUE_ENABLED = args.immediate_queue
+
+	# set simulation options
+	Area.EMIT_UNOBSERVED_EVENTS = args.all_events
+	Area.DISPOSAL_MODE = args.disposal_mode
+	Area.INCREMENTAL_REPLANNING = args.incremental_replanning
+	Area.SUPERPOSITION_ENABLED = args.superposed_disposals
+
+	OutputFormatter.WAYPOINTS_ENABLED = args.waypoints
 
 	# create the parser
 	parser = InputParser(file_path)
@@ -105,10 +215,11 @@ if __name__ == '__main__':
 		start_time = timer()
 
 	# start the simulation here
+	experiment_manager = None
 	try:
 		if args.disable_output and not args.benchmark_only:
 			print('Detailed output disabled by user')
-		start_simulation_run(parser.config, args.disable_output or args.benchmark_only,
+		experiment_manager = start_simulation_run(parser.config, args.disable_output or args.benchmark_only,
 			args.benchmark_only)
 	except KeyboardInterrupt:
 		print('\nApplication terminated by user.')
@@ -121,4 +232,72 @@ if __name__ == '__main__':
 		if args.benchmark_only:	
 			print(runtime)
 		else:
-			print('Total application runtime: {0} seconds'.format(runtime))
\ No newline at end of file
+			print('Total application runtime: {0} seconds'.format(runtime))
+
+			# event loop counters, over all runs
+			if experiment_manager is not None and len(experiment_manager.run_counters) != 0:
+				counters = experiment_manager.run_counters
+				print('Events processed: {0}, peak event queue length: {1}, event loop time: {2} seconds'.format(
+					sum([c['events_processed'] for c in counters]),
+					max([c['peak_queue_length'] for c in counters]),
+					sum([c['wall_time'] for c in counters])
+				))
+
+			# size of the road layouts, by area
+			if experiment_manager is not None:
+				for area in experiment_manager.simulation.areas:
+					area_map = area.route_planner.area_map
+					print('Area {0} road graph: {1} locations, {2} roads, {3:.1f} KB{4}'.format(
+						area.area_idx, len(area_map), area_map.no_roads(), area_map.nbytes() / 1024.0,
+						', symmetric' if area_map.symmetric else ''
+					))
+
+			# size of the shortest paths computed up front, by area
+			if experiment_manager is not None:
+				for area in experiment_manager.simulation.areas:
+					distances = area.route_planner.distances
+					if distances is None:
+						continue
+
+					print('Area {0} distances: {1:.1f} KB{2}'.format(
+						area.area_idx, distances.nbytes / 1024.0,
+						' (upper triangle, {0})'.format(distances.packed.dtype) if area.route_planner.area_map.symmetric else ''
+					))
+
+			# landmark searches, by area, over all runs
+			if experiment_manager is not None:
+				for area in experiment_manager.simulation.areas:
+					landmarks = area.route_planner.landmarks
+					if landmarks is None:
+						continue
+
+					counters = landmarks.counters()
+					print('Area {0} landmarks: {1} landmarks ({2:.1f} KB), {3} searches visiting {4:.1f} locations on average'.format(
+						area.area_idx, counters['landmarks'], landmarks.nbytes() / 1024.0,
+						counters['searches'], counters['visited'] / float(max(1, counters['searches']))
+					))
+
+			# route cache counters, by area, over all runs
+			if experiment_manager is not None and DijkstraRoutePlanner.CACHE_ENABLED:
+				for area in experiment_manager.simulation.areas:
+					counters = area.route_planner.path_cache.counters()
+					print('Area {0} route cache: {1} hits, {2} misses, {3} evictions'.format(
+						area.area_idx, counters['hits'], counters['misses'], counters['evictions']
+					))
+
+			# route memo counters, by area, over all runs
+			if experiment_manager is not None and DijkstraRoutePlanner.ROUTE_MEMO_SIZE > 0:
+				for area in experiment_manager.simulation.areas:
+					counters = area.route_planner.route_memo.counters()
+					print('Area {0} route memo: {1} hits, {2} misses, {3} evictions'.format(
+						area.area_idx, counters['hits'], counters['misses'], counters['evictions']
+					))
+
+			# route improvement counters, by area, over all runs
+			if experiment_manager is not None and DijkstraRoutePlanner.IMPROVEMENT_BUDGET > 0:
+				for area in experiment_manager.simulation.areas:
+					counters = area.route_planner.tour_improver.counters()
+					print('Area {0} route improvement: {1} trips, saved {2:.1f} of {3:.1f} minutes ({4:.2f}%) in {5:.1f} ms'.format(
+						area.area_idx, counters['trips'], counters['length_saved'], counters['length_before'],
+						100.0 * counters['length_saved'] / max(1, counters['length_before']), 1000 * counters['time_spent']
+					))
\ No newline at end of file
@@ -7,6 +7,35 @@ Algorithms:
 	greedy - Select the bins with more garbage first
 	priority - Select the closest bins first (userful for clusters or neighborhoods)
 	dynamic - Select one of greedy | priority based on the number of bins.
+	savings - Split the bins into depot returning trips that fit the lorry,
+		  with Clarke-Wright savings
+	With -ib, the trips of every route are then shortened with 2-opt and Or-opt.
+
+Shortest paths:
+	point - Dijkstra for every pair of locations, when needed (cached)
+	dijkstra - All pairs up front, with Dijkstra from every location
+	floyd_warshall - All pairs up front, with Floyd-Warshall
+	lazy - Dijkstra to all locations from every source, when first needed
+	landmarks - A* for every pair of locations, when needed (cached), bounded
+		    by the distances to and from -lm landmarks (-bi searches from
+		    both ends)
+	auto - Landmarks for areas of over 2000 locations, otherwise
+	       Floyd-Warshall for dense areas of up to 1000 locations and
+	       Dijkstra for others
+	Paths computed up front are saved to the -pc directory, if given, and
+	loaded (memory mapped) by later runs on the same roads layout.
+
+Event queues:
+	sorted - Sorted list with binary search insertion
+	heap - Binary heap, O(log n) insertion and removal
+	calendar - Calendar queue, amortised O(1) insertion and removal
+
+Disposal modes:
+	per_bag - Every disposal is an event (default)
+	aggregated - Bag arrivals are sampled until bins overflow, bins are updated
+		     when read (only used with detailed output disabled)
+	timeline - All bag arrivals are sampled up to the stop time, bins are
+		   updated when read (only used with detailed output disabled)
 
 Allowed configuration parameters are:
 	lorryVolume - Total waste volume a lorry can accommodate (cubic metres) 
@@ -35,5 +64,12 @@ defaults = {
 	'CACHE_SIZE': 100000,
 	'ALGORITHM': 'dynamic',
 	'CACHE_STATE': True,
-	'DYNAMIC_THRESHOLD': 100
+	'ROUTE_MEMO_SIZE': 1000,
+	'DYNAMIC_THRESHOLD': 100,
+	'IMPROVEMENT_BUDGET': 0,
+	'SHORTEST_PATHS': 'auto',
+	'PERSISTENT_CACHE_DIR': None,
+	'LANDMARKS': 16,
+	'QUEUE': 'sorted',
+	'DISPOSAL_MODE': 'per_bag'
 }
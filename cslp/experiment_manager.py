@@ -48,6 +48,12 @@ class ExperimentManager:
 		self.output_formatter = OutputFormatter(self.dispatcher)
 		self.statistics_aggregator = StatisticsAggregator(self.config, self.dispatcher)
 
+		# statistics that are not printed need not be collected
+		self.statistics_aggregator.enabled = not disable_statistics
+
+		# event loop counters of every run
+		self.run_counters = []
+
 		self.validation_errors = False
 		# the simulation checks for valid configuration, see if there were any errors
 		for i in (self.simulation.validate_errors + self.simulation.validate_warnings):
@@ -95,12 +101,8 @@ class ExperimentManager:
 		self.statistics_aggregator.reset(config)
 		self.simulation.run()
 
-		while True:
-			current_time = self.dispatcher.next_event()
-
-			if current_time == False:
-				# simulation end
-				break
+		# run until the simulation ends
+		self.run_counters.append(self.dispatcher.run_until(self.stop_time))
 		
 		# print statistics
 		if not self.disable_statistics:
@@ -1,4 +1,5 @@
 import re
+from simulation.route_planning.road_graph import RoadGraph
 
 class InputParser:
 	"""
@@ -164,6 +165,7 @@ class InputParser:
 		return True
 		
 	def _parse_roads_layout(self, lineNo, lines, areaConfig):
+		# the roads of every bin, as (index, path length)
 		adj_list = []
 
 		for (current_bin, line) in enumerate(lines):
@@ -193,13 +195,10 @@ class InputParser:
 					return False
 
 				if path_length != -1 and current_bin != idx:
-					adj_list_bin.append({
-						'index': idx,
-						'path_length': path_length
-					})
+					adj_list_bin.append((idx, path_length))
 
 			adj_list.append(adj_list_bin)
-		areaConfig['roadsLayout'] = adj_list
+		areaConfig['roadsLayout'] = RoadGraph.from_rows(adj_list)
 		return True
 
 	def _check_missing_parameters(self):
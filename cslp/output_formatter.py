@@ -1,4 +1,6 @@
-class OutputFormatter:
+from simulation.event_dispatcher import Event
+
+class OutputFormatter(object):
 	"""
 		Prints simulation output to stdout.
 	"""
@@ -11,12 +13,46 @@ class OutputFormatter:
 	LORRY_ARRIVAL = "{0} -> lorry {1} arrived at location {2}.{3}"
 	LORRY_LOAD_CHANGES = "{0} -> load of lorry {1} became {2:.3f} kg and contents volume {3:.3f} m^3"
 
+	EVENT_TYPES = [
+		Event.BIN_LOAD_CHANGED,
+		Event.BIN_DISPOSAL,
+		Event.BIN_OCCUPANCY_EXCEEDED,
+		Event.BIN_OVERFLOW,
+		Event.LORRY_DEPARTURE,
+		Event.LORRY_ARRIVAL,
+		Event.LORRY_LOAD_CHANGED
+	]
+	"""Events that are outputted"""
+
+	WAYPOINTS_ENABLED = False
+	"""Whether the locations passed between route targets are outputted as well (as waypoint events)"""
+
 	def __init__(self, event_dispatcher):
-		# define the main handler
-		# 	attach to *all* areas
-		event_dispatcher.attach_observer(self._on_event, None)
+		self.event_dispatcher = event_dispatcher
+
+		# the handler is only attached while enabled, so that no
+		#	events are generated for output that is disabled
+		self._enabled = False
 		self.enabled = True
 
+	@property
+	def enabled(self):
+		return self._enabled
+
+	@enabled.setter
+	def enabled(self, enabled):
+		if enabled and not self._enabled:
+			# define the main handler
+			# 	attach to *all* areas, only for the events we output
+			event_types = OutputFormatter.EVENT_TYPES
+			if OutputFormatter.WAYPOINTS_ENABLED:
+				event_types = event_types + [Event.LORRY_WAYPOINT]
+			self.event_dispatcher.attach_observer(self._on_event, None, event_types)
+		elif not enabled and self._enabled:
+			self.event_dispatcher.remove_observer(self._on_event, None)
+
+		self._enabled = enabled
+
 	def _format_time(self, time):
 		days = int(time / 86400)
 		time = time % 86400
@@ -35,62 +71,66 @@ class OutputFormatter:
 		)
 
 	def _on_event(self, event):
-		if not self.enabled:
-			return
-		
 		event_text = None
 		time = self._format_time(event.time)
+		code = event.code
+		data = event.payload
 
-		if event.type == 'bin_load_changed':
+		if code == Event.BIN_LOAD_CHANGED:
 			event_text = OutputFormatter.BIN_LOAD_CHANGES.format(
 				time,
 				event.area_index,
-				event.data['bin_idx'],
-				event.data['bin_weight'],
-				event.data['bin_volume']
+				data[0],
+				data[2],
+				data[1]
 			)
 
-		elif event.type == 'bin_disposal':
+		elif code == Event.BIN_DISPOSAL:
 			event_text = OutputFormatter.BIN_DISPOSAL.format(
 				time,
-				event.data['bag_weight'],
+				data[1],
 				event.area_index,
-				event.data['bin_idx']
+				data[0]
 			)
-		elif event.type == 'bin_occupancy_exceeded':
+		elif code == Event.BIN_OCCUPANCY_EXCEEDED:
 			event_text = OutputFormatter.BIN_OCCUPANCY_EXCEEDED.format(
 				time,
 				event.area_index,
-				event.data['bin_idx']
+				data[0]
 			)
-		elif event.type == 'bin_overflow':
+		elif code == Event.BIN_OVERFLOW:
 			event_text = OutputFormatter.BIN_OVERFLOW.format(
 				time,
 				event.area_index,
-				event.data['bin_idx']
+				data[0]
 			)
-		elif event.type == 'lorry_departure':
+		elif code == Event.LORRY_DEPARTURE:
 			event_text = OutputFormatter.LORRY_DEPARTURE.format(
 				time,
-				event.data['lorry_idx'],
+				data[0],
 				event.area_index,
-				event.data['location']
+				data[1]
 			)
-		elif event.type == 'lorry_arrival':
+		elif code == Event.LORRY_ARRIVAL:
 			event_text = OutputFormatter.LORRY_ARRIVAL.format(
 				time,
-				event.data['lorry_idx'],
+				data[0],
 				event.area_index,
-				event.data['location']
+				data[1]
 			)
-		elif event.type == 'lorry_load_changed':
+		elif code == Event.LORRY_WAYPOINT:
+			# the lorry passes the location without stopping
+			event_text = '\n'.join([
+				OutputFormatter.LORRY_ARRIVAL.format(time, data[0], event.area_index, data[1]),
+				OutputFormatter.LORRY_DEPARTURE.format(time, data[0], event.area_index, data[1])
+			])
+		elif code == Event.LORRY_LOAD_CHANGED:
 			event_text = OutputFormatter.LORRY_LOAD_CHANGES.format(
 				time,
-				event.data['lorry_idx'],
-				event.data['lorry_weight'],
-				event.data['lorry_volume']
+				data[0],
+				data[2],
+				data[1]
 			)
 		
 		if event_text is not None:
 			print(event_text)
-		
\ No newline at end of file
@@ -1,10 +1,40 @@
-from .disposal_modeling import DisposalModeling
+from .disposal_modeling import DisposalSampler, SuperposedDisposalSampler
 from .event_dispatcher import Event
+from bisect import bisect_right
 import numpy as np
 
 class Area:
 	LORRY_SERVICE_TIME_MODIFIER = 5
 
+	EMIT_UNOBSERVED_EVENTS = False
+	"""Whether to emit informational events (e.g. load changes) that no observer is interested in"""
+
+	# names of disposal modes/enum
+	DISPOSAL_PER_BAG = 'per_bag'
+	DISPOSAL_AGGREGATED = 'aggregated'
+	DISPOSAL_TIMELINE = 'timeline'
+
+	DISPOSAL_MODE = 'per_bag'
+	"""
+		How disposals are simulated, from the above. In aggregated mode, the bag
+		arrivals of each bin are sampled up front, until it overflows, and bins
+		are only updated when read. In timeline mode, all bag arrivals until the
+		stop time are sampled on init. Both are only used if no one observes bin load changes.
+	"""
+
+	SUPERPOSITION_ENABLED = False
+	"""
+		Whether, for exponential disposal delays (shape 1), areas in per bag mode keep one
+		disposal event for all bins (a Poisson process of rate noBins * rate at random bins).
+		This samples other random numbers than per bin events, so runs differ from those without it.
+	"""
+
+	INCREMENTAL_REPLANNING = False
+	"""
+		Whether the route is replanned incrementally after a trip to the depot, when the lorry is
+		full: the unserved bins of the route are kept and only bins that need servicing since are added
+	"""
+
 	def __init__(self, config, event_dispatcher, RoutePlanner):
 		# di is the dependency injector, we use it to
 		#	use the event dispatcher and the like
@@ -13,6 +43,8 @@ class Area:
 
 		# this is injected here at runtime
 		self.event_dispatcher = event_dispatcher
+
+		self._create_disposal_sampler()
 		
 		# initialize the lorry
 		self.lorry = {
@@ -25,7 +57,10 @@ class Area:
 			'route_index': 0,
 			# if a service event fires when the lorry is busy
 			#	this tells us we need to immediately reschedule
-			'need_of_reschedule': False
+			'need_of_reschedule': False,
+			# the rest of the route, when the lorry had to go to the depot
+			#	before finishing it (with incremental replanning)
+			'unserved_route': None
 		}
 
 		# create all bins - they are simly a dictionary with
@@ -45,14 +80,46 @@ class Area:
 
 		# instantiate the injected route planner
 		self.route_planner = RoutePlanner(area_map = self.config['roadsLayout'], \
-			total_nodes = self.config['noBins'] + 1)
+			total_nodes = self.config['noBins'] + 1, \
+			lorry_capacity = (self.config['lorryVolume'], self.config['lorryMaxLoad']), \
+			depot_time = Area.LORRY_SERVICE_TIME_MODIFIER * self.config['binServiceTime'] / 60.0)
 		
-		# finally, attach an observer to repeat disposal events
-		self.event_dispatcher.attach_observer(self._event_handler, self.area_idx)
+		# finally, attach observers to the events the area handles
+		handlers = {
+			Event.BIN_DISPOSAL: self._on_bin_disposal,
+			Event.BIN_LEVEL_REACHED: self._on_bin_level_reached,
+			Event.SERVICE_TIME: self._on_service_time,
+			Event.LORRY_ARRIVAL: self._on_lorry_arrival,
+			Event.BIN_EMPTIED: self._on_bin_emptied,
+			Event.LORRY_AVAILABLE: self._on_lorry_available
+		}
+		for (event_type, handler) in handlers.items():
+			self.event_dispatcher.attach_observer(handler, self.area_idx, [event_type])
+
+		self._update_emitted_events()
+
+		# set on init, depending on the disposal mode and observers
+		self.disposal_mode = Area.DISPOSAL_PER_BAG
+		self.superposed = False
+
+	def _create_disposal_sampler(self):
+		# disposal delays and bag weights are sampled in blocks
+		self.disposal_sampler = DisposalSampler(self.config['disposalDistrShape'],
+			self.config['disposalDistrRate'], self.config['bagWeightMin'], self.config['bagWeightMax'])
+
+	def _update_emitted_events(self):
+		"""Finds which events to emit, based on the observers interested in them."""
+		# emitted_events[code] = whether to emit events of that type
+		self.emitted_events = [Area.EMIT_UNOBSERVED_EVENTS or
+			self.event_dispatcher.is_observed(self.area_idx, code) for code in xrange(len(Event.TYPES))]
+
+		# waypoints need the paths between targets expanded, so they are only emitted if observed
+		self.emitted_events[Event.LORRY_WAYPOINT] = self.event_dispatcher.is_observed(self.area_idx, Event.LORRY_WAYPOINT)
 
 	def reset(self, config):
 		"""Resets the area so to start a new simulation"""
 		self.config = config
+		self._create_disposal_sampler()
 
 		# reset all contents of bins to 0
 		for bin in self.bins[1:]:
@@ -68,45 +135,277 @@ class Area:
 		self.lorry['busy'] = False
 		self.lorry['current_route'] = None
 		self.lorry['need_of_reschedule'] = False
+		self.lorry['unserved_route'] = None
 
 	def init(self):
-		self._init_disposal_events()
+		# observers might have changed since the last run
+		self._update_emitted_events()
+
+		# bags are simulated one by one if anyone observes their effects, or if
+		#	bags take up no space (bag counts are meaningless then)
+		self.disposal_mode = Area.DISPOSAL_MODE
+		if self.emitted_events[Event.BIN_LOAD_CHANGED] or self.config['bagVolume'] <= 0:
+			self.disposal_mode = Area.DISPOSAL_PER_BAG
+
+		if self.disposal_mode == Area.DISPOSAL_PER_BAG:
+			self._init_disposal_events()
+		else:
+			self._init_bin_levels()
+
+			if self.disposal_mode == Area.DISPOSAL_TIMELINE:
+				self._init_bin_timelines()
+
+			for bin in self.bins[1:]:
+				self._start_bin_cycle(bin)
 		
 		# add first service interval
 		service_time = int(round(60 * 60 / self.config['serviceFreq'], 3))
 		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now + service_time, self.area_idx, 'service_time')
+			Event(self.event_dispatcher.now + service_time, self.area_idx, Event.SERVICE_TIME)
 		)
 
 	def _init_disposal_events(self):
+		no_bins = len(self.bins) - 1
+		self.superposed = Area.SUPERPOSITION_ENABLED and self.config['disposalDistrShape'] == 1 and no_bins > 0
+
+		if self.superposed:
+			# one disposal event for all bins, at (fractional) `superposed_time`
+			self.superposed_sampler = SuperposedDisposalSampler(no_bins, self.config['disposalDistrRate'],
+				self.config['bagWeightMin'], self.config['bagWeightMax'])
+			self.superposed_time = self.event_dispatcher.now
+			self._schedule_next_disposal(None)
+			return
+
 		for bin in self.bins:
 			if bin is not None:
 				self._schedule_next_disposal(bin)
 
-	def _schedule_next_disposal(self, bin):
-		# get the time to the next disposal event, in seconds
-		time = DisposalModeling.inv_erlang_k(self.config['disposalDistrShape'],
-			self.config['disposalDistrRate'])
-		
-		# round to three digits and convert from hours to seconds
-		# TODO: maybe export there magic numbers somewhere?
-		time = int(round(time * 60 * 60, 3))
+	def _init_bin_levels(self):
+		"""
+			Initialises aggregated/timeline disposals, finding the number of bags
+			after which bins exceed the occupancy threshold and overflow.
+		"""
+		bag_volume = self.config['bagVolume']
+		bin_volume = self.config['binVolume']
+
+		# The volume is added bag by bag as in per bag mode, so
+		#	the volumes (and rounding errors) are the same
+		# bag_volumes[n] = bin volume after n bags
+		self.bag_volumes = [0]
+		self.threshold_bags = None
+		self.overflow_bags = None
+		volume = 0
+		while self.overflow_bags is None:
+			volume = volume + bag_volume
+			self.bag_volumes.append(volume)
+
+			occupancy = round(volume / bin_volume, 3)
+			if self.threshold_bags is None and occupancy > self.config['thresholdVal']:
+				self.threshold_bags = len(self.bag_volumes) - 1
+			if occupancy > 1:
+				self.overflow_bags = len(self.bag_volumes) - 1
+
+		# the threshold might be above the overflow occupancy
+		if self.threshold_bags is None:
+			self.threshold_bags = self.overflow_bags + 1
+
+		# Per bin: the arrival times of the bags in the current cycle (until the
+		#	bin overflows, aggregated mode only), the last arrival sampled, the number
+		#	of bags in `current_weight` and the cycle number, incremented when emptied
+		no_bins = len(self.bins)
+		self.bag_arrivals = [[] for i in xrange(no_bins)]
+		self.last_arrivals = [self.event_dispatcher.now] * no_bins
+		self.bags_weighed = [0] * no_bins
+		self.bin_cycles = [0] * no_bins
+
+	def _init_bin_timelines(self):
+		"""
+			Samples the bag arrival times and weights of every bin, until the stop
+			time. Row i of the timelines is for bin i + 1.
+		"""
+		no_bins = len(self.bins) - 1
+		now = self.event_dispatcher.now
+		stop_time = self.event_dispatcher.stop_time
+
+		# start with 20% more columns than the expected number of bags until the stop time
+		mean_delay = self.config['disposalDistrShape'] / float(self.config['disposalDistrRate']) * 60 * 60
+		no_columns = int(1.2 * (stop_time - now) / mean_delay) + self.overflow_bags
+
+		times = now + np.cumsum(self.disposal_sampler.delays(no_bins * no_columns).reshape(no_bins, no_columns), axis = 1)
+		while no_bins != 0 and times[:, -1].min() <= stop_time:
+			# some bins need more bags
+			delays = self.disposal_sampler.delays(no_bins * no_columns).reshape(no_bins, no_columns)
+			times = np.hstack((times, times[:, -1:] + np.cumsum(delays, axis = 1)))
+		no_columns = times.shape[1]
+
+		# bag_weights[i, n] = total weight of the first n bags of the row
+		weights = np.array(self.disposal_sampler.bag_weights(no_bins * no_columns)).reshape(no_bins, no_columns)
+		self.bag_weights = np.zeros((no_bins, no_columns + 1))
+		self.bag_weights[:, 1:] = np.cumsum(weights, axis = 1)
+
+		self.bag_times = times
+
+		# All timelines in one sorted array, each row offset after the previous
+		#	one, so all bins are updated with one search. Row offsets are added
+		#	to the searched times and the row starts removed from the results
+		self.row_offsets = np.arange(no_bins) * (int(times.max()) + 1 if no_bins != 0 else 0)
+		self.row_starts = np.arange(no_bins) * no_columns
+		self.flat_bag_times = (times + self.row_offsets[:, np.newaxis]).ravel()
+
+		# number of bags emptied from each bin so far, for bin i at index i - 1
+		self.emptied_bags = np.zeros(no_bins, dtype = int)
+
+	def _start_bin_cycle(self, bin):
+		"""
+			Starts a new cycle of a bin (initially and after being emptied). Bags
+			disposed of while the bin was overflowed are lost.
+		"""
+		bin_idx = bin['idx']
+		now = self.event_dispatcher.now
+
+		if self.disposal_mode == Area.DISPOSAL_TIMELINE:
+			# bags that arrived up to now have been emptied
+			row = self.bag_times[bin_idx - 1]
+			first = int(np.searchsorted(row, now, side = 'right'))
+			self.emptied_bags[bin_idx - 1] = first
+
+			arrivals = row[first:first + self.overflow_bags]
+		else:
+			arrivals = self._sample_bin_cycle(bin_idx)
+
+		self.bags_weighed[bin_idx] = 0
+		self.bin_cycles[bin_idx] += 1
+
+		# report reaching the threshold and overflowing when it happens
+		levels = [
+			(Event.BIN_OCCUPANCY_EXCEEDED, self.threshold_bags),
+			(Event.BIN_OVERFLOW, self.overflow_bags)
+		]
+		for (event_code, no_bags) in levels:
+			if self.emitted_events[event_code] and no_bags <= len(arrivals):
+				self.event_dispatcher.add_event(
+					Event(int(arrivals[no_bags - 1]), self.area_idx, Event.BIN_LEVEL_REACHED,
+						(bin_idx, self.bin_cycles[bin_idx], event_code))
+				)
+
+	def _sample_bin_cycle(self, bin_idx):
+		"""
+			Samples the bag arrivals of a bin from now until it overflows,
+			continuing its disposal process. Returns the arrivals.
+		"""
+		now = self.event_dispatcher.now
+		arrivals = self.bag_arrivals[bin_idx]
+		last = self.last_arrivals[bin_idx]
+
+		# bags that arrived up to now have been emptied
+		del arrivals[:bisect_right(arrivals, now)]
+
+		# skip to the first bag after now
+		while len(arrivals) == 0 and last < now:
+			times = last + np.cumsum(self.disposal_sampler.delays(self.overflow_bags))
+			last = int(times[-1])
+			arrivals.extend(times[np.searchsorted(times, now, side='right'):].tolist())
+
+		# then sample the remaining bags, in one go. The sum of m Erlang-k delays is
+		#	Erlang-mk, but the arrivals in between are needed when the lorry reads the bin
+		missing = self.overflow_bags - len(arrivals)
+		if missing > 0:
+			arrivals.extend((last + np.cumsum(self.disposal_sampler.delays(missing))).tolist())
+			last = arrivals[-1]
+
+		self.last_arrivals[bin_idx] = last
+		return arrivals
+
+	def _set_bin_bags(self, bin, no_bags):
+		"""Sets the volume and state of a bin holding the given number of bags."""
+		bin['current_volume'] = self.bag_volumes[no_bags]
+		bin['has_exceeded_occupancy'] = no_bags >= self.threshold_bags
+		bin['has_overflowed'] = no_bags >= self.overflow_bags
+
+	def _update_bin(self, bin, weigh = False):
+		"""
+			Brings an aggregated/timeline bin up to date with the bags disposed
+			of until now. The bags' weight is only updated if `weigh` is set.
+		"""
+		bin_idx = bin['idx']
+		now = self.event_dispatcher.now
+
+		if self.disposal_mode == Area.DISPOSAL_TIMELINE:
+			first = self.emptied_bags[bin_idx - 1]
+			no_bags = int(np.searchsorted(self.bag_times[bin_idx - 1], now, side = 'right')) - first
+			no_bags = min(no_bags, self.overflow_bags)
+		else:
+			no_bags = bisect_right(self.bag_arrivals[bin_idx], now)
+
+		self._set_bin_bags(bin, no_bags)
+
+		if weigh and no_bags > self.bags_weighed[bin_idx]:
+			if self.disposal_mode == Area.DISPOSAL_TIMELINE:
+				weights = self.bag_weights[bin_idx - 1]
+				bin['current_weight'] = float(weights[first + no_bags] - weights[first])
+			else:
+				# sample the weight of all new bags at once
+				bag_weights = self.disposal_sampler.bag_weights(no_bags - self.bags_weighed[bin_idx])
+				bin['current_weight'] = sum(bag_weights, bin['current_weight'])
+
+			self.bags_weighed[bin_idx] = no_bags
+
+	def _update_bins(self):
+		"""Brings all aggregated/timeline bins up to date, except for their weight."""
+		if self.disposal_mode != Area.DISPOSAL_TIMELINE:
+			for bin in self.bins[1:]:
+				self._update_bin(bin)
+			return
+
+		# search all timelines at once
+		now = self.event_dispatcher.now
+		no_bags = np.searchsorted(self.flat_bag_times, now + self.row_offsets, side = 'right')
+		no_bags = np.minimum(no_bags - self.row_starts - self.emptied_bags, self.overflow_bags)
+
+		for (bin, bin_bags) in zip(self.bins[1:], no_bags.tolist()):
+			self._set_bin_bags(bin, bin_bags)
+
+	def _weigh_exceeded_bins(self):
+		"""Brings the weight of the aggregated/timeline bins that need servicing up to date."""
+		for bin in self.bins[1:]:
+			if bin['has_exceeded_occupancy']:
+				self._update_bin(bin, weigh = True)
 
-		bag_weight = np.random.uniform(self.config['bagWeightMin'], self.config['bagWeightMax'])
-		bag_weight = round(bag_weight, 3)
+	def _on_bin_level_reached(self, event):
+		bin_idx, cycle, event_code = event.payload
+
+		# the bin has been emptied since
+		if cycle != self.bin_cycles[bin_idx]:
+			return
+
+		bin = self.bins[bin_idx]
+		self._update_bin(bin)
+		occupancy = round(bin['current_volume'] / self.config['binVolume'], 3)
 
 		self.event_dispatcher.add_event(
-			# The event's data is the bin index & disposal volume
-			Event(self.event_dispatcher.now + time, self.area_idx, 'bin_disposal', {
-				'bin_idx': bin['idx'],
-				'bag_vol': self.config['bagVolume'],
-				'bag_weight': bag_weight
-			})
+			Event(self.event_dispatcher.now, self.area_idx, event_code, (bin_idx, occupancy))
+		)
+
+	def _schedule_next_disposal(self, bin):
+		if self.superposed:
+			# the next disposal of any bin, the given bin is irrelevant
+			delay, bin_idx, bag_weight = self.superposed_sampler.next_disposal()
+			self.superposed_time += delay
+			time = int(self.superposed_time)
+		else:
+			# get the time to the next disposal event (in seconds) and the bag weight
+			delay, bag_weight = self.disposal_sampler.next_disposal()
+			time = self.event_dispatcher.now + delay
+			bin_idx = bin['idx']
+
+		self.event_dispatcher.add_event(
+			# The event's data is the bin index & bag weight
+			Event(time, self.area_idx, Event.BIN_DISPOSAL, (bin_idx, bag_weight))
 		)
 
 	def _on_bin_disposal(self, event):
 		# add the garbage to the bin.. so to speak 
-		bin_idx = event.data['bin_idx']
+		bin_idx, bag_weight = event.payload
 		bin = self.bins[bin_idx]
 		
 		if bin['has_overflowed']:
@@ -114,47 +413,47 @@ class Area:
 			self._schedule_next_disposal(bin)
 			return
 
-		bin['current_volume'] = bin['current_volume'] + event.data['bag_vol']
-		bin['current_weight'] = bin['current_weight'] + event.data['bag_weight']
+		bin['current_volume'] = bin['current_volume'] + self.config['bagVolume']
+		bin['current_weight'] = bin['current_weight'] + bag_weight
 
 		# calculate the occupancy
 		occupancy = bin['current_volume'] / self.config['binVolume']
 		occupancy = round(occupancy, 3)
 
 		# this event will be reported by the output module
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'bin_load_changed', {
-				'bin_idx': bin_idx,
-				'bin_volume': bin['current_volume'],
-				'bin_weight': bin['current_weight']
-			})
-		)
+		if self.emitted_events[Event.BIN_LOAD_CHANGED]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.BIN_LOAD_CHANGED,
+					(bin_idx, bin['current_volume'], bin['current_weight']))
+			)
 
 		if not bin['has_exceeded_occupancy'] and occupancy > self.config['thresholdVal']:
 			# generate an occupancy exceeded event
-			self.event_dispatcher.add_event(
-				Event(self.event_dispatcher.now, self.area_idx, 'bin_occupancy_exceeded', {
-					'bin_idx': bin_idx,
-					'occupancy': occupancy
-				})
-			)
+			if self.emitted_events[Event.BIN_OCCUPANCY_EXCEEDED]:
+				self.event_dispatcher.add_event(
+					Event(self.event_dispatcher.now, self.area_idx, Event.BIN_OCCUPANCY_EXCEEDED,
+						(bin_idx, occupancy))
+				)
 
 			bin['has_exceeded_occupancy'] = True
 
 		if not bin['has_overflowed'] and occupancy > 1:
 			# generate an overflow event
-			self.event_dispatcher.add_event(
-				Event(self.event_dispatcher.now, self.area_idx, 'bin_overflow', {
-					'bin_idx': bin_idx,
-					'occupancy': occupancy
-				})
-			)
+			if self.emitted_events[Event.BIN_OVERFLOW]:
+				self.event_dispatcher.add_event(
+					Event(self.event_dispatcher.now, self.area_idx, Event.BIN_OVERFLOW,
+						(bin_idx, occupancy))
+				)
 			bin['has_overflowed'] = True
 		
 		# finally, generate the next disposal event
 		self._schedule_next_disposal(bin)
 
 	def _on_service_time(self, event, skip_service_event = False):
+		# the bins' volume is needed for the route
+		if self.disposal_mode != Area.DISPOSAL_PER_BAG:
+			self._update_bins()
+
 		# schedule next service time
 		service_time = int(round(60 * 60 / self.config['serviceFreq'], 3))
 
@@ -162,23 +461,35 @@ class Area:
 		#	immediately recheduled. In this case skip the event
 		if not skip_service_event:
 			self.event_dispatcher.add_event(
-				Event(self.event_dispatcher.now + service_time, self.area_idx, 'service_time')
+				Event(self.event_dispatcher.now + service_time, self.area_idx, Event.SERVICE_TIME)
 			)
 
 			# emit number of overflowed bins, for statistics
-			self.event_dispatcher.add_event(
-				Event(self.event_dispatcher.now, self.area_idx, 'bins_overflowed_at_service_time', {
-					'no_bins': len(filter(lambda bin: bin is not None and bin['has_overflowed'], self.bins))
-				})
-			)
+			if self.emitted_events[Event.BINS_OVERFLOWED_AT_SERVICE_TIME]:
+				self.event_dispatcher.add_event(
+					Event(self.event_dispatcher.now, self.area_idx, Event.BINS_OVERFLOWED_AT_SERVICE_TIME,
+						(len(filter(lambda bin: bin is not None and bin['has_overflowed'], self.bins)),))
+				)
 
 		if self.lorry['busy']:
 			# need to cascade this
 			self.lorry['need_of_reschedule'] = True
 			return False
 
-		# calculate the lorry's route and start it off
-		route = self.route_planner.get_route(self.bins[1:], flatten_route = True)
+		# calculate the lorry's route and start it off, continuing the
+		#	unserved route if any
+		unserved_route = self.lorry['unserved_route']
+		self.lorry['unserved_route'] = None
+
+		# the savings algorithm and incremental replanning fit bins in the lorry
+		#	by their weight, which aggregated/timeline bins only know once weighed
+		if self.disposal_mode != Area.DISPOSAL_PER_BAG and (unserved_route is not None or self.route_planner.uses_loads()):
+			self._weigh_exceeded_bins()
+
+		if unserved_route is not None:
+			route = self.route_planner.get_route_incremental(self.bins[1:], unserved_route, flatten_route = True)
+		else:
+			route = self.route_planner.get_route(self.bins[1:], flatten_route = True)
 		if route == False:
 			return
 		
@@ -187,36 +498,36 @@ class Area:
 		self.lorry['busy'] = True
 
 		# emit dispatch event
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'lorry_departure', {
-				'lorry_idx': 0,
-				'location': 0
-			})
-		)
+		if self.emitted_events[Event.LORRY_DEPARTURE]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.LORRY_DEPARTURE, (0, 0))
+			)
 
 		# schedule arrival event
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now + route[0]['distance'] * 60, self.area_idx, 'lorry_arrival', {
-				'lorry_idx': 0,
-				'location': route[0]['target']
-			})
-		)
+		self._schedule_arrival(0, route[0])
 
 	def _on_lorry_available(self, event):
-		# the lorry has now been emptied and is free
-		self.lorry['current_route'] = None
-		self.lorry['route_index'] = 0
-		self.lorry['busy'] = False
+		# the lorry has now been emptied
 		self.lorry['current_volume'] = 0
 		self.lorry['current_weight'] = 0
 
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'lorry_load_changed', {
-				'lorry_idx': 0,
-				'lorry_volume': 0,
-				'lorry_weight': 0
-			})
-		)
+		if self.emitted_events[Event.LORRY_LOAD_CHANGED]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.LORRY_LOAD_CHANGED, (0, 0, 0))
+			)
+
+		# routes planned as several trips (e.g. by the savings algorithm) continue
+		#	from the depot, unless the route has to be planned again anyway
+		route = self.lorry['current_route']
+		if route is not None and self.lorry['route_index'] + 1 < len(route) and \
+			not self.lorry['need_of_reschedule']:
+			self._start_next_trip()
+			return
+
+		# the lorry is free
+		self.lorry['current_route'] = None
+		self.lorry['route_index'] = 0
+		self.lorry['busy'] = False
 
 		# cascaded rescheduling
 		if self.lorry['need_of_reschedule']:
@@ -224,27 +535,58 @@ class Area:
 			self._on_service_time(None, skip_service_event = True)
 			
 
-	def _on_lorry_arrival(self, event):
-		data = event.data
-		if data['location'] == 0:
+	def _start_next_trip(self):
+		"""Departs from the depot to the next target of the current route."""
+		self.lorry['route_index'] += 1
+		next_target = self.lorry['current_route'][self.lorry['route_index']]
+
+		if self.emitted_events[Event.LORRY_DEPARTURE]:
 			self.event_dispatcher.add_event(
-				Event(self.event_dispatcher.now, self.area_idx, 'trip_completed', {
-					'lorry_idx': 0
-				})
+				Event(self.event_dispatcher.now, self.area_idx, Event.LORRY_DEPARTURE, (0, 0))
 			)
+		self._schedule_arrival(0, next_target)
+
+	def _schedule_arrival(self, source, step):
+		"""
+			Schedules the lorry's arrival at the target of a route step, travelling from the
+			source. If observed, also schedules passing the locations on the way (waypoints),
+			except for the depot, which the lorry only arrives at to unload.
+		"""
+		if self.emitted_events[Event.LORRY_WAYPOINT]:
+			for (location, distance) in self.route_planner.get_waypoints(source, step['target']):
+				if location == 0:
+					continue
+
+				self.event_dispatcher.add_event(
+					Event(self.event_dispatcher.now + distance * 60, self.area_idx, Event.LORRY_WAYPOINT,
+						(0, location))
+				)
+
+		self.event_dispatcher.add_event(
+			Event(self.event_dispatcher.now + step['distance'] * 60, self.area_idx, Event.LORRY_ARRIVAL,
+				(0, step['target']))
+		)
+
+	def _on_lorry_arrival(self, event):
+		location = event.payload[1]
+		if location == 0:
+			if self.emitted_events[Event.TRIP_COMPLETED]:
+				self.event_dispatcher.add_event(
+					Event(self.event_dispatcher.now, self.area_idx, Event.TRIP_COMPLETED, (0,))
+				)
 
 			# When at depot we will consider the time required to empty a lorry is also fixed
 			#	and this is five times as long as the bin service time.
 			self.event_dispatcher.add_event(
 				Event(self.event_dispatcher.now + Area.LORRY_SERVICE_TIME_MODIFIER * self.config['binServiceTime'],
-					self.area_idx, 'lorry_available', {
-					'lorry_idx': 0
-				})
+					self.area_idx, Event.LORRY_AVAILABLE, (0,))
 			)
 			return
 		
-		bin_idx = data['location']
+		bin_idx = location
 		bin = self.bins[bin_idx]
+		if self.disposal_mode != Area.DISPOSAL_PER_BAG:
+			self._update_bin(bin, weigh = True)
 
 		# if we can't empty the current bin, we go to the depot
 		if (self.config['lorryVolume'] < self.lorry['current_volume'] + bin['current_volume'] / 2.0) or \
@@ -257,38 +599,33 @@ class Area:
 		# NOTE: We empty the bin after the `binServiceTime`, if any bags are thrown in in the meantime,
 		#	the entire bin is not to be collected (see NOTE in _on_bin_emptied below)
 		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now + self.config['binServiceTime'], self.area_idx, 'bin_emptied', {
-				'lorry_idx': 0,
-				'location': data['location']
-			})
+			Event(self.event_dispatcher.now + self.config['binServiceTime'], self.area_idx, Event.BIN_EMPTIED,
+				(0, location))
 		)
 
 	def _reschedule_trip_to_depot(self, bin_idx):
 		# schedule a trip to the depot immediately and flag for reschedule
 		self.lorry['need_of_reschedule'] = True
+		if Area.INCREMENTAL_REPLANNING:
+			# the current bin was not emptied either
+			self.lorry['unserved_route'] = self.lorry['current_route'][self.lorry['route_index']:]
+
 		route = self.route_planner.get_route_to_depot(bin_idx, flatten_route = True)
 		self.lorry['current_route'] = route
 		self.lorry['route_index'] = 0
 
 		# departure/arrival events
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'lorry_departure', {
-				'lorry_idx': 0,
-				'location': bin_idx
-			})
-		)
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now + route[0]['distance'] * 60, self.area_idx, 'lorry_arrival', {
-				'lorry_idx': 0,
-				'location': route[0]['target']
-			})
-		)
+		if self.emitted_events[Event.LORRY_DEPARTURE]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.LORRY_DEPARTURE, (0, bin_idx))
+			)
+		self._schedule_arrival(bin_idx, route[0])
 
 	def _on_bin_emptied(self, event):
-		data = event.data
-
-		bin_idx = data['location']
+		bin_idx = event.payload[1]
 		bin = self.bins[bin_idx]
+		if self.disposal_mode != Area.DISPOSAL_PER_BAG:
+			self._update_bin(bin, weigh = True)
 		
 		# NOTE: This solves an edge case where a bag is disposed of while
 		#	the lorry is emptying the bin and that causes the lorry not to be
@@ -307,46 +644,25 @@ class Area:
 		bin['current_weight'] = 0
 		bin['has_exceeded_occupancy'] = False
 		bin['has_overflowed'] = False
+		if self.disposal_mode != Area.DISPOSAL_PER_BAG:
+			self._start_bin_cycle(bin)
 
 		# emit all needed events
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'bin_load_changed', {
-				'bin_idx': bin_idx,
-				'bin_volume': bin['current_volume'],
-				'bin_weight': bin['current_weight']
-			})
-		)
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'lorry_load_changed', {
-				'lorry_idx': 0,
-				'lorry_volume': self.lorry['current_volume'],
-				'lorry_weight': self.lorry['current_weight']
-			})
-		)
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now, self.area_idx, 'lorry_departure', {
-				'lorry_idx': 0,
-				'location': bin_idx
-			})
-		)
+		if self.emitted_events[Event.BIN_LOAD_CHANGED]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.BIN_LOAD_CHANGED,
+					(bin_idx, bin['current_volume'], bin['current_weight']))
+			)
+		if self.emitted_events[Event.LORRY_LOAD_CHANGED]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.LORRY_LOAD_CHANGED,
+					(0, self.lorry['current_volume'], self.lorry['current_weight']))
+			)
+		if self.emitted_events[Event.LORRY_DEPARTURE]:
+			self.event_dispatcher.add_event(
+				Event(self.event_dispatcher.now, self.area_idx, Event.LORRY_DEPARTURE, (0, bin_idx))
+			)
 
 		self.lorry['route_index'] += 1
 		next_target = self.lorry['current_route'][self.lorry['route_index']]
-		self.event_dispatcher.add_event(
-			Event(self.event_dispatcher.now + next_target['distance'] * 60, self.area_idx, 'lorry_arrival', {
-				'lorry_idx': 0,
-				'location': next_target['target']
-			})
-		)
-
-	def _event_handler(self, event):
-		if event.type == 'bin_disposal':
-			self._on_bin_disposal(event)
-		elif event.type == 'service_time':
-			self._on_service_time(event)
-		elif event.type == 'lorry_arrival':
-			self._on_lorry_arrival(event)
-		elif event.type == 'bin_emptied':
-			self._on_bin_emptied(event)
-		elif event.type == 'lorry_available':
-			self._on_lorry_available(event)
+		self._schedule_arrival(bin_idx, next_target)
@@ -0,0 +1,157 @@
+from bisect import insort
+
+class CalendarQueue:
+	"""
+		Calendar queue (R. Brown, 1988) for events with integer times.
+
+		Events are hashed into `no_buckets` buckets (days), each `width`
+		seconds long, so one pass over all buckets covers a year of
+		`no_buckets * width` seconds. As long as the bucket width is close to
+		the average separation between pending events, both insertion and
+		removal are amortised O(1). The calendar resizes itself when it grows
+		or shrinks, re-estimating the width from the pending events.
+
+		Events with the same time are removed in insertion order.
+	"""
+
+	MIN_BUCKETS = 2
+	"""The calendar is never shrunk below this number of buckets"""
+
+	SAMPLE_SIZE = 25
+	"""Number of pending events used to estimate the bucket width"""
+
+	def __init__(self, width = 1, no_buckets = MIN_BUCKETS):
+		# total number of events in the calendar
+		self.size = 0
+
+		# insertion counter, used to break ties between same-time events
+		self.sequence = 0
+
+		# the time of the last event found, where the search starts from
+		self.last_time = 0
+
+		self._build(no_buckets, width, [])
+
+	def __len__(self):
+		return self.size
+
+	def _build(self, no_buckets, width, entries):
+		"""
+			(Re)builds the calendar with the given number of buckets
+			and width, inserting the given (sorted) entries.
+		"""
+		self.no_buckets = no_buckets
+		self.width = width
+		self.buckets = [[] for i in xrange(no_buckets)]
+
+		# entries are sorted, so every bucket stays sorted
+		for entry in entries:
+			self.buckets[(entry[0] // width) % no_buckets].append(entry)
+
+		# start searching from the bucket of the last event found
+		self._move_to(self.last_time)
+
+		# resize thresholds
+		self.grow_size = 2 * no_buckets
+		self.shrink_size = no_buckets // 2 - 2
+
+	def _move_to(self, time):
+		"""Sets the current bucket to the one holding the given time."""
+		day = time // self.width
+		self.current = day % self.no_buckets
+		# exclusive end of the current bucket's day
+		self.bucket_top = (day + 1) * self.width
+
+	def _resize(self, no_buckets):
+		"""Resizes the calendar, computing a new bucket width."""
+		entries = []
+		for bucket in self.buckets:
+			entries += bucket
+		entries.sort()
+
+		self._build(no_buckets, self._estimate_width(entries), entries)
+
+	def _estimate_width(self, entries):
+		"""
+			Estimates the bucket width as three times the average separation
+			of the first pending events, ignoring outliers.
+		"""
+		times = [entry[0] for entry in entries[:CalendarQueue.SAMPLE_SIZE]]
+		if len(times) < 2:
+			return self.width
+
+		gaps = [b - a for (a, b) in zip(times, times[1:])]
+		average = sum(gaps) / float(len(gaps))
+
+		# ignore separations much larger than average
+		gaps = [gap for gap in gaps if gap <= 2 * average]
+		average = sum(gaps) / float(len(gaps))
+
+		# event times are whole seconds, so the width is at least one
+		return max(1, int(round(3 * average)))
+
+	def push(self, time, event):
+		"""Adds an event with the given (integer) time."""
+		insort(self.buckets[(time // self.width) % self.no_buckets],
+			(time, self.sequence, event))
+		self.sequence += 1
+		self.size += 1
+
+		# an event in the past of the calendar moves the search back
+		if time < self.last_time:
+			self.last_time = time
+			self._move_to(time)
+
+		if self.size > self.grow_size:
+			self._resize(2 * self.no_buckets)
+
+	def _find(self):
+		"""
+			Finds the bucket holding the earliest event and moves
+			the search there. The calendar should not be empty.
+		"""
+		i = self.current
+		top = self.bucket_top
+
+		# search the current year, one day at a time
+		for _ in xrange(self.no_buckets):
+			bucket = self.buckets[i]
+			if len(bucket) != 0 and bucket[0][0] < top:
+				self.current = i
+				self.bucket_top = top
+				self.last_time = bucket[0][0]
+				return bucket
+
+			i += 1
+			if i == self.no_buckets:
+				i = 0
+			top += self.width
+
+		# nothing in the current year, go directly to the earliest event
+		entry = min(bucket[0] for bucket in self.buckets if len(bucket) != 0)
+		self._move_to(entry[0])
+		self.last_time = entry[0]
+		return self.buckets[self.current]
+
+	def peek_time(self):
+		"""Returns the time of the earliest event, or None if empty."""
+		if self.size == 0:
+			return None
+
+		return self._find()[0][0]
+
+	def pop(self):
+		"""Removes and returns the earliest event, or None if empty."""
+		if self.size == 0:
+			return None
+
+		return self._pop_bucket(self._find())
+
+	def _pop_bucket(self, bucket):
+		entry = bucket.pop(0)
+		self.size -= 1
+
+		if self.size < self.shrink_size and self.no_buckets > CalendarQueue.MIN_BUCKETS:
+			self._resize(max(CalendarQueue.MIN_BUCKETS, self.no_buckets // 2))
+
+		return entry[2]
@@ -29,3 +29,76 @@ class DisposalModeling:
 		# multiply by the coefficient and take the log
 		# to sample from the erlang-k distribution
 		return -(1/l) * log(prod)
+
+class DisposalSampler(object):
+	"""
+		Samples disposal delays and bag weights for an area. Values are
+		drawn from numpy in blocks and served from a buffer, which is
+		refilled when empty, so most samples cost a single list pop.
+	"""
+
+	BLOCK_SIZE = 1024
+	"""Number of disposals sampled at once"""
+
+	def __init__(self, k, l, weight_min, weight_max, block_size = None):
+		# Erlang-k with rate l, i.e. a gamma distribution with
+		#	shape k and scale 1/l
+		self.k = k
+		self.scale = 1.0 / l
+		self.weight_min = weight_min
+		self.weight_max = weight_max
+		self.block_size = block_size or DisposalSampler.BLOCK_SIZE
+
+		# (delay, bag weight) pairs, reversed so they are popped from the end
+		self.buffer = []
+
+	def delays(self, n):
+		"""Returns an array of n disposal delays, in seconds."""
+		delays = np.random.gamma(self.k, self.scale, n)
+
+		# round to three digits and convert from hours to seconds
+		return np.round(delays * 60 * 60, 3).astype(int)
+
+	def bag_weights(self, n):
+		"""Returns a list of n bag weights, rounded to three digits."""
+		weights = np.random.uniform(self.weight_min, self.weight_max, n)
+		return np.round(weights, 3).tolist()
+
+	def _refill(self):
+		self.buffer = zip(self.delays(self.block_size).tolist(), self.bag_weights(self.block_size))
+		self.buffer.reverse()
+
+	def next_disposal(self):
+		"""
+			Returns the time to the next disposal, in seconds, and
+			the weight of the bag disposed, rounded to three digits.
+		"""
+		try:
+			return self.buffer.pop()
+		except IndexError:
+			self._refill()
+			return self.buffer.pop()
+
+class SuperposedDisposalSampler(DisposalSampler):
+	"""
+		Samples the disposals of all bins of an area as one stream, for
+		exponential delays (Erlang-1). The disposals of n bins with rate l
+		form a Poisson process with rate n * l, with each disposal at a
+		uniformly chosen bin. `next_disposal` returns the delay (in seconds,
+		not rounded to whole seconds), the bin index and the bag weight.
+	"""
+
+	def __init__(self, no_bins, l, weight_min, weight_max, block_size = None):
+		DisposalSampler.__init__(self, 1, no_bins * l, weight_min, weight_max, block_size)
+		self.no_bins = no_bins
+
+	def _refill(self):
+		# delays are much shorter than a bin's, so they are kept fractional,
+		#	the caller accumulates them
+		delays = np.random.gamma(self.k, self.scale, self.block_size)
+		delays = np.round(delays * 60 * 60, 3).tolist()
+
+		bins = np.random.randint(1, self.no_bins + 1, self.block_size).tolist()
+
+		self.buffer = zip(delays, bins, self.bag_weights(self.block_size))
+		self.buffer.reverse()
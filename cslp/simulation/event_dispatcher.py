@@ -1,46 +1,215 @@
 from math import floor
+from heapq import heappush, heappop
+from collections import deque
+from timeit import default_timer as timer
+from .calendar_queue import CalendarQueue
 
-class Event:
-	"""Basic event"""
+class Event(object):
+	"""
+		Basic event. To keep events small, the type is an integer code
+		(see below) and the data is a tuple, laid out as given in `LAYOUTS`.
+		`type` and `data` return the type name and a data dictionary.
+	"""
+
+	__slots__ = ('time', 'area_index', 'code', 'payload')
+
+	# event type codes
+	BIN_DISPOSAL = 0
+	BIN_LOAD_CHANGED = 1
+	BIN_OCCUPANCY_EXCEEDED = 2
+	BIN_OVERFLOW = 3
+	BIN_EMPTIED = 4
+	SERVICE_TIME = 5
+	BINS_OVERFLOWED_AT_SERVICE_TIME = 6
+	LORRY_DEPARTURE = 7
+	LORRY_ARRIVAL = 8
+	LORRY_LOAD_CHANGED = 9
+	LORRY_AVAILABLE = 10
+	TRIP_COMPLETED = 11
+	NONE = 12
+	BIN_LEVEL_REACHED = 13
+	LORRY_WAYPOINT = 14
+
+	TYPES = [
+		'bin_disposal',
+		'bin_load_changed',
+		'bin_occupancy_exceeded',
+		'bin_overflow',
+		'bin_emptied',
+		'service_time',
+		'bins_overflowed_at_service_time',
+		'lorry_departure',
+		'lorry_arrival',
+		'lorry_load_changed',
+		'lorry_available',
+		'trip_completed',
+		'none',
+		'bin_level_reached',
+		'lorry_waypoint'
+	]
+	"""Type names, by type code"""
+
+	LAYOUTS = [
+		('bin_idx', 'bag_weight'),
+		('bin_idx', 'bin_volume', 'bin_weight'),
+		('bin_idx', 'occupancy'),
+		('bin_idx', 'occupancy'),
+		('lorry_idx', 'location'),
+		None,
+		('no_bins',),
+		('lorry_idx', 'location'),
+		('lorry_idx', 'location'),
+		('lorry_idx', 'lorry_volume', 'lorry_weight'),
+		('lorry_idx',),
+		('lorry_idx',),
+		None,
+		('bin_idx', 'cycle', 'event_code'),
+		('lorry_idx', 'location')
+	]
+	"""Data fields, by type code. Events without a layout keep their data as is."""
+
+	# type name -> type code
+	_codes = dict((type, code) for (code, type) in enumerate(TYPES))
 
 	def __init__(self, time, area_index = 0, type = 'none', data = None):
 		# NOTE: time is *ALWAYS* in seconds. Since
 		#	we use binary search here, this is fast. Swear on it!
 		self.time = time
 		self.area_index = area_index
-		self.type = type
-		self.data = data
+
+		# both type names and codes are accepted
+		if isinstance(type, int):
+			self.code = type
+		else:
+			self.code = Event.type_code(type)
+
+		if isinstance(data, dict):
+			data = Event._pack(self.code, data)
+		self.payload = data
+
+	@staticmethod
+	def type_code(type):
+		"""Returns the code of an event type, raises a ValueError if it is unknown (see `register_type`)."""
+		if isinstance(type, int):
+			return type
+
+		code = Event._codes.get(type)
+		if code is None:
+			raise ValueError('Unknown event type: {0}'.format(type))
+
+		return code
+
+	@staticmethod
+	def register_type(type, layout = None):
+		"""
+			Adds an event type, with the given data layout (None to keep the data as is),
+			and returns its code. Registering a known type again returns its code.
+		"""
+		code = Event._codes.get(type)
+		if code is not None:
+			if Event.LAYOUTS[code] != layout:
+				raise ValueError('Event type {0} is registered with another layout'.format(type))
+			return code
+
+		code = len(Event.TYPES)
+		Event.TYPES.append(type)
+		Event.LAYOUTS.append(layout)
+		Event._codes[type] = code
+
+		return code
+
+	@staticmethod
+	def _pack(code, data):
+		"""Converts a data dictionary to a tuple"""
+		layout = Event.LAYOUTS[code]
+		if layout is None:
+			return data
+
+		return tuple([data.get(field) for field in layout])
+
+	@property
+	def type(self):
+		return Event.TYPES[self.code]
+
+	@property
+	def data(self):
+		layout = Event.LAYOUTS[self.code]
+		if layout is None or self.payload is None:
+			return self.payload
+
+		return dict(zip(layout, self.payload))
 
 class EventDispatcher:
 	"""
 		A basic event dispatcher.
 	"""
 
+	# names of event queues/enum
+	QUEUE_SORTED = 'sorted'
+	QUEUE_HEAP = 'heap'
+	QUEUE_CALENDAR = 'calendar'
+
+	QUEUE = 'sorted'
+	"""Event queue to use, from the above"""
+
+	IMMEDIATE_QUEUE_ENABLED = False
+	"""Whether events at the current time skip the event queue"""
+
 	def __init__(self, stop_time, no_areas):
 		self.no_areas = no_areas
-		self.observers = dict()
 		self.stop_time = stop_time
+
+		# observers of all event types, by area
+		self.observers = dict()
+
+		# observers by area and event type code. These include the observers
+		#	of all event types, so each event is only sent to interested observers
+		self.type_observers = dict()
+
 		for i in xrange(0, self.no_areas):
 			self.observers[i] = []
+			self.type_observers[i] = dict()
+
+		self.reset()
+
+	def reset(self):
+		"""Resets the dispatcher for a new simulation run."""
+		# the queue is fixed for the duration of a run
+		self.queue = EventDispatcher.QUEUE
+
+		# Events are either always sorted and added via a binary
+		# 	search, kept as a binary heap of (time, sequence, event)
+		#	entries or kept in a calendar queue, depending on the queue in use
+		if self.queue == EventDispatcher.QUEUE_CALENDAR:
+			self.events = CalendarQueue()
+		else:
+			self.events = []
+
+		# Events at the current time are simply appended here, instead
+		#	of being added to the event queue
+		self.immediate_queue = EventDispatcher.IMMEDIATE_QUEUE_ENABLED
+		self.immediate_events = deque()
 
 		# current time
 		self.now = 0
 
-		# Events are always sorted and added via a binary
-		# 	search to improve speed.
-		self.events = []
+		# insertion counter, used by the heap to break ties between
+		#	events with the same time, so they fire in insertion order
+		self.sequence = 0
 
-		pass
+		# events after this time are dropped when added, set by `run_until`
+		self.horizon = None
 
-	def reset(self):
-		"""Resets the dispatcher for a new simulation run."""
-		self.events = []
-		self.now = 0
+	@staticmethod
+	def type_code(type):
+		"""Returns the code of an event type, for observers outside the simulation package (see `Event.type_code`)"""
+		return Event.type_code(type)
 
-	def attach_observer(self, observer, area_idx = None):
+	def attach_observer(self, observer, area_idx = None, event_types = None):
 		"""
 			Attaches an observer to the given area, or
-			to all areas, if no area given.
+			to all areas, if no area given. If event types are
+			given, the observer is only notified of those events.
 		"""
 		if area_idx is not None and area_idx >= self.no_areas:
 			return False
@@ -48,15 +217,58 @@ class EventDispatcher:
 		if area_idx is None or area_idx == -1:
 			# attach to all areas 
 			for i in xrange(0, self.no_areas):
-				self.observers[i].append(observer)
+				self._attach_observer(observer, i, event_types)
 			
 			return True
 			
-		self.observers[area_idx].append(observer)
+		self._attach_observer(observer, area_idx, event_types)
 		return True
 
-	def remove_observer(self, observer, area_idx):
-		pass
+	def _attach_observer(self, observer, area_idx, event_types):
+		type_observers = self.type_observers[area_idx]
+
+		if event_types is None:
+			# interested in everything
+			self.observers[area_idx].append(observer)
+			for observers in type_observers.values():
+				observers.append(observer)
+			return
+
+		for event_type in event_types:
+			event_type = Event.type_code(event_type)
+
+			# observers of all types attached so far come first
+			if event_type not in type_observers:
+				type_observers[event_type] = list(self.observers[area_idx])
+
+			type_observers[event_type].append(observer)
+
+	def remove_observer(self, observer, area_idx = None):
+		"""
+			Removes an observer from the given area, or
+			from all areas, if no area given.
+		"""
+		if area_idx is None or area_idx == -1:
+			areas = xrange(0, self.no_areas)
+		elif area_idx < self.no_areas:
+			areas = [area_idx]
+		else:
+			return False
+
+		for i in areas:
+			self.observers[i] = [o for o in self.observers[i] if o != observer]
+			for (event_type, observers) in self.type_observers[i].items():
+				self.type_observers[i][event_type] = [o for o in observers if o != observer]
+
+		return True
+
+	def is_observed(self, area_idx, event_type):
+		"""Returns whether any observer is interested in the given event type and area."""
+		observers = self.type_observers[area_idx].get(Event.type_code(event_type))
+		if observers is None:
+			observers = self.observers[area_idx]
+
+		return len(observers) != 0
 
 
 	def _add_event_binary(self, event, start, end):
@@ -69,11 +281,13 @@ class EventDispatcher:
 
 		# Simple binary search to find where to put the current
 		#	event in the list
+		# NOTE: events with the same time are added after the existing
+		#	ones, so they fire in insertion order
 		if start >= end:
 			idx = end
-			if self.events[start].time < event.time:
+			if self.events[start].time <= event.time:
 				idx = start + 1
-			if self.events[end].time < event.time:
+			if self.events[end].time <= event.time:
 				idx = end + 1
 			if idx < 0:
 				idx = 0
@@ -93,28 +307,125 @@ class EventDispatcher:
 		"""
 			Adds a new event to the event dispatcher.
 		"""
+		# the event would never fire
+		if self.horizon is not None and event.time > self.horizon:
+			return
+
+		if self.immediate_queue and event.time == self.now:
+			self.immediate_events.append(event)
+			return
+
+		if self.queue == EventDispatcher.QUEUE_HEAP:
+			# the sequence number keeps same-time events in insertion order
+			heappush(self.events, (event.time, self.sequence, event))
+			self.sequence += 1
+			return
+		elif self.queue == EventDispatcher.QUEUE_CALENDAR:
+			self.events.push(event.time, event)
+			return
+
 		return self._add_event_binary(event, 0, len(self.events) - 1)
 
+	def _peek_time(self):
+		"""Returns the time of the earliest event in the event queue."""
+		if self.queue == EventDispatcher.QUEUE_HEAP:
+			return self.events[0][0]
+		elif self.queue == EventDispatcher.QUEUE_CALENDAR:
+			return self.events.peek_time()
+
+		return self.events[0].time
+
+	def _pop_event(self):
+		"""Removes and returns the earliest event in the event queue."""
+		if self.queue == EventDispatcher.QUEUE_HEAP:
+			return heappop(self.events)[2]
+		elif self.queue == EventDispatcher.QUEUE_CALENDAR:
+			return self.events.pop()
+
+		return self.events.pop(0)
+
+	def _next(self):
+		"""Removes and returns the next event to fire, or None if there are none."""
+		# NOTE: events in the queue at the current time were added before
+		#	any immediate event (the time was earlier then), so they fire first
+		if len(self.immediate_events) != 0 and \
+			(len(self.events) == 0 or self._peek_time() > self.now):
+			return self.immediate_events.popleft()
+		elif len(self.events) == 0:
+			return None
+
+		return self._pop_event()
+
 	def next_event(self):
 		"""
 			Call to execute the next event, notifying
 			observers. Returns the current time after the
 			event executes or False if the simulation has ended.
 		"""
-		if len(self.events) == 0:
+		event = self._next()
+		if event is None:
 			return False
 
-		event = self.events.pop(0)
 		self.now = event.time
 
 		if self.now > self.stop_time:
 			return False
 
-		# notify all observers in that area
+		# notify all observers in that area, interested in the event
 		if event.area_index in self.observers:
-			for observer in self.observers[event.area_index]:
+			observers = self.type_observers[event.area_index].get(event.code)
+			if observers is None:
+				observers = self.observers[event.area_index]
+
+			for observer in observers:
 				observer(event)
 
 		
 		return event.time
-	
\ No newline at end of file
+
+	def run_until(self, stop_time = None):
+		"""
+			Executes all events up to the given time (the stop time by
+			default), notifying observers. Events after that time are dropped
+			when added. Returns the run's counters: the number of events
+			processed, the peak number of pending events and the wall time.
+		"""
+		if stop_time is None:
+			stop_time = self.stop_time
+		self.horizon = stop_time
+
+		start_time = timer()
+		processed = 0
+		peak_queue_length = len(self.events) + len(self.immediate_events)
+
+		observers = self.observers
+		type_observers = self.type_observers
+
+		while True:
+			event = self._next()
+			if event is None:
+				break
+
+			self.now = event.time
+			if self.now > stop_time:
+				break
+
+			# notify all observers in that area, interested in the event
+			if event.area_index in observers:
+				area_observers = type_observers[event.area_index].get(event.code)
+				if area_observers is None:
+					area_observers = observers[event.area_index]
+
+				for observer in area_observers:
+					observer(event)
+
+			processed += 1
+			queue_length = len(self.events) + len(self.immediate_events)
+			if queue_length > peak_queue_length:
+				peak_queue_length = queue_length
+
+		return {
+			'events_processed': processed,
+			'peak_queue_length': peak_queue_length,
+			'wall_time': timer() - start_time
+		}
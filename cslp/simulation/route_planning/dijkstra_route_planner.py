@@ -1,5 +1,15 @@
+import os
+import hashlib
 import numpy as np
 from Queue import PriorityQueue
+from heapq import heappush, heappop
+from itertools import izip
+from timeit import default_timer as timer
+from .route_cache import RouteCache
+from .tour_improver import TourImprover
+from .road_graph import RoadGraph
+from .landmarks import Landmarks
+from .triangular_distances import TriangularDistances
 
 class DijkstraRoutePlanner:
 	"""
@@ -12,11 +22,11 @@ class DijkstraRoutePlanner:
 	"""Whether to cache previously computed route."""
 
 	CACHE_MAX_SIZE = 100000
-	"""Maxmimum number of cached routes"""
-	
-	CACHE_KEY = '{0}:{1}'
-	"""Cache key - source:target"""
+	"""Maxmimum number of cached routes, older routes are evicted (see `RouteCache`)"""
 	
+	ROUTE_MEMO_SIZE = 1000
+	"""Maximum number of planned routes kept for service sets that recur, 0 to disable"""
+
 	DYNAMIC_BINS_THRESHOLD = 100
 	"""Changes algorithms from the priority/slow to the greedy/fast when more than this number are to be serviced"""
 
@@ -24,31 +34,416 @@ class DijkstraRoutePlanner:
 	ALGORITHM_GREEDY = 'greedy'
 	ALGORITHM_PRIORITY = 'priority'
 	ALGORITHM_DYNAMIC = 'dynamic'
+	ALGORITHM_SAVINGS = 'savings'
 
 	ALGORITHM = 'dynamic'
 	"""Algorithm to use, from the above"""
 
-	def __init__(self, area_map, total_nodes):
-		self.area_map = area_map
-		"""The map of the are"""
+	IMPROVEMENT_BUDGET = 0
+	"""
+		Time (in milliseconds) per planned route for shortening its trips with 2-opt
+		and Or-opt (see `TourImprover`), after the algorithm. 0 disables it.
+	"""
+
+	# names of shortest paths computations/enum
+	SHORTEST_PATHS_POINT = 'point'
+	SHORTEST_PATHS_DIJKSTRA = 'dijkstra'
+	SHORTEST_PATHS_FLOYD_WARSHALL = 'floyd_warshall'
+	SHORTEST_PATHS_LAZY = 'lazy'
+	SHORTEST_PATHS_LANDMARKS = 'landmarks'
+	SHORTEST_PATHS_AUTO = 'auto'
+
+	SHORTEST_PATHS = 'auto'
+	"""
+		How shortest paths are computed, from the above. Point runs Dijkstra for every
+		(source, target) pair when needed. Dijkstra, Floyd-Warshall and auto (Floyd-Warshall
+		for dense areas and Dijkstra otherwise) compute the distances and predecessors of all
+		pairs up front. Lazy runs Dijkstra from a source to all nodes the first time it is needed
+		and keeps the distances and predecessors from that source. Landmarks runs A* for every
+		(source, target) pair when needed, bounded with distances to and from a few landmarks
+		(see `Landmarks`). Auto uses landmarks for areas with more than `ALL_PAIRS_MAX_NODES` locations.
+	"""
+
+	ALL_PAIRS_MAX_NODES = 2000
+	"""Largest area (in locations) auto computes all pairs for, taking 16 bytes per pair"""
+
+	LANDMARKS = 16
+	"""Number of landmarks, each takes 16 bytes per location"""
+
+	LANDMARKS_BIDIRECTIONAL = False
+	"""Whether landmark queries search from the source and the target at once"""
+
+	# names of search cores/enum
+	SEARCH_CORE_PRIORITY_QUEUE = 'priority_queue'
+	SEARCH_CORE_HEAPQ = 'heapq'
+
+	SEARCH_CORE = 'heapq'
+	"""
+		Dijkstra implementation, from the above. Both give the same results, the heapq
+		core avoids the locking of `Queue.PriorityQueue` and the lookups in the map's dictionaries
+	"""
+
+	PERSISTENT_CACHE_DIR = None
+	"""
+		Directory where shortest paths computed up front are saved, as `.npy` files named by
+		a hash of the area map. Later runs on the same map load them memory mapped. None to disable.
+	"""
+
+	PERSISTENT_CACHE_VERSION = 3
+	"""Part of the hash, changed when the saved arrays change"""
+
+	VECTORISED_SEARCH_DEGREE = 64
+	"""
+		Maps with at least this many roads per location (on average) are searched
+		by relaxing all roads of a location at once, with numpy
+	"""
+
+	DENSE_AREA_THRESHOLD = 0.25
+	"""Areas with at least this fraction of all possible roads are dense"""
+
+	FLOYD_WARSHALL_MAX_NODES = 1000
+	"""
+		Largest dense area (in locations) auto uses Floyd-Warshall for. Beyond it, Dijkstra from every
+		location is as fast (both take about 35 seconds for 1500 locations) and needs no N x N temporaries
+	"""
+
+	INFINITY = 1 << 30
+	"""Distance to unreachable locations"""
+
+	def __init__(self, area_map, total_nodes, lorry_capacity = None, depot_time = 0):
+		# nodes without roads might be missing from the map
+		self.area_map = RoadGraph.from_layout(area_map, total_nodes)
+		"""The map of the area, see `RoadGraph`"""
 
 		self.total_nodes = total_nodes
 		"""The total number of nodes including the depot"""
+
+		self.lorry_capacity = lorry_capacity
+		"""The lorry's (volume, maximum load), used by the savings algorithm. None if unlimited"""
+
+		self.depot_time = depot_time
+		"""Time (in minutes) the lorry spends at the depot between trips, used by the savings algorithm"""
 		
-		# path cache between source:target
-		#	contains every computed path
-		self.path_cache = {}
-		pass
+		# path cache between source and target, keyed by source * total_nodes + target
+		#	contains the most recently used paths. Distances of symmetric maps are
+		#	looked up both ways, see `_search_distance`
+		self.path_cache = RouteCache(DijkstraRoutePlanner.CACHE_MAX_SIZE)
 
-	def _dijkstra(self, source, target, N, adj_list, service_target = True, flatten_route = False):
-		# look in cache to see if the route already has been computed
-		if flatten_route and DijkstraRoutePlanner.CACHE_ENABLED:
-			cache_key = DijkstraRoutePlanner.CACHE_KEY.format(source, target)
-			if cache_key in self.path_cache:
-				# in this case simply return the path
-				return self.path_cache[cache_key]
+		# all pairs shortest paths, if computed up front
+		#	distances[s, t] = distance from s to t, only the upper triangle is kept
+		#		for symmetric maps (see `TriangularDistances`)
+		#	predecessors[s, t] = the node before t on the path from s to t, -1 if none
+		self.distances = None
+		self.predecessors = None
+
+		# shortest paths from the sources used so far, in lazy mode
+		#	source_paths[s] = (distances from s, predecessors from s)
+		self.source_paths = {}
+
+		# numpy type of distances, see `_distance_type`
+		self.distance_type = None
+
+		self.search_core = DijkstraRoutePlanner.SEARCH_CORE
+
+		self.shortest_paths = DijkstraRoutePlanner.SHORTEST_PATHS
+		if self.shortest_paths == DijkstraRoutePlanner.SHORTEST_PATHS_AUTO:
+			no_roads = self.area_map.no_roads()
+			if total_nodes > DijkstraRoutePlanner.ALL_PAIRS_MAX_NODES:
+				self.shortest_paths = DijkstraRoutePlanner.SHORTEST_PATHS_LANDMARKS
+			elif (no_roads >= DijkstraRoutePlanner.DENSE_AREA_THRESHOLD * total_nodes * total_nodes and
+				total_nodes <= DijkstraRoutePlanner.FLOYD_WARSHALL_MAX_NODES):
+				self.shortest_paths = DijkstraRoutePlanner.SHORTEST_PATHS_FLOYD_WARSHALL
+			else:
+				self.shortest_paths = DijkstraRoutePlanner.SHORTEST_PATHS_DIJKSTRA
+
+		# planned routes, keyed by the algorithm and service set (see `_route_key`)
+		self.route_memo = RouteCache(DijkstraRoutePlanner.ROUTE_MEMO_SIZE)
+
+		# local search after the algorithm, see `IMPROVEMENT_BUDGET`
+		self.tour_improver = TourImprover()
+
+		# whether the shortest paths were loaded from the persistent cache
+		self.persistent_cache_hit = False
+
+		# landmark distances, in landmarks mode
+		self.landmarks = None
+
+		if self.shortest_paths in [DijkstraRoutePlanner.SHORTEST_PATHS_FLOYD_WARSHALL,
+			DijkstraRoutePlanner.SHORTEST_PATHS_DIJKSTRA]:
+			self._all_pairs_shortest_paths(total_nodes, self.area_map)
+
+		if self.shortest_paths == DijkstraRoutePlanner.SHORTEST_PATHS_LANDMARKS:
+			self.landmarks = Landmarks(self.area_map, DijkstraRoutePlanner.LANDMARKS,
+				lambda graph, source: self._search_heapq(source, None, total_nodes, graph)[0],
+				DijkstraRoutePlanner.INFINITY)
+
+	def _all_pairs_shortest_paths(self, N, adj_list):
+		"""Computes all pairs shortest paths, or loads them from the persistent cache"""
+		cache_dir = DijkstraRoutePlanner.PERSISTENT_CACHE_DIR
+		if cache_dir is not None and self._load_shortest_paths(cache_dir):
+			self.persistent_cache_hit = True
+			return
+
+		if self.shortest_paths == DijkstraRoutePlanner.SHORTEST_PATHS_FLOYD_WARSHALL:
+			self._floyd_warshall(N, adj_list)
+		else:
+			self._all_sources_dijkstra(N, adj_list)
+
+		if self.area_map.symmetric:
+			self.distances = TriangularDistances.pack(self.distances, DijkstraRoutePlanner.INFINITY)
+
+		if cache_dir is not None:
+			self._save_shortest_paths(cache_dir)
+
+	def _persistent_cache_files(self, cache_dir):
+		"""
+			Returns the distance and predecessor files of the area map. These are named by
+			a hash of the map's contents, so a changed map never uses the files of another.
+		"""
+		layout_hash = hashlib.sha1(repr((DijkstraRoutePlanner.PERSISTENT_CACHE_VERSION, self.total_nodes)))
+		for array in [self.area_map.indptr, self.area_map.indices, self.area_map.weights]:
+			layout_hash.update(array.dtype.str)
+			layout_hash.update(array.tobytes())
+		layout_hash = layout_hash.hexdigest()
+
+		return (
+			os.path.join(cache_dir, '{0}.distances.npy'.format(layout_hash)),
+			os.path.join(cache_dir, '{0}.predecessors.npy'.format(layout_hash))
+		)
+
+	def _load_shortest_paths(self, cache_dir):
+		"""Loads (memory maps) the saved shortest paths, returns whether there were any"""
+		distances_file, predecessors_file = self._persistent_cache_files(cache_dir)
+		if not (os.path.isfile(distances_file) and os.path.isfile(predecessors_file)):
+			return False
+
+		try:
+			distances = np.load(distances_file, mmap_mode = 'r')
+			predecessors = np.load(predecessors_file, mmap_mode = 'r')
+		except (IOError, ValueError):
+			# unreadable files are overwritten
+			return False
+
+		N = self.total_nodes
+		if self.area_map.symmetric:
+			if distances.shape != (TriangularDistances.size(N),):
+				return False
+			distances = TriangularDistances(distances, N, DijkstraRoutePlanner.INFINITY)
+		elif distances.shape != (N, N):
+			return False
+
+		if predecessors.shape != (N, N):
+			return False
 
-		# Standard Dijkstra algorithm below
+		self.distances = distances
+		self.predecessors = predecessors
+		return True
+
+	def _save_shortest_paths(self, cache_dir):
+		"""Saves the shortest paths, for later runs on the same map"""
+		distances = self.distances.packed if self.area_map.symmetric else self.distances
+		files = zip(self._persistent_cache_files(cache_dir), [distances, self.predecessors])
+		try:
+			if not os.path.isdir(cache_dir):
+				os.makedirs(cache_dir)
+
+			for (file_name, array) in files:
+				# written under a temporary name first, so other processes
+				#	never load a partially written file
+				temp_file_name = '{0}.{1}.tmp'.format(file_name, os.getpid())
+				with open(temp_file_name, 'wb') as f:
+					np.save(f, array)
+				os.rename(temp_file_name, file_name)
+		except (IOError, OSError):
+			# the cache is only an optimisation, the paths are computed anyway
+			pass
+
+	def _distance_type(self, adj_list):
+		"""Integer distances are kept as integers"""
+		if self.distance_type is not None:
+			return self.distance_type
+
+		graph = RoadGraph.from_layout(adj_list)
+		self.distance_type = np.float64 if graph.weights.dtype == np.float64 else np.int64
+
+		return self.distance_type
+
+	def _floyd_warshall(self, N, adj_list):
+		"""Computes all pairs shortest paths, with Floyd-Warshall vectorised over rows"""
+		# roads[i, j] = length of the shortest road from i to j
+		graph = RoadGraph.from_layout(adj_list, N)
+		roads = np.full((N, N), DijkstraRoutePlanner.INFINITY, dtype = self._distance_type(graph))
+		np.minimum.at(roads, (graph.sources(), graph.indices), graph.weights)
+
+		dist = roads.copy()
+		np.fill_diagonal(dist, 0)
+
+		for k in xrange(N):
+			# the distances through k, for all pairs
+			np.minimum(dist, dist[:, k, np.newaxis] + dist[np.newaxis, k, :], out = dist)
+
+		self.distances = dist
+		self.predecessors = self._floyd_warshall_predecessors(dist, roads)
+
+	def _floyd_warshall_predecessors(self, dist, roads):
+		"""
+			Returns the predecessors of all pairs, given their distances and the road lengths, breaking
+			ties as `_dijkstra` does. Dijkstra from s visits nodes by distance, then index, and a node's
+			predecessor is the first node visited on one of its shortest paths, i.e. the node c with the
+			smallest (dist[s, c] + roads[c, t], dist[s, c], c). As Floyd-Warshall, this goes over every
+			node c once, for all pairs at once, reusing a few N x N arrays.
+		"""
+		N = len(dist)
+		infinity = DijkstraRoutePlanner.INFINITY
+
+		# the shortest distance through the best last step so far, and the distance to that step
+		best = np.full((N, N), infinity, dtype = dist.dtype)
+		best_step = np.full((N, N), infinity, dtype = dist.dtype)
+		pred = np.full((N, N), -1, dtype = np.int64)
+
+		through = np.empty((N, N), dtype = dist.dtype)
+		better = np.empty((N, N), dtype = np.bool_)
+		tie = np.empty((N, N), dtype = np.bool_)
+
+		for c in xrange(N):
+			# only roads from c, from sources that reach c
+			targets = roads[c] < infinity
+			step = dist[:, c, np.newaxis]
+
+			np.add(step, roads[np.newaxis, c, :], out = through)
+			np.less(through, best, out = better)
+
+			# c is visited after the nodes before it, so it only wins ties by being closer to the source
+			np.equal(through, best, out = tie)
+			tie &= step < best_step
+			better |= tie
+			better &= targets[np.newaxis, :]
+			better &= step < infinity
+
+			np.copyto(best, through, where = better)
+			np.copyto(best_step, step, where = better)
+			pred[better] = c
+
+		# sources have no predecessor but themselves
+		np.fill_diagonal(pred, np.arange(N))
+
+		return pred
+
+	def _all_sources_dijkstra(self, N, adj_list):
+		"""Computes all pairs shortest paths, with Dijkstra from every source"""
+		self.distances = np.empty((N, N), dtype = self._distance_type(adj_list))
+		self.predecessors = np.empty((N, N), dtype = np.int64)
+
+		for source in xrange(N):
+			dist, path = self._single_source_dijkstra(source, N, adj_list)
+
+			self.distances[source] = dist
+			self.predecessors[source] = [-1 if i is None else i for i in path]
+
+	def _single_source_dijkstra(self, source, N, adj_list):
+		"""
+			Returns the distances and predecessors of all nodes from the source.
+			This visits nodes in the same order as `_dijkstra`, so paths are the same.
+		"""
+		return self._search(source, None, N, adj_list)
+
+	def _search(self, source, target, N, adj_list):
+		"""
+			Dijkstra's search from the source, until the target is reached (or
+			all nodes, if no target). Returns the distances and predecessors.
+		"""
+		if self.search_core == DijkstraRoutePlanner.SEARCH_CORE_PRIORITY_QUEUE:
+			return self._search_priority_queue(source, target, N, adj_list)
+
+		return self._search_heapq(source, target, N)
+
+	def _search_heapq(self, source, target, N, graph = None):
+		"""
+			Dijkstra's search on a heap, over the map (or another graph of it). Outdated queue entries
+			are skipped when popped. Nodes are visited (and ties broken) in the same order as `_search_priority_queue`.
+		"""
+		if graph is None:
+			graph = self.area_map
+
+		# on dense maps, the roads of a node are relaxed together with numpy
+		if graph.no_roads() >= DijkstraRoutePlanner.VECTORISED_SEARCH_DEGREE * len(graph):
+			return self._search_heapq_vectorised(source, target, N, graph)
+
+		return self._search_heapq_lists(source, target, N, graph)
+
+	def _search_heapq_vectorised(self, source, target, N, graph):
+		"""Dijkstra's search on a heap, over the rows of the graph's arrays"""
+		indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+
+		path = np.full(N, -1, dtype = np.int64)
+		path[source] = source
+
+		dist = np.full(N, DijkstraRoutePlanner.INFINITY, dtype = self._distance_type(graph))
+		dist[source] = 0
+
+		q = [(0, source)]
+		while q:
+			c_d, c_i = heappop(q)
+
+			if c_d > dist[c_i]:
+				continue
+
+			if c_i == target:
+				break
+
+			start, end = indptr[c_i], indptr[c_i + 1]
+			neighbors = indices[start:end]
+			n_d = weights[start:end] + c_d
+
+			# the map has a road to a neighbor at most once, so
+			#	this updates them as the loop over the lists does
+			better = n_d < dist[neighbors]
+			if better.any():
+				neighbors = neighbors[better]
+				n_d = n_d[better]
+				dist[neighbors] = n_d
+				path[neighbors] = c_i
+
+				for (d, i) in izip(n_d.tolist(), neighbors.tolist()):
+					heappush(q, (d, i))
+
+		return dist.tolist(), [None if i == -1 else i for i in path.tolist()]
+
+	def _search_heapq_lists(self, source, target, N, graph):
+		"""Dijkstra's search on a heap, over the graph's arrays as lists (see `RoadGraph.lists`)"""
+		indptr, indices, weights = graph.lists()
+
+		# path[i] = the node we reached i from
+		path = [None] * N
+		path[source] = source
+
+		dist = [DijkstraRoutePlanner.INFINITY] * N
+		dist[source] = 0
+
+		q = [(0, source)]
+		while q:
+			c_d, c_i = heappop(q)
+
+			# a shorter path to this node was found after this entry was added
+			if c_d > dist[c_i]:
+				continue
+
+			if c_i == target:
+				break
+
+			start, end = indptr[c_i], indptr[c_i + 1]
+			for (n_i, n_d) in izip(indices[start:end], weights[start:end]):
+				n_d += c_d
+				if n_d < dist[n_i]:
+					dist[n_i] = n_d
+					path[n_i] = c_i
+					heappush(q, (n_d, n_i))
+
+		return dist, path
+
+	def _search_priority_queue(self, source, target, N, adj_list):
+		"""Dijkstra's search with a (synchronised) priority queue, over the map"""
+		indptr, indices, weights = RoadGraph.from_layout(adj_list, N).lists()
 
 		q = PriorityQueue()
 		# we don't visit nodes twice
@@ -60,7 +455,7 @@ class DijkstraRoutePlanner:
 		path[source] = source
 
 		# the best found distance yet
-		dist = [1 << 30] * N
+		dist = [DijkstraRoutePlanner.INFINITY] * N
 		dist[source] = 0
 
 		# start at the source
@@ -69,16 +464,15 @@ class DijkstraRoutePlanner:
 		while not q.empty():
 			_, current = q.get()
 			c_i = current
-			c_d = dist[c_i]
 
 			if c_i == target:
 				break
 			
 			visited[c_i] = True
 
-			for neighbor in adj_list[c_i]:
-				n_i = neighbor['index']
-				n_d = neighbor['path_length']
+			for k in xrange(indptr[c_i], indptr[c_i + 1]):
+				n_i = indices[k]
+				n_d = weights[k]
 				
 				# if the path is better, update it and push the item
 				#	in the queue with the distance as a priority
@@ -88,37 +482,152 @@ class DijkstraRoutePlanner:
 
 					q.put((dist[n_i], n_i))
 
-		# backtrack to find the actual path
-		target_path = []
-		i = target
-		target_path.append({
-			'target': target,
-			'service': service_target,
-			'distance': dist[target]
-		})
+		return dist, path
+
+	def _search_landmarks(self, source, target):
+		"""
+			A* search from the source to the target, with the landmarks. Returns the distance
+			and predecessors of the nodes on the path found, as `_search` does.
+		"""
+		if DijkstraRoutePlanner.LANDMARKS_BIDIRECTIONAL:
+			distance, locations = self.landmarks.search_bidirectional(source, target)
+		else:
+			distance, locations = self.landmarks.search(source, target)
+
+		# an unreachable target has no predecessor
+		path = dict(zip(locations, [source] + locations[:-1]))
+		path.setdefault(target, source if target == source else None)
+
+		return { target: distance }, path
+
+	def _source_paths(self, source):
+		"""Returns the distances and predecessors of all nodes from the source, computing them if needed."""
+		if self.distances is not None:
+			return self.distances[source], self.predecessors[source]
+
+		paths = self.source_paths.get(source)
+		if paths is None:
+			# finish the search from the source, for all later queries
+			dist, path = self._single_source_dijkstra(source, self.total_nodes, self.area_map)
+			paths = (
+				np.array(dist, dtype = self._distance_type(self.area_map)),
+				np.array([-1 if i is None else i for i in path], dtype = np.int64)
+			)
+			self.source_paths[source] = paths
+
+		return paths
+
+	def _has_source_paths(self):
+		"""Whether the distances from a source are available as rows, see `_source_paths`"""
+		return self.distances is not None or self.shortest_paths == DijkstraRoutePlanner.SHORTEST_PATHS_LAZY
+
+	def _path(self, source, target, service_target = True, flatten_route = False):
+		"""Returns the shortest path from source to target, as `_dijkstra` does"""
+		if not self._has_source_paths():
+			return self._dijkstra(source, target, self.total_nodes, self.area_map, service_target, flatten_route)
+
+		# look up the precomputed paths
+		if self.distances is not None:
+			distance = self.distances[source, target].item()
+		else:
+			distance = self._source_paths(source)[0][target].item()
+
+		if flatten_route:
+			return [{
+				'target': target,
+				'service': service_target,
+				'distance': distance
+			}]
+
+		return self._expand_path(self._hops(source, target), target, service_target, distance)
 
+	def _dijkstra(self, source, target, N, adj_list, service_target = True, flatten_route = False):
 		# we need not return the entire path if we flatten the route
-		if not flatten_route:
-			while True:
-				i = path[i]
+		if flatten_route:
+			return [{
+				'target': target,
+				'service': service_target,
+				'distance': self._search_distance(source, target, N, adj_list)
+			}]
+
+		distance, hops = self._search_path(source, target, N, adj_list)
+		return self._expand_path(hops, target, service_target, distance)
+
+	def _search_distance(self, source, target, N, adj_list):
+		"""
+			Returns the distance from source to target, as `_search_path` does. On symmetric maps,
+			the path from target to source is as long, so it is used if only that one is cached.
+		"""
+		if DijkstraRoutePlanner.CACHE_ENABLED and self.area_map.symmetric and source * N + target not in self.path_cache:
+			cached_path = self.path_cache.get(target * N + source)
+			if cached_path is not None:
+				return cached_path[0]
+
+		return self._search_path(source, target, N, adj_list)[0]
 
-				if i == source or i is None:
-					break
-				target_path.append({
-					'target': i,
-					'service': False
-				})
+	def _search_path(self, source, target, N, adj_list):
+		"""
+			Returns the distance from source to target, and the nodes between them (see `_hops`).
+			Both are cached, so the path can still be expanded when found in the cache.
+
+			The path from target to source, reversed, is as short on symmetric maps, but may pass
+			other nodes when paths tie, so the nodes are only ever taken from the same direction.
+		"""
+		# look in cache to see if the route already has been computed
+		if DijkstraRoutePlanner.CACHE_ENABLED:
+			cache_key = source * N + target
+			cached_path = self.path_cache.get(cache_key)
+			if cached_path is not None:
+				# in this case simply return the path
+				return cached_path
+
+		if self.landmarks is not None:
+			dist, path = self._search_landmarks(source, target)
+		else:
+			dist, path = self._search(source, target, N, adj_list)
+
+		# backtrack to find the nodes in between, kept as plain indices
+		hops = []
+		i = path[target]
+		while i != source and i is not None:
+			hops.append(i)
+			i = path[i]
 
 		# NOTE: we do not append the source to the path
-		target_path = target_path[::-1]
+		cached_path = (dist[target], tuple(hops[::-1]))
 
 		# If caching is enabled, we need to add the route to the cache
-		if flatten_route and DijkstraRoutePlanner.CACHE_ENABLED:
-			cache_size = len(self.path_cache)
-			
-			# only add when not exceeding the cache limit
-			if cache_size <= DijkstraRoutePlanner.CACHE_MAX_SIZE:
-				self.path_cache[cache_key] = target_path
+		if DijkstraRoutePlanner.CACHE_ENABLED:
+			self.path_cache.put(cache_key, cached_path)
+
+		return cached_path
+
+	def _hops(self, source, target):
+		"""Returns the nodes the shortest path from source to target passes, in order"""
+		if not self._has_source_paths():
+			return self._search_path(source, target, self.total_nodes, self.area_map)[1]
+
+		_, predecessors = self._source_paths(source)
+		hops = []
+		i = predecessors[target]
+		while i != source and i != -1:
+			hops.append(int(i))
+			i = predecessors[i]
+
+		return tuple(hops[::-1])
+
+	def _expand_path(self, hops, target, service_target, distance):
+		"""Returns the path through the given nodes to the target, with a step for every node"""
+		target_path = [{
+			'target': i,
+			'service': False
+		} for i in hops]
+
+		target_path.append({
+			'target': target,
+			'service': service_target,
+			'distance': distance
+		})
 
 		return target_path
 
@@ -140,7 +649,7 @@ class DijkstraRoutePlanner:
 		final_path = []
 		for b in bins:
 			# find the route to the bin from the current location
-			path = self._dijkstra(current_location, b['idx'], self.total_nodes, self.area_map, flatten_route = flatten_route)
+			path = self._path(current_location, b['idx'], flatten_route = flatten_route)
 			current_location = b['idx']
 			
 			final_path += path
@@ -153,7 +662,14 @@ class DijkstraRoutePlanner:
 	def _get_route_priority(self, bins, flatten_route=False):
 		if len(bins) == 0:
 			return False
-		
+
+		# with distance rows, the closest bin is found with numpy
+		if self._has_source_paths():
+			return self._get_route_priority_vectorised(bins, flatten_route)
+
+		return self._get_route_priority_paths(bins, flatten_route)
+
+	def _get_route_priority_paths(self, bins, flatten_route=False):
 		# This version prioritizes bins closer to each other
 		# 	and to the depot
 		# NOTE: not the fastest version of this, but with enough cached
@@ -173,7 +689,7 @@ class DijkstraRoutePlanner:
 
 			# for all the bins, compute the path to the current bin
 			for b_2 in bins:
-				path = self._dijkstra(current_location, b_2['idx'], self.total_nodes, self.area_map, flatten_route = flatten_route)
+				path = self._path(current_location, b_2['idx'], flatten_route = flatten_route)
 				bin_paths.append((path[-1]['distance'], b_2['idx'], path))
 
 			# sort the paths
@@ -194,31 +710,324 @@ class DijkstraRoutePlanner:
 
 		return final_path
 
+	def _get_route_priority_vectorised(self, bins, flatten_route=False):
+		"""
+			The priority algorithm over the distance rows: the closest remaining bin
+			is the argmin of the row of the current location, over the bins not yet
+			serviced. Ties go to the first bin given, as in `_get_route_priority_paths`.
+		"""
+		bin_indices = np.array([b['idx'] for b in bins], dtype = np.int64)
+		remaining = np.ones(len(bins), dtype = bool)
+
+		# start at the depot
+		current_location = 0
+		final_path = []
+
+		for i in xrange(len(bins)):
+			distances, _ = self._source_paths(current_location)
+
+			# serviced bins are never the closest (unreachable bins still come before them)
+			bin_distances = np.where(remaining, distances[bin_indices], np.inf)
+			closest = bin_distances.argmin()
+			remaining[closest] = False
+
+			target = int(bin_indices[closest])
+			final_path += self._path(current_location, target, flatten_route = flatten_route)
+			current_location = target
+
+		# the last part is getting to the depot
+		final_path += self.get_route_to_depot(current_location, flatten_route = flatten_route)
+
+		return final_path
+
+	def _get_route_savings(self, bins, flatten_route=False):
+		"""
+			Clarke-Wright savings. The bins are split into trips from and to the depot,
+			each fitting the lorry's capacity (bins are compressed to half their volume).
+			Every bin starts as its own trip, then, by decreasing savings
+			d(i, depot) + depot time + d(depot, j) - d(i, j), the trip ending at i is joined with the one
+			starting at j, if both fit the lorry together. Joining trips also saves a
+			stop at the depot. Trips with the fullest bins go first.
+		"""
+		if len(bins) == 0:
+			return False
+
+		n = len(bins)
+		locations = [0] + [b['idx'] for b in bins]
+		volumes = [b['current_volume'] / 2.0 for b in bins]
+		weights = [b['current_weight'] for b in bins]
+
+		# distances between the depot (0) and the bins (1..n)
+		distances = self._distance_matrix(locations)
+
+		# savings[i, j] of going from bin i to bin j directly, instead of through the depot
+		savings = distances[1:, 0, np.newaxis] + self.depot_time + distances[np.newaxis, 0, 1:] - distances[1:, 1:]
+		np.fill_diagonal(savings, 0)
+		pairs = np.argwhere(savings > 0)
+		# by decreasing savings, ties by bin order
+		pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0], -savings[pairs[:, 0], pairs[:, 1]]))].tolist()
+
+		# trips[t] = bins of trip t, in order, trip_of[i] = the trip of bin i
+		trips = [[i] for i in xrange(n)]
+		trip_of = range(n)
+		trip_volumes = list(volumes)
+		trip_weights = list(weights)
+
+		for (i, j) in pairs:
+			a = trip_of[i]
+			b = trip_of[j]
+			if a == b or trips[a][-1] != i or trips[b][0] != j:
+				continue
+
+			if self.lorry_capacity is not None:
+				lorry_volume, lorry_max_load = self.lorry_capacity
+				if trip_volumes[a] + trip_volumes[b] > lorry_volume or \
+					trip_weights[a] + trip_weights[b] > lorry_max_load:
+					continue
+
+			# join trip b after trip a
+			trips[a] += trips[b]
+			trip_volumes[a] += trip_volumes[b]
+			trip_weights[a] += trip_weights[b]
+			for k in trips[b]:
+				trip_of[k] = a
+			trips[b] = None
+
+		trips = [trip for trip in trips if trip is not None]
+		trips = sorted(trips, key = lambda trip: max([bins[i]['current_volume'] for i in trip]), reverse = True)
+
+		return self._trips_path([[bins[i]['idx'] for i in trip] for trip in trips], flatten_route)
+
+	def _distance_matrix(self, locations):
+		"""Returns the distances between the given locations, as a matrix"""
+		if self.distances is not None:
+			return self.distances[np.ix_(locations, locations)].astype(np.float64)
+
+		# landmarks avoid searches to every location
+		if self.landmarks is not None:
+			return np.array([[self._path(source, target, flatten_route = True)[-1]['distance'] for target in locations]
+				for source in locations], dtype = np.float64)
+
+		# point paths keep no rows (unlike lazy ones), so the searches from every location are not stored
+		if not self._has_source_paths():
+			return np.array([np.array(self._single_source_dijkstra(l, self.total_nodes, self.area_map)[0],
+				dtype = np.float64)[locations] for l in locations])
+
+		return np.array([self._source_paths(l)[0][locations] for l in locations], dtype = np.float64)
+
+	def _trips_path(self, trips, flatten_route=False):
+		"""Returns the route servicing the bins of every trip in order, going back to the depot after each"""
+		current_location = 0
+		final_path = []
+		for trip in trips:
+			for location in trip:
+				final_path += self._path(current_location, location, flatten_route = flatten_route)
+				current_location = location
+
+			final_path += self.get_route_to_depot(current_location, flatten_route = flatten_route)
+			current_location = 0
+
+		return final_path
+
+	def _route_trips(self, route):
+		"""Returns the bins serviced by every trip of the route, trips end where a path reaches the depot"""
+		trips = [[]]
+		for step in route:
+			if step['service']:
+				trips[-1].append(step['target'])
+			elif step['target'] == 0 and 'distance' in step:
+				trips.append([])
+
+		return [trip for trip in trips if len(trip) != 0]
+
+	def _insert_bins(self, trips, new_bins, bins):
+		"""
+			Adds the new bins to the trips (in place) with cheapest insertion: fullest first,
+			every bin goes where it adds the least distance, in a trip it still fits in.
+			Bins fitting in no trip get a trip of their own.
+		"""
+		loads = dict((b['idx'], (b['current_volume'] / 2.0, b['current_weight'])) for b in bins)
+		trip_volumes = [sum([loads[l][0] for l in trip]) for trip in trips]
+		trip_weights = [sum([loads[l][1] for l in trip]) for trip in trips]
+
+		# distances between all locations involved, by their position in `locations`
+		locations = [0] + [l for trip in trips for l in trip] + [b['idx'] for b in new_bins]
+		position = dict((l, k) for (k, l) in enumerate(locations))
+		distances = self._distance_matrix(locations)
+
+		for b in sorted(new_bins, key = lambda b: b['current_volume'], reverse = True):
+			volume, weight = loads[b['idx']]
+			i = position[b['idx']]
+
+			# (added distance, trip, index in the trip)
+			best = None
+			for (t, trip) in enumerate(trips):
+				if self.lorry_capacity is not None and (trip_volumes[t] + volume > self.lorry_capacity[0] or \
+					trip_weights[t] + weight > self.lorry_capacity[1]):
+					continue
+
+				# between every two consecutive stops, depot included
+				stops = [0] + [position[l] for l in trip] + [0]
+				before = np.array(stops[:-1])
+				after = np.array(stops[1:])
+				added = distances[before, i] + distances[i, after] - distances[before, after]
+
+				k = added.argmin()
+				if best is None or added[k] < best[0]:
+					best = (added[k], t, k)
+
+			if best is None:
+				trips.append([b['idx']])
+				trip_volumes.append(volume)
+				trip_weights.append(weight)
+				continue
+
+			_, t, k = best
+			trips[t].insert(k, b['idx'])
+			trip_volumes[t] += volume
+			trip_weights[t] += weight
+
+	def _improve_route(self, route, flatten_route=False):
+		"""
+			Shortens every trip of the route with 2-opt and Or-opt, within the time budget.
+			The budget covers finding the distances of every trip too, so trips left once
+			it is spent are kept as they are.
+		"""
+		start_time = timer()
+		deadline = start_time + DijkstraRoutePlanner.IMPROVEMENT_BUDGET / 1000.0
+
+		trips = self._route_trips(route)
+
+		improved_trips = []
+		for trip in trips:
+			if len(trip) < 2 or timer() >= deadline:
+				improved_trips.append(trip)
+				continue
+
+			order = self.tour_improver.improve(self._distance_matrix([0] + trip).tolist(), deadline)
+			improved_trips.append([trip[i - 1] for i in order])
+
+		if improved_trips != trips:
+			route = self._trips_path(improved_trips, flatten_route)
+
+		self.tour_improver.add_time(timer() - start_time)
+		return route
+
+	def uses_loads(self):
+		"""Whether planned routes depend on the bins' weight, as well as their volume"""
+		return DijkstraRoutePlanner.ALGORITHM == DijkstraRoutePlanner.ALGORITHM_SAVINGS
+
 	def get_route(self, bins, flatten_route=False):
 		# get only the bins that need servicing
 		bins = filter(lambda x: x['has_exceeded_occupancy'], bins)
 
+		if len(bins) == 0:
+			return False
+
 		# choose appropriate algorithm
-		if DijkstraRoutePlanner.ALGORITHM == DijkstraRoutePlanner.ALGORITHM_GREEDY:
-			return self._get_route_greedy(bins, flatten_route)
-		elif DijkstraRoutePlanner.ALGORITHM == DijkstraRoutePlanner.ALGORITHM_PRIORITY:
-			return self._get_route_priority(bins, flatten_route)
-		elif DijkstraRoutePlanner.ALGORITHM == DijkstraRoutePlanner.ALGORITHM_DYNAMIC:
-			l = len(bins)
+		algorithm = self._algorithm(len(bins))
+
+		# the same service sets recur, and so do their routes
+		route_key = self._route_key(algorithm, bins, flatten_route)
+		route = self.route_memo.get(route_key)
+		if route is not None:
+			return route
+
+		if algorithm == DijkstraRoutePlanner.ALGORITHM_PRIORITY:
+			route = self._get_route_priority(bins, flatten_route)
+		elif algorithm == DijkstraRoutePlanner.ALGORITHM_SAVINGS:
+			route = self._get_route_savings(bins, flatten_route)
+		else:
+			route = self._get_route_greedy(bins, flatten_route)
+
+		if DijkstraRoutePlanner.IMPROVEMENT_BUDGET > 0:
+			route = self._improve_route(route, flatten_route)
+
+		self.route_memo.put(route_key, route)
+		return route
+
+	def _algorithm(self, no_bins):
+		"""Returns the algorithm used for the given number of bins"""
+		if DijkstraRoutePlanner.ALGORITHM == DijkstraRoutePlanner.ALGORITHM_DYNAMIC:
 			# if the threshold is reached, choose the greedy, but faster (marginally) algorithm
-			if l > DijkstraRoutePlanner.DYNAMIC_BINS_THRESHOLD:
-				return self._get_route_greedy(bins, flatten_route)
-			else:
-				return self._get_route_priority(bins, flatten_route)
+			if no_bins > DijkstraRoutePlanner.DYNAMIC_BINS_THRESHOLD:
+				return DijkstraRoutePlanner.ALGORITHM_GREEDY
+			return DijkstraRoutePlanner.ALGORITHM_PRIORITY
+
+		if DijkstraRoutePlanner.ALGORITHM in [DijkstraRoutePlanner.ALGORITHM_PRIORITY,
+			DijkstraRoutePlanner.ALGORITHM_SAVINGS]:
+			return DijkstraRoutePlanner.ALGORITHM
+
+		return DijkstraRoutePlanner.ALGORITHM_GREEDY
+
+	def _route_key(self, algorithm, bins, flatten_route):
+		"""
+			Returns the route memo key of the bins to service: the algorithm, the service
+			set as a bitset and what else the algorithm's route depends on - the order of
+			the bins by volume for greedy, the bins' loads for savings.
+		"""
+		service_set = 0
+		for b in bins:
+			service_set |= 1 << b['idx']
+
+		if algorithm == DijkstraRoutePlanner.ALGORITHM_GREEDY:
+			details = tuple([b['idx'] for b in sorted(bins, key = lambda x: x['current_volume'], reverse = True)])
+		elif algorithm == DijkstraRoutePlanner.ALGORITHM_SAVINGS:
+			details = tuple([(b['current_volume'], b['current_weight']) for b in bins])
 		else:
-			return self._get_route_greedy(bins, flatten_route)
+			details = None
+
+		return (algorithm, service_set, details, flatten_route, DijkstraRoutePlanner.IMPROVEMENT_BUDGET)
 			
 
+	def get_route_incremental(self, bins, unserved_route, flatten_route=False):
+		"""
+			Replans a route that was cut short (e.g. by a trip to the depot when the
+			lorry is full): its unserved bins keep their order and trips, bins that
+			need servicing since are inserted (see `_insert_bins`).
+		"""
+		# get only the bins that need servicing
+		bins = filter(lambda x: x['has_exceeded_occupancy'], bins)
+		needed = set([b['idx'] for b in bins])
+
+		trips = [[l for l in trip if l in needed] for trip in self._route_trips(unserved_route)]
+		trips = [trip for trip in trips if len(trip) != 0]
+		if len(trips) == 0:
+			# nothing is left of the route
+			return self.get_route(bins, flatten_route)
+
+		planned = set([l for trip in trips for l in trip])
+		new_bins = [b for b in bins if b['idx'] not in planned]
+		if len(new_bins) != 0:
+			self._insert_bins(trips, new_bins, bins)
+
+		route = self._trips_path(trips, flatten_route)
+		if DijkstraRoutePlanner.IMPROVEMENT_BUDGET <= 0:
+			return route
+
+		return self._improve_route(route, flatten_route)
+
+	def get_waypoints(self, source, target):
+		"""
+			Returns the locations passed (but not serviced) on the shortest path from source to target,
+			with their distances from the source. Flattened routes leave these out, so they are only
+			expanded when needed (for detailed output).
+		"""
+		waypoints = []
+		location = source
+		distance = 0
+		for hop in self._hops(source, target):
+			distance += self.area_map.road_length(location, hop)
+			waypoints.append((hop, distance))
+			location = hop
+
+		return waypoints
+
 	def get_route_to_depot(self, source, include_source = False, flatten_route = False):
 		"""Returns a route to the depot from the given location."""
 		
 		# don't service the depot
-		path = self._dijkstra(source, 0, self.total_nodes, self.area_map, service_target = False, flatten_route = flatten_route)
+		path = self._path(source, 0, service_target = False, flatten_route = flatten_route)
 
 		if include_source:
 			path.insert(0, {
@@ -0,0 +1,207 @@
+import numpy as np
+from heapq import heappush, heappop
+from itertools import izip
+
+class Landmarks(object):
+	"""
+		Goal directed shortest paths with landmarks (ALT: A*, landmarks and the
+		triangle inequality). The distances from and to a few landmark locations are
+		computed up front. For any location v and target t, and every landmark l,
+
+			d(v, t) >= d(l, t) - d(l, v)
+			d(v, t) >= d(v, l) - d(t, l)
+
+		so the largest of these is a lower bound of the distance left, with which
+		A* finds exact shortest paths while visiting few locations away from them.
+		This takes memory linear in the number of locations (two distances per
+		location and landmark), instead of quadratic for all pairs.
+
+		The depot is the first landmark, every next one is the location farthest
+		from (and to) those chosen, so the landmarks end up around the area.
+
+		Searches are counted for the benchmark.
+	"""
+
+	def __init__(self, graph, no_landmarks, shortest_distances, infinity):
+		"""
+			Computes the landmark distances of the graph (see `RoadGraph`). shortest_distances(graph, source)
+			returns the distances from the source to every location of the graph, infinity for unreachable ones.
+		"""
+		self.graph = graph
+		self.reversed_graph = graph.reversed()
+
+		self.infinity = infinity
+
+		N = len(graph)
+		landmarks = []
+		from_landmarks = []
+		to_landmarks = []
+
+		# how far every location is from the closest landmark, there and back
+		score = np.full(N, 2 * infinity, dtype = np.float64)
+		candidate = 0
+		while len(landmarks) < min(no_landmarks, N):
+			landmarks.append(candidate)
+			from_landmarks.append(np.array(shortest_distances(graph, candidate)))
+			if graph.symmetric:
+				to_landmarks.append(from_landmarks[-1])
+			else:
+				to_landmarks.append(np.array(shortest_distances(self.reversed_graph, candidate)))
+
+			np.minimum(score, np.minimum(from_landmarks[-1] + to_landmarks[-1], 2 * infinity), out = score)
+			candidate = int(np.argmax(score))
+			if score[candidate] == 0:
+				# every location is a landmark
+				break
+
+		self.landmarks = landmarks
+		"""The landmark locations"""
+
+		# bounds[v] = [d(l, v) for every landmark l] + [-d(v, l) for every landmark l] + [0]
+		#	so bounds[t] - bounds[v] holds both lower bounds of d(v, t) for every landmark (and 0),
+		#	and the bounds of a location's neighbors are their rows, gathered at once
+		self.bounds = np.ascontiguousarray(np.transpose(from_landmarks + [-d for d in to_landmarks] +
+			[np.zeros(N, dtype = from_landmarks[0].dtype)]))
+
+		self.searches = 0
+		self.visited = 0
+
+	def _bounds(self, locations, target):
+		"""Returns lower bounds of the distances from the locations to the target"""
+		return (self.bounds[target] - self.bounds[locations]).max(axis = -1)
+
+	def _bounds_from(self, locations, source):
+		"""Returns lower bounds of the distances from the source to the locations"""
+		return (self.bounds[locations] - self.bounds[source]).max(axis = -1)
+
+	def search(self, source, target):
+		"""
+			Returns the distance from the source to the target and the locations of a shortest
+			path (without the source), with A*. The path is empty if the target is unreachable.
+		"""
+		indptr, indices, weights = self.graph.indptr, self.graph.indices, self.graph.weights
+
+		dist = { source: 0 }
+		path = { source: source }
+		visited = set()
+
+		q = [(self._bounds(source, target).item(), source)]
+		while q:
+			_, c_i = heappop(q)
+			if c_i in visited:
+				continue
+
+			visited.add(c_i)
+			if c_i == target:
+				break
+
+			start, end = indptr[c_i], indptr[c_i + 1]
+			neighbors = indices[start:end]
+			n_d = weights[start:end] + dist[c_i]
+			bounds = self._bounds(neighbors, target)
+
+			for (n_i, d, bound) in izip(neighbors.tolist(), n_d.tolist(), bounds.tolist()):
+				if d < dist.get(n_i, self.infinity):
+					dist[n_i] = d
+					path[n_i] = c_i
+					heappush(q, (d + bound, n_i))
+
+		self.searches += 1
+		self.visited += len(visited)
+
+		if target not in visited:
+			return self.infinity, []
+
+		locations = [target]
+		while locations[-1] != source:
+			locations.append(path[locations[-1]])
+
+		return dist[target], locations[-2::-1]
+
+	def search_bidirectional(self, source, target):
+		"""
+			Same as `search`, searching from the source and (over the reversed roads) from the target
+			in turns. Both searches use the average of the bounds to the target and from the source
+			(doubled, so integer distances stay integers), which keeps them consistent with each other.
+		"""
+		if source == target:
+			return 0, []
+
+		graphs = [self.graph, self.reversed_graph]
+
+		# index 0 is the forward search, 1 the backward one
+		dist = [{ source: 0 }, { target: 0 }]
+		path = [{ source: source }, { target: target }]
+		visited = [set(), set()]
+
+		def potential(locations, side):
+			potentials = self._bounds(locations, target) - self._bounds_from(locations, source)
+			return potentials if side == 0 else -potentials
+
+		q = [
+			[(potential(source, 0).item(), source)],
+			[(potential(target, 1).item(), target)]
+		]
+
+		# the shortest path found so far, and where its two halves meet
+		best = self.infinity
+		meeting = None
+
+		while q[0] and q[1]:
+			# stop once no path through unvisited locations can be shorter
+			if q[0][0][0] + q[1][0][0] >= 2 * best:
+				break
+
+			side = 0 if q[0][0][0] <= q[1][0][0] else 1
+			_, c_i = heappop(q[side])
+			if c_i in visited[side]:
+				continue
+			visited[side].add(c_i)
+
+			indptr, indices, weights = graphs[side].indptr, graphs[side].indices, graphs[side].weights
+			start, end = indptr[c_i], indptr[c_i + 1]
+			neighbors = indices[start:end]
+			n_d = weights[start:end] + dist[side][c_i]
+			potentials = potential(neighbors, side)
+
+			other = dist[1 - side]
+			for (n_i, d, p) in izip(neighbors.tolist(), n_d.tolist(), potentials.tolist()):
+				if d < dist[side].get(n_i, self.infinity):
+					dist[side][n_i] = d
+					path[side][n_i] = c_i
+					heappush(q[side], (2 * d + p, n_i))
+
+					if n_i in other and d + other[n_i] < best:
+						best = d + other[n_i]
+						meeting = n_i
+
+		self.searches += 1
+		self.visited += len(visited[0]) + len(visited[1])
+
+		if meeting is None:
+			return self.infinity, []
+
+		# the forward half back to the source, then the backward half on to the target
+		locations = [meeting]
+		while locations[-1] != source:
+			locations.append(path[0][locations[-1]])
+		locations = locations[-2::-1]
+
+		location = meeting
+		while location != target:
+			location = path[1][location]
+			locations.append(location)
+
+		return best, locations
+
+	def nbytes(self):
+		"""Returns the memory used by the landmark distances, in bytes"""
+		return self.bounds.nbytes
+
+	def counters(self):
+		"""Returns the number of landmarks, searches and locations visited by them"""
+		return {
+			'landmarks': len(self.landmarks),
+			'searches': self.searches,
+			'visited': self.visited
+		}
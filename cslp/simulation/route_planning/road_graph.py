@@ -0,0 +1,170 @@
+import numpy as np
+
+class RoadGraph(object):
+	"""
+		Road layout of an area in compressed sparse row (CSR) form. The roads
+		leaving location i are
+
+			indices[indptr[i]:indptr[i + 1]] - the locations they lead to
+			weights[indptr[i]:indptr[i + 1]] - their lengths
+
+		This takes a few bytes per road, instead of a dictionary per road, and keeps
+		the roads of a location next to each other in memory.
+
+		For compatibility, the graph still reads as the old layout, a list with
+		the roads of every location as `{ 'index', 'path_length' }` dictionaries,
+		and compares equal to one. It is never changed after construction, so copies
+		(e.g. of the configuration of every area) share it.
+
+		Whether the layout is symmetric (every road has one of the same length
+		back) is found once, when the graph is built: shortest distances of symmetric
+		layouts are the same both ways, so they are stored once (see
+		`TriangularDistances` and `DijkstraRoutePlanner`).
+	"""
+
+	def __init__(self, indptr, indices, weights):
+		self.indptr = np.asarray(indptr, dtype = np.int64)
+		"""Offset of the roads of every location, and the total number of roads"""
+
+		self.indices = np.asarray(indices, dtype = np.int32)
+		"""Location every road leads to"""
+
+		# integer lengths are kept as integers
+		weights = np.asarray(weights)
+		self.weights = weights.astype(np.float64 if len(weights) and weights.dtype.kind == 'f' else np.int64)
+		"""Length of every road"""
+
+		# python lists of the above, see `lists`
+		self._lists = None
+
+		self.symmetric = self._is_symmetric()
+		"""Whether the graph is the same with every road reversed"""
+
+	@staticmethod
+	def from_rows(rows, no_locations = 0):
+		"""
+			Builds the graph from the roads of every location, as lists of
+			(location, length) pairs. Locations missing from the end (at least
+			`no_locations` in total) have no roads.
+		"""
+		indptr = [0]
+		indices = []
+		weights = []
+		for roads in rows:
+			for (index, path_length) in roads:
+				indices.append(index)
+				weights.append(path_length)
+			indptr.append(len(indices))
+
+		indptr += [len(indices)] * (no_locations - len(rows))
+		return RoadGraph(indptr, indices, weights)
+
+	@staticmethod
+	def from_layout(layout, no_locations = 0):
+		"""
+			Returns the graph of a layout in the old form (see above), or the
+			layout itself if it already is a graph with enough locations.
+		"""
+		if isinstance(layout, RoadGraph):
+			if len(layout) >= no_locations:
+				return layout
+
+			padding = [layout.no_roads()] * (no_locations - len(layout))
+			return RoadGraph(np.append(layout.indptr, padding), layout.indices, layout.weights)
+
+		return RoadGraph.from_rows([[(road['index'], road['path_length']) for road in roads] for roads in layout], no_locations)
+
+	def __len__(self):
+		return len(self.indptr) - 1
+
+	def __getitem__(self, i):
+		indices, weights = self.roads(i)
+		return [{ 'index': index, 'path_length': path_length }
+			for (index, path_length) in zip(indices.tolist(), weights.tolist())]
+
+	def __iter__(self):
+		for i in xrange(len(self)):
+			yield self[i]
+
+	def __eq__(self, other):
+		if isinstance(other, RoadGraph):
+			return self.rows() == other.rows()
+
+		if isinstance(other, list):
+			return len(self) == len(other) and all([self[i] == other[i] for i in xrange(len(self))])
+
+		return NotImplemented
+
+	def __ne__(self, other):
+		equal = self.__eq__(other)
+		return equal if equal is NotImplemented else not equal
+
+	def __repr__(self):
+		return repr(list(self))
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self, memo):
+		return self
+
+	def roads(self, i):
+		"""Returns the locations the roads from location i lead to and their lengths, as arrays"""
+		start, end = self.indptr[i], self.indptr[i + 1]
+		return self.indices[start:end], self.weights[start:end]
+
+	def road_length(self, i, j):
+		"""Returns the length of the shortest road from location i to j"""
+		indices, weights = self.roads(i)
+		return weights[indices == j].min().item()
+
+	def rows(self):
+		"""Returns the roads of every location, as lists of (location, length) pairs"""
+		indptr, indices, weights = self.lists()
+		return [zip(indices[indptr[i]:indptr[i + 1]], weights[indptr[i]:indptr[i + 1]]) for i in xrange(len(self))]
+
+	def lists(self):
+		"""
+			Returns the arrays as python lists, for searches that visit roads one at a
+			time (faster than indexing arrays). These are made once per graph.
+		"""
+		if self._lists is None:
+			self._lists = (self.indptr.tolist(), self.indices.tolist(), self.weights.tolist())
+		return self._lists
+
+	def no_roads(self):
+		"""Returns the number of roads"""
+		return len(self.indices)
+
+	def sources(self):
+		"""Returns the location every road leaves from"""
+		return np.repeat(np.arange(len(self), dtype = np.int32), np.diff(self.indptr))
+
+	def _is_symmetric(self):
+		"""Returns whether the roads, sorted by (source, location, length), match the reversed roads sorted the same way"""
+		sources = self.sources()
+		forward = np.lexsort((self.weights, self.indices, sources))
+		backward = np.lexsort((self.weights, sources, self.indices))
+
+		return (np.array_equal(sources[forward], self.indices[backward]) and
+			np.array_equal(self.indices[forward], sources[backward]) and
+			np.array_equal(self.weights[forward], self.weights[backward]))
+
+	def reversed(self):
+		"""
+			Returns the graph with every road reversed, its roads sorted by location as in this one.
+			A symmetric graph is its own reverse.
+		"""
+		if self.symmetric:
+			return self
+
+		# a stable sort keeps the roads to a location in the order of their sources
+		order = np.argsort(self.indices, kind = 'mergesort')
+		indptr = np.zeros(len(self) + 1, dtype = np.int64)
+		np.cumsum(np.bincount(self.indices, minlength = len(self)), out = indptr[1:])
+
+		return RoadGraph(indptr, self.sources()[order], self.weights[order])
+
+	def nbytes(self):
+		"""Returns the memory used by the arrays, in bytes"""
+		return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
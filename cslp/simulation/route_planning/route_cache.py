@@ -0,0 +1,98 @@
+class RouteCache(object):
+	"""
+		Bounded route cache with CLOCK eviction. Keys are integers for
+		paths and tuples for whole routes (see `DijkstraRoutePlanner`).
+
+		Entries are kept in slots around a clock. Each slot has a reference
+		bit, set when the entry is looked up. When the cache is full, the
+		hand sweeps the clock, clearing reference bits, and evicts the first
+		entry that was not looked up since the hand last passed it. New
+		entries start unreferenced, so routes that are never reused are evicted
+		before the ones that are.
+
+		Hits, misses and evictions are counted for the benchmark.
+	"""
+
+	def __init__(self, capacity):
+		self.capacity = max(0, capacity)
+		"""Maximum number of entries"""
+
+		# key -> slot
+		self.slots = {}
+
+		# slot contents, grown up to the capacity
+		self.keys = []
+		self.values = []
+		self.referenced = []
+
+		# the slot the clock hand is at
+		self.hand = 0
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self.slots)
+
+	def __contains__(self, key):
+		return key in self.slots
+
+	def get(self, key):
+		"""Returns the entry with the given key, or None if not cached."""
+		slot = self.slots.get(key)
+		if slot is None:
+			self.misses += 1
+			return None
+
+		self.hits += 1
+		self.referenced[slot] = True
+		return self.values[slot]
+
+	def put(self, key, value):
+		"""Adds an entry, evicting another one if the cache is full."""
+		if self.capacity == 0:
+			return
+
+		slot = self.slots.get(key)
+		if slot is not None:
+			self.values[slot] = value
+			return
+
+		if len(self.keys) < self.capacity:
+			self.slots[key] = len(self.keys)
+			self.keys.append(key)
+			self.values.append(value)
+			self.referenced.append(False)
+			return
+
+		slot = self._evict()
+		self.slots[key] = slot
+		self.keys[slot] = key
+		self.values[slot] = value
+		self.referenced[slot] = False
+
+	def _evict(self):
+		"""Evicts an entry and returns its (free) slot."""
+		referenced = self.referenced
+
+		# give entries that were looked up a second chance
+		while referenced[self.hand]:
+			referenced[self.hand] = False
+			self.hand = (self.hand + 1) % self.capacity
+
+		slot = self.hand
+		self.hand = (self.hand + 1) % self.capacity
+
+		del self.slots[self.keys[slot]]
+		self.evictions += 1
+
+		return slot
+
+	def counters(self):
+		"""Returns the hit, miss and eviction counts."""
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions
+		}
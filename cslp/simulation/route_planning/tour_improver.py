@@ -0,0 +1,135 @@
+from timeit import default_timer as timer
+
+class TourImprover(object):
+	"""
+		Local search over the order of the bins of a trip, from and to the depot.
+		Applies improving 2-opt moves (reversing a part of the trip) and Or-opt moves
+		(moving up to `OR_OPT_SEGMENT` consecutive bins elsewhere in the trip) until
+		neither improves the trip or the time budget is spent.
+
+		Roads can be one way, so reversals account for the length of the reversed part,
+		from prefix sums of the trip's legs in both directions.
+
+		The trip length saved is counted for the benchmark, as is the time spent, which
+		the caller adds (see `add_time`) so it includes preparing the distances.
+	"""
+
+	OR_OPT_SEGMENT = 3
+	"""Longest run of bins moved by Or-opt"""
+
+	EPSILON = 1e-9
+	"""Smallest improvement, so rounding never causes endless moves"""
+
+	def __init__(self):
+		self.trips = 0
+		self.length_before = 0
+		self.length_saved = 0
+		self.time_spent = 0
+
+	def improve(self, distances, deadline):
+		"""
+			Improves the trip visiting locations 1..n of the distance matrix in order,
+			starting and ending at location 0. Returns the new order of 1..n. Stops
+			at the deadline (a `timeit.default_timer` time).
+		"""
+		n = len(distances) - 1
+		tour = range(n + 1) + [0]
+		length_before = self._length(tour, distances)
+
+		improved = True
+		while improved and timer() < deadline:
+			improved = self._two_opt(tour, distances, deadline)
+			improved = self._or_opt(tour, distances, deadline) or improved
+
+		self.trips += 1
+		self.length_before += length_before
+		self.length_saved += length_before - self._length(tour, distances)
+
+		return tour[1:-1]
+
+	def _length(self, tour, d):
+		return sum([d[tour[k]][tour[k + 1]] for k in xrange(len(tour) - 1)])
+
+	def _prefix_lengths(self, tour, d):
+		"""
+			Returns the lengths of the trip up to every position, forwards
+			and with every leg travelled backwards.
+		"""
+		forward = [0]
+		backward = [0]
+		for k in xrange(len(tour) - 1):
+			forward.append(forward[-1] + d[tour[k]][tour[k + 1]])
+			backward.append(backward[-1] + d[tour[k + 1]][tour[k]])
+
+		return forward, backward
+
+	def _two_opt(self, tour, d, deadline):
+		"""Reverses parts of the trip while that shortens it, returns whether it did"""
+		improved = False
+		n = len(tour) - 2
+		forward, backward = self._prefix_lengths(tour, d)
+
+		for i in xrange(1, n):
+			if timer() >= deadline:
+				break
+
+			for j in xrange(i + 1, n + 1):
+				# tour[i..j] reversed
+				delta = d[tour[i - 1]][tour[j]] + (backward[j] - backward[i]) + d[tour[i]][tour[j + 1]] - \
+					(d[tour[i - 1]][tour[i]] + (forward[j] - forward[i]) + d[tour[j]][tour[j + 1]])
+
+				if delta < -TourImprover.EPSILON:
+					tour[i:j + 1] = tour[i:j + 1][::-1]
+					forward, backward = self._prefix_lengths(tour, d)
+					improved = True
+
+		return improved
+
+	def _or_opt(self, tour, d, deadline):
+		"""Moves runs of bins elsewhere while that shortens the trip, returns whether it did"""
+		improved = False
+		n = len(tour) - 2
+
+		for length in xrange(1, min(TourImprover.OR_OPT_SEGMENT, n - 1) + 1):
+			i = 1
+			while i + length - 1 <= n:
+				if timer() >= deadline:
+					return improved
+
+				# tour[i..e] is moved
+				e = i + length - 1
+				removal = d[tour[i - 1]][tour[e + 1]] - d[tour[i - 1]][tour[i]] - d[tour[e]][tour[e + 1]]
+
+				moved = False
+				for p in xrange(0, n + 1):
+					# between tour[p] and tour[p + 1], outside of the run
+					if i - 1 <= p <= e:
+						continue
+
+					delta = removal + d[tour[p]][tour[i]] + d[tour[e]][tour[p + 1]] - d[tour[p]][tour[p + 1]]
+					if delta < -TourImprover.EPSILON:
+						segment = tour[i:e + 1]
+						if p < i:
+							tour[p + 1:e + 1] = segment + tour[p + 1:i]
+						else:
+							tour[i:p + 1] = tour[e + 1:p + 1] + segment
+						improved = moved = True
+						break
+
+				if not moved:
+					i += 1
+
+		return improved
+
+	def add_time(self, time):
+		"""Counts time (in seconds) spent improving trips"""
+		self.time_spent += time
+
+	def counters(self):
+		"""Returns the number of trips improved, their length before, the length saved and the time spent."""
+		return {
+			'trips': self.trips,
+			'length_before': self.length_before,
+			'length_saved': self.length_saved,
+			'time_spent': self.time_spent
+		}
@@ -0,0 +1,88 @@
+import numpy as np
+
+class TriangularDistances(object):
+	"""
+		Distances between all pairs of locations of a symmetric area (where d(i, j) = d(j, i)),
+		keeping only the upper triangle, row by row:
+
+			d(0, 0), d(0, 1), ..., d(0, N - 1), d(1, 1), ..., d(1, N - 1), ..., d(N - 1, N - 1)
+
+		Integer distances are packed in the smallest unsigned type they fit, with its largest
+		value for unreachable locations, so e.g. an area with distances below 255 takes one byte
+		per pair instead of sixteen (eight for d(i, j) and d(j, i) each).
+
+		Indexing works as on the full matrix: `distances[i]` is the row of i, `distances[i, j]`
+		a distance and `distances[np.ix_(a, b)]` a submatrix, unpacked to int64 (or float64).
+	"""
+
+	# unsigned types, from the smallest
+	TYPES = [np.uint8, np.uint16, np.uint32, np.uint64]
+
+	def __init__(self, packed, N, infinity):
+		self.packed = packed
+		"""The upper triangle, see above"""
+
+		self.N = N
+		self.shape = (N, N)
+		self.infinity = infinity
+
+		# the distance type returned, and the value of unreachable locations in the packed array
+		if packed.dtype.kind == 'f':
+			self.dtype = np.float64
+			self.unreachable = None
+		else:
+			self.dtype = np.int64
+			self.unreachable = np.iinfo(packed.dtype).max
+
+		self.columns = np.arange(N)
+
+	@staticmethod
+	def size(N):
+		"""Returns the number of distances in the upper triangle"""
+		return N * (N + 1) // 2
+
+	@staticmethod
+	def pack(distances, infinity):
+		"""Packs the upper triangle of a (symmetric) distance matrix"""
+		N = len(distances)
+		upper = distances[np.triu_indices(N)]
+		if upper.dtype.kind == 'f':
+			return TriangularDistances(upper.astype(np.float64), N, infinity)
+
+		# the largest value of the type is kept for unreachable locations
+		reachable = upper < infinity
+		longest = upper[reachable].max() if reachable.any() else 0
+		dtype = [t for t in TriangularDistances.TYPES if longest < np.iinfo(t).max][0]
+
+		return TriangularDistances(np.where(reachable, upper, np.iinfo(dtype).max).astype(dtype), N, infinity)
+
+	def __len__(self):
+		return self.N
+
+	def __getitem__(self, key):
+		if isinstance(key, tuple):
+			rows, columns = key
+		else:
+			rows, columns = key, self.columns
+
+		# offset of (i, j) in the upper triangle, for i <= j
+		rows = np.asarray(rows, dtype = np.int64)
+		columns = np.asarray(columns, dtype = np.int64)
+		low = np.minimum(rows, columns)
+		high = np.maximum(rows, columns)
+		values = self.packed[low * (2 * self.N - low - 1) // 2 + high]
+
+		if self.unreachable is None:
+			return values.astype(self.dtype)
+
+		return np.where(values == self.unreachable, self.infinity, values.astype(self.dtype))
+
+	def max(self):
+		return self[np.ix_(self.columns, self.columns)].max() if self.N != 0 else self.infinity
+
+	def tolist(self):
+		return [self[i].tolist() for i in xrange(self.N)]
+
+	@property
+	def nbytes(self):
+		return self.packed.nbytes
@@ -1,6 +1,6 @@
 import numpy as np
 
-class StatisticsAggregator:
+class StatisticsAggregator(object):
 	DELIMITER = "---"
 
 	AREA_TRIP_DURATION = "area {0}: average trip duration {1}:{2}"
@@ -18,19 +18,53 @@ class StatisticsAggregator:
 	AREA_PERCENTAGE_BINS_OVERFLOWED = "area {0}: percentage of bins overflowed {1:.3f}"
 	OVERALL_PERCENTAGE_BINS_OVERFLOWED = "overall percentage of bins overflowed {0:.3f}"
 
+	EVENT_TYPES = [
+		'lorry_departure',
+		'lorry_arrival',
+		'lorry_load_changed',
+		'service_time',
+		'bins_overflowed_at_service_time'
+	]
+	"""Events the statistics are collected from"""
+
 	def __init__(self, config, event_dispatcher):
 		"""Collects and outputs various statistics"""
 
-		# define the main handler
-		# 	attach to *all* areas
-		event_dispatcher.attach_observer(self._on_event, None)
+		self.event_dispatcher = event_dispatcher
+
+		# codes of the above, compared with the events' codes
+		(self.lorry_departure, self.lorry_arrival, self.lorry_load_changed, self.service_time,
+			self.bins_overflowed_at_service_time) = [event_dispatcher.type_code(type) for type in StatisticsAggregator.EVENT_TYPES]
+
+		# the handler is only attached while enabled, so that no
+		#	events are generated for statistics that are not needed
+		self._enabled = False
+		self.enabled = True
+
 		self.reset(config)
 
+	@property
+	def enabled(self):
+		return self._enabled
+
+	@enabled.setter
+	def enabled(self, enabled):
+		if enabled and not self._enabled:
+			# define the main handler
+			# 	attach to *all* areas, only for the events we need
+			self.event_dispatcher.attach_observer(self._on_event, None, StatisticsAggregator.EVENT_TYPES)
+		elif not enabled and self._enabled:
+			self.event_dispatcher.remove_observer(self._on_event, None)
+
+		self._enabled = enabled
+
 	def _on_event(self, event):
 		if event.time <= self.warm_up_time:
 			return
 
-		if event.type == 'lorry_departure' and event.data['location'] == 0:
+		code = event.code
+
+		if code == self.lorry_departure and event.payload[1] == 0:
 			# this happens when a lorry departs, but not for the current
 			#	schedule, but rather for a schedule that started before warmUpTime,
 			#	which it didn't manage to fulfill. This is a very odd edge-case
@@ -50,33 +84,33 @@ class StatisticsAggregator:
 			# this is a new trip for the current schedule
 			self.trips_per_schedule[event.area_index][-1] += 1
 
-		elif event.type == 'lorry_arrival':
+		elif code == self.lorry_arrival:
 			trip = self.current_trip[event.area_index]
 			# this can happen is the trip started before the warm up time
 			if trip is None:
 				return
 
-			if event.data['location'] == 0:
+			if event.payload[1] == 0:
 				# end of trip
 				trip['end_time'] = event.time
 				self.current_trip[event.area_index] = None
 
-		elif event.type == 'lorry_load_changed':
+		elif code == self.lorry_load_changed:
 			trip = self.current_trip[event.area_index]
 			# again, dont' record anything about trips that started before
 			#	warmuptime
 			if trip is None:
 				return
 
-			trip['volume_collected'] = event.data['lorry_volume']
-			trip['weight_collected'] = event.data['lorry_weight']
+			trip['volume_collected'] = event.payload[1]
+			trip['weight_collected'] = event.payload[2]
 
-		elif event.type == 'service_time':
+		elif code == self.service_time:
 			# append a new counter for the schedule
 			self.trips_per_schedule[event.area_index].append(0)
 
-		elif event.type == 'bins_overflowed_at_service_time':
-			self.overflowed_bins[event.area_index].append(event.data['no_bins'])
+		elif code == self.bins_overflowed_at_service_time:
+			self.overflowed_bins[event.area_index].append(event.payload[0])
 	
 	def reset(self, config):
 		self.config = config
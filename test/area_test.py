@@ -1,18 +1,21 @@
 #!/usr/bin/env python2.7
 import unittest
 import pprint
+import numpy as np
 from cslp.simulation.area import Area
 from cslp.simulation.event_dispatcher import Event, EventDispatcher
 from copy import deepcopy
 from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
 
 class DummyRoutePlanner:
-	def __init__(self, area_map, total_nodes, lorry_capacity = None, threshold_val = None):
+	def __init__(self, area_map, total_nodes, lorry_capacity = None, depot_time = 0):
 		pass
 	def get_route(self, bins, flatten_route=False):
 		return False
 	def get_route_to_depot(self, source, include_source = False, flatten_route = False):
 		return False
+	def uses_loads(self):
+		return False
 
 class AreaTest(unittest.TestCase):
 	"""
@@ -69,6 +72,13 @@ class AreaTest(unittest.TestCase):
 		]
 	}
 
+	def setUp(self):
+		# most tests below look at every event in the queue, observed or not
+		Area.EMIT_UNOBSERVED_EVENTS = True
+
+	def tearDown(self):
+		Area.EMIT_UNOBSERVED_EVENTS = False
+
 	def test_observer_subscription(self):
 		"""
 			Test that the area attaches an observer.
@@ -184,6 +194,171 @@ class AreaTest(unittest.TestCase):
 			e.type == 'bin_occupancy_exceeded' and e.data['bin_idx'] == disposed_location]
 		self.assertEqual(len(new_events), 1)
 
+	def test_unobserved_events(self):
+		"""
+			Test that informational events are only emitted when observed.
+		"""
+		Area.EMIT_UNOBSERVED_EVENTS = False
+		try:
+			dispatcher = EventDispatcher(AreaTest.test_area_config['stopTime'],
+				AreaTest.test_area_config['noAreas'])
+			area = Area(deepcopy(AreaTest.test_area_config), dispatcher, DummyRoutePlanner)
+			area.init()
+
+			# nobody listens to load changes, so only disposals follow
+			dispatcher.next_event()
+			self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_load_changed']), 0)
+			self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_disposal']), 5)
+
+			# once observed, load changes are emitted again
+			loads = []
+			dispatcher.attach_observer(loads.append, 0, ['bin_load_changed'])
+			area.init()
+			dispatcher.next_event()
+			self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_load_changed']), 1)
+		finally:
+			Area.EMIT_UNOBSERVED_EVENTS = False
+
+	def test_superposed_disposals(self):
+		"""
+			Test that with exponential delays, areas keep one disposal event for all bins.
+		"""
+		config = deepcopy(AreaTest.test_area_config)
+		config['disposalDistrShape'] = 1
+
+		# off by default
+		dispatcher = EventDispatcher(config['stopTime'], config['noAreas'])
+		area = Area(config, dispatcher, DummyRoutePlanner)
+		area.init()
+		self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_disposal']), 5)
+
+		np.random.seed(1)
+		Area.SUPERPOSITION_ENABLED = True
+		try:
+			dispatcher = EventDispatcher(config['stopTime'], config['noAreas'])
+			area = Area(config, dispatcher, DummyRoutePlanner)
+			area.init()
+		finally:
+			Area.SUPERPOSITION_ENABLED = False
+
+		disposals = []
+		dispatcher.attach_observer(disposals.append, 0, ['bin_disposal'])
+		self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_disposal']), 1)
+
+		# every disposal schedules the next one, at any bin
+		while len(disposals) < 200:
+			self.assertNotEqual(dispatcher.next_event(), False)
+			self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_disposal']), 1)
+
+		self.assertEqual(set([e.data['bin_idx'] for e in disposals]), set([1, 2, 3, 4, 5]))
+
+		# on average, 5 bins at rate 2 dispose of 10 bags an hour
+		hours = disposals[-1].time / 3600.0
+		self.assertAlmostEqual(len(disposals) / hours, 10, delta = 1.5)
+
+
+	def test_aggregated_disposals(self):
+		"""
+			Test that aggregated bins only generate events at threshold crossings
+			and are brought up to date when read.
+		"""
+		Area.EMIT_UNOBSERVED_EVENTS = False
+		Area.DISPOSAL_MODE = Area.DISPOSAL_AGGREGATED
+		try:
+			dispatcher = EventDispatcher(AreaTest.test_area_config['stopTime'],
+				AreaTest.test_area_config['noAreas'])
+			area = Area(deepcopy(AreaTest.test_area_config), dispatcher, DummyRoutePlanner)
+			area.init()
+
+			# only the service event, no disposals
+			self.assertEqual(area.disposal_mode, Area.DISPOSAL_AGGREGATED)
+			self.assertEqual([e.type for e in dispatcher.events], ['service_time'])
+
+			# 0.05 * 31 > 0.75 * 2 and 0.05 * 41 > 2
+			self.assertEqual((area.threshold_bags, area.overflow_bags), (31, 41))
+
+			bin = area.bins[1]
+			arrivals = area.bag_arrivals[1]
+			self.assertEqual(len(arrivals), 41)
+			self.assertEqual(arrivals, sorted(arrivals))
+
+			# read the bin just after the threshold was exceeded
+			dispatcher.now = arrivals[30]
+			area._update_bin(bin, weigh = True)
+			self.assertTrue(bin['has_exceeded_occupancy'])
+			self.assertFalse(bin['has_overflowed'])
+			self.assertAlmostEqual(bin['current_volume'], 31 * 0.05)
+			self.assertTrue(31 * 2 <= bin['current_weight'] <= 31 * 8)
+
+			# once overflowed, the bin does not change
+			dispatcher.now = arrivals[-1] + 1000
+			area._update_bin(bin)
+			self.assertTrue(bin['has_overflowed'])
+			self.assertAlmostEqual(bin['current_volume'], 41 * 0.05)
+
+			# observing overflows schedules them for every bin
+			overflows = []
+			dispatcher.attach_observer(overflows.append, 0, ['bin_overflow'])
+			dispatcher.reset()
+			area.reset(area.config)
+			area.init()
+			self.assertEqual(len([e for e in dispatcher.events if e.type == 'bin_level_reached']), 5)
+
+			# bins overflow on their last bag, if before the stop time
+			overflow_times = dict([(i, area.bag_arrivals[i][-1]) for i in xrange(1, 6)])
+			while dispatcher.next_event() is not False:
+				pass
+			self.assertEqual(sorted([(e.data['bin_idx'], e.time) for e in overflows]),
+				[(i, t) for (i, t) in sorted(overflow_times.items()) if t <= dispatcher.stop_time])
+			self.assertTrue(all([e.data['occupancy'] > 1 for e in overflows]))
+		finally:
+			Area.EMIT_UNOBSERVED_EVENTS = False
+			Area.DISPOSAL_MODE = Area.DISPOSAL_PER_BAG
+
+	def test_disposal_timelines(self):
+		"""
+			Test that timeline bins are sampled until the stop time and
+			updated from the timelines, also after being emptied.
+		"""
+		Area.EMIT_UNOBSERVED_EVENTS = False
+		Area.DISPOSAL_MODE = Area.DISPOSAL_TIMELINE
+		try:
+			dispatcher = EventDispatcher(AreaTest.test_area_config['stopTime'],
+				AreaTest.test_area_config['noAreas'])
+			area = Area(deepcopy(AreaTest.test_area_config), dispatcher, DummyRoutePlanner)
+			area.init()
+
+			# no disposal events, every timeline goes past the stop time
+			self.assertEqual([e.type for e in dispatcher.events], ['service_time'])
+			self.assertEqual(area.bag_times.shape[0], 5)
+			self.assertTrue(all(area.bag_times[:, -1] > dispatcher.stop_time))
+
+			# all bins updated at once agree with updating them one by one
+			for now in [0, 20000, 40000, 80000]:
+				dispatcher.now = now
+				area._update_bins()
+				volumes = [bin['current_volume'] for bin in area.bins[1:]]
+				for bin in area.bins[1:]:
+					area._update_bin(bin)
+				self.assertEqual(volumes, [bin['current_volume'] for bin in area.bins[1:]])
+
+			# empty the first bin, only later bags count
+			bin = area.bins[1]
+			times = area.bag_times[0]
+			dispatcher.now = int(times[9])
+			area._update_bin(bin, weigh = True)
+			self.assertAlmostEqual(bin['current_volume'], 10 * 0.05)
+			self.assertAlmostEqual(bin['current_weight'], area.bag_weights[0][10])
+
+			area._start_bin_cycle(bin)
+			dispatcher.now = int(times[12])
+			area._update_bin(bin, weigh = True)
+			self.assertAlmostEqual(bin['current_volume'], 3 * 0.05)
+			self.assertAlmostEqual(bin['current_weight'], area.bag_weights[0][13] - area.bag_weights[0][10])
+		finally:
+			Area.EMIT_UNOBSERVED_EVENTS = False
+			Area.DISPOSAL_MODE = Area.DISPOSAL_PER_BAG
+
 	def test_lorry_dispatch(self):
 		config = {
 			'lorryVolume': 2,
@@ -439,3 +614,329 @@ class AreaTest(unittest.TestCase):
 		# service time is 130 seconds
 		self.assertEqual((e.time, e.type, e.data), (3601, 'service_time', None))
 
+	def test_savings_trips(self):
+		config = {
+			'lorryVolume': 2,
+			'lorryMaxLoad': 7000,
+			'binServiceTime': 130,
+			'binVolume': 2,
+			'disposalDistrRate': 2.0,
+			'disposalDistrShape': 2,
+			'bagVolume': 0.05,
+			'bagWeightMin': 2,
+			'bagWeightMax': 8,
+			'stopTime': 360 * 60 * 60,
+			'warmUpTime': 12.0,
+			'noAreas': 1,
+			'noBins': 5,
+			'serviceFreq': 1,
+			'thresholdVal': 0.75,
+			'areaIdx': 0,
+			'roadsLayout': [
+				[
+					{ 'index': 1, 'path_length': 2 },
+					{ 'index': 2, 'path_length': 4 }
+				],
+				[
+					{ 'index': 2, 'path_length': 1 },
+				],
+				[
+					{ 'index': 0, 'path_length': 3 },
+					{ 'index': 3, 'path_length': 2 },
+				],
+				[
+					{ 'index': 2, 'path_length': 2 },
+				]
+			]
+		}
+
+		dispatcher = EventDispatcher(30000, 1)
+		DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_SAVINGS
+		try:
+			area = Area(config, dispatcher, DijkstraRoutePlanner)
+		finally:
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
+
+		lorry_events = []
+		dispatcher.attach_observer(lambda e: lorry_events.append((e.time, e.type, e.data)), 0,
+			['lorry_departure', 'lorry_arrival', 'trip_completed', 'lorry_available'])
+		dispatcher.events = [
+			Event(time = 1, area_index = 0, type = 'service_time'),
+		]
+
+		# both bins don't fit in the lorry (1.5 + 1 compressed volume), so two trips are planned
+		area.bins[2]['current_weight'] = 1
+		area.bins[2]['current_volume'] = 3
+		area.bins[2]['has_exceeded_occupancy'] = True
+		area.bins[3]['current_weight'] = 5
+		area.bins[3]['current_volume'] = 2
+		area.bins[3]['has_exceeded_occupancy'] = True
+
+		DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_SAVINGS
+		try:
+			while dispatcher.next_event() is not False and dispatcher.now < 1441:
+				pass
+		finally:
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
+
+		# the fuller bin first, then back to the depot and on to the other bin,
+		#	without arriving at a bin the lorry cannot empty
+		self.assertEqual(lorry_events, [
+			(1, 'lorry_departure', { 'lorry_idx': 0, 'location': 0 }),
+			(181, 'lorry_arrival', { 'lorry_idx': 0, 'location': 2 }),
+			(311, 'lorry_departure', { 'lorry_idx': 0, 'location': 2 }),
+			(491, 'lorry_arrival', { 'lorry_idx': 0, 'location': 0 }),
+			(491, 'trip_completed', { 'lorry_idx': 0 }),
+			(1141, 'lorry_available', { 'lorry_idx': 0 }),
+			(1141, 'lorry_departure', { 'lorry_idx': 0, 'location': 0 }),
+			(1441, 'lorry_arrival', { 'lorry_idx': 0, 'location': 3 })
+		])
+		self.assertEqual(area.lorry['current_volume'], 0)
+		self.assertTrue(area.lorry['busy'])
+
+	def test_savings_aggregated(self):
+		"""
+			Test that aggregated bins are weighed before the savings algorithm plans their trips.
+		"""
+		np.random.seed(2)
+		config = deepcopy(AreaTest.test_area_config)
+		# about two bins' worth of bags
+		config['lorryMaxLoad'] = 350
+
+		Area.EMIT_UNOBSERVED_EVENTS = False
+		Area.DISPOSAL_MODE = Area.DISPOSAL_AGGREGATED
+		DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_SAVINGS
+		try:
+			dispatcher = EventDispatcher(config['stopTime'], config['noAreas'])
+			area = Area(config, dispatcher, DijkstraRoutePlanner)
+			area.init()
+
+			routes = []
+			get_route = area.route_planner.get_route
+			def record_route(bins, flatten_route = False):
+				route = get_route(bins, flatten_route)
+				weights = dict((b['idx'], b['current_weight']) for b in bins if b['has_exceeded_occupancy'])
+				routes.append((weights, route))
+				return route
+			area.route_planner.get_route = record_route
+
+			while dispatcher.next_event() is not False:
+				pass
+		finally:
+			Area.DISPOSAL_MODE = Area.DISPOSAL_PER_BAG
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
+
+		routes = [(weights, route) for (weights, route) in routes if route]
+		self.assertTrue(len(routes) > 0)
+		for (weights, route) in routes:
+			# every bin to service has at least 31 bags of 2 to 8 kg
+			self.assertTrue(all([62 <= weight <= 8 * 41 for weight in weights.values()]))
+
+			# trips (ending at the depot) fit the lorry, unless a single bin does not
+			trip = []
+			for step in route:
+				if step['target'] != 0:
+					trip.append(weights[step['target']])
+					continue
+				self.assertTrue(len(trip) == 1 or sum(trip) <= config['lorryMaxLoad'])
+				trip = []
+
+	def test_incremental_replanning(self):
+		config = {
+			'lorryVolume': 2,
+			'lorryMaxLoad': 7000,
+			'binServiceTime': 130,
+			'binVolume': 2,
+			'disposalDistrRate': 2.0,
+			'disposalDistrShape': 2,
+			'bagVolume': 0.05,
+			'bagWeightMin': 2,
+			'bagWeightMax': 8,
+			'stopTime': 360 * 60 * 60,
+			'warmUpTime': 12.0,
+			'noAreas': 1,
+			'noBins': 5,
+			'serviceFreq': 1,
+			'thresholdVal': 0.75,
+			'areaIdx': 0,
+			'roadsLayout': [
+				[
+					{ 'index': 1, 'path_length': 2 },
+					{ 'index': 2, 'path_length': 4 }
+				],
+				[
+					{ 'index': 2, 'path_length': 1 },
+				],
+				[
+					{ 'index': 0, 'path_length': 3 },
+					{ 'index': 3, 'path_length': 2 },
+				],
+				[
+					{ 'index': 2, 'path_length': 2 },
+				]
+			]
+		}
+
+		dispatcher = EventDispatcher(30000, 1)
+		area = Area(config, dispatcher, DijkstraRoutePlanner)
+		dispatcher.events = [
+			Event(time = 1, area_index = 0, type = 'service_time'),
+		]
+
+		# as in test_lorry_dispatch, the lorry cannot empty bin 3 after bin 2
+		area.bins[2]['current_weight'] = 1
+		area.bins[2]['current_volume'] = 3
+		area.bins[2]['has_exceeded_occupancy'] = True
+		area.bins[3]['current_weight'] = 5
+		area.bins[3]['current_volume'] = 2
+		area.bins[3]['has_exceeded_occupancy'] = True
+
+		incremental_routes = []
+		get_route_incremental = area.route_planner.get_route_incremental
+		def record_route(bins, unserved_route, flatten_route = False):
+			incremental_routes.append([step['target'] for step in unserved_route])
+			return get_route_incremental(bins, unserved_route, flatten_route)
+		area.route_planner.get_route_incremental = record_route
+
+		Area.INCREMENTAL_REPLANNING = True
+		try:
+			# up to the forced trip to the depot
+			while dispatcher.now < 431:
+				dispatcher.next_event()
+			self.assertEqual([step['target'] for step in area.lorry['unserved_route']], [3, 0])
+
+			# bin 1 needs servicing while the lorry is emptied
+			area.bins[1]['current_weight'] = 1
+			area.bins[1]['current_volume'] = 1
+			area.bins[1]['has_exceeded_occupancy'] = True
+			while dispatcher.now < 1381:
+				dispatcher.next_event()
+		finally:
+			Area.INCREMENTAL_REPLANNING = False
+
+		# the rest of the route is kept, bin 1 is added where it costs least
+		self.assertEqual(incremental_routes, [[3, 0]])
+		self.assertEqual([step['target'] for step in area.lorry['current_route']], [1, 3, 0])
+		self.assertEqual(area.lorry['unserved_route'], None)
+
+	def test_incremental_replanning_timeline(self):
+		"""
+			Test that timeline bins are weighed before new bins are inserted in the unserved route.
+		"""
+		np.random.seed(3)
+		config = deepcopy(AreaTest.test_area_config)
+		# about two bins' worth of bags
+		config['lorryMaxLoad'] = 350
+
+		Area.EMIT_UNOBSERVED_EVENTS = False
+		Area.DISPOSAL_MODE = Area.DISPOSAL_TIMELINE
+		try:
+			dispatcher = EventDispatcher(config['stopTime'], config['noAreas'])
+			area = Area(config, dispatcher, DijkstraRoutePlanner)
+			area.init()
+		finally:
+			Area.DISPOSAL_MODE = Area.DISPOSAL_PER_BAG
+
+		routes = []
+		get_route_incremental = area.route_planner.get_route_incremental
+		def record_route(bins, unserved_route, flatten_route = False):
+			route = get_route_incremental(bins, unserved_route, flatten_route)
+			weights = dict((b['idx'], b['current_weight']) for b in bins if b['has_exceeded_occupancy'])
+			routes.append((weights, route))
+			return route
+		area.route_planner.get_route_incremental = record_route
+
+		# the lorry was sent to the depot before bin 1, the other bins filled up since
+		dispatcher.now = int(max([area.bag_times[i][area.threshold_bags - 1] for i in xrange(5)]))
+		area.lorry['unserved_route'] = [{ 'target': 1, 'service': True }, { 'target': 0, 'service': False }]
+		area._on_service_time(Event(dispatcher.now, 0, Event.SERVICE_TIME), skip_service_event = True)
+
+		self.assertEqual(len(routes), 1)
+		weights, route = routes[0]
+		self.assertEqual(sorted(weights.keys()), [1, 2, 3, 4, 5])
+
+		# every bin to service has at least 31 bags of 2 to 8 kg
+		self.assertTrue(all([62 <= weight <= 8 * 41 for weight in weights.values()]))
+
+		# bins are only added to trips they fit in
+		trip = []
+		for step in route:
+			if step['target'] != 0:
+				trip.append(weights[step['target']])
+				continue
+			self.assertTrue(len(trip) == 1 or sum(trip) <= config['lorryMaxLoad'])
+			trip = []
+		self.assertTrue(len([step for step in route if step['target'] == 0]) >= 3)
+
+	def test_lorry_waypoints(self):
+		config = {
+			'lorryVolume': 20,
+			'lorryMaxLoad': 7000,
+			'binServiceTime': 130,
+			'binVolume': 2,
+			'disposalDistrRate': 2.0,
+			'disposalDistrShape': 2,
+			'bagVolume': 0.05,
+			'bagWeightMin': 2,
+			'bagWeightMax': 8,
+			'stopTime': 360 * 60 * 60,
+			'warmUpTime': 12.0,
+			'noAreas': 1,
+			'noBins': 3,
+			'serviceFreq': 1,
+			'thresholdVal': 0.75,
+			'areaIdx': 0,
+			'roadsLayout': [
+				[
+					{ 'index': 1, 'path_length': 2 },
+					{ 'index': 2, 'path_length': 4 }
+				],
+				[
+					{ 'index': 2, 'path_length': 1 },
+				],
+				[
+					{ 'index': 0, 'path_length': 3 },
+					{ 'index': 3, 'path_length': 2 },
+				],
+				[
+					{ 'index': 2, 'path_length': 2 },
+				]
+			]
+		}
+
+		# waypoints are not emitted unless observed, even if unobserved events are
+		dispatcher = EventDispatcher(30000, 1)
+		area = Area(config, dispatcher, DijkstraRoutePlanner)
+		self.assertTrue(area.emitted_events[Event.LORRY_ARRIVAL])
+		self.assertFalse(area.emitted_events[Event.LORRY_WAYPOINT])
+
+		lorry_events = []
+		dispatcher.attach_observer(lambda e: lorry_events.append((e.time, e.type, e.data)), 0,
+			['lorry_arrival', 'lorry_waypoint'])
+		area.init()
+		dispatcher.events = [
+			Event(time = 1, area_index = 0, type = 'service_time'),
+		]
+
+		area.bins[3]['current_weight'] = 5
+		area.bins[3]['current_volume'] = 2
+		area.bins[3]['has_exceeded_occupancy'] = True
+		while dispatcher.next_event() is not False and dispatcher.now < 1000:
+			pass
+
+		# the lorry passes bins 1 and 2 to bin 3 and bin 2 on the way back
+		self.assertEqual(lorry_events, [
+			(121, 'lorry_waypoint', { 'lorry_idx': 0, 'location': 1 }),
+			(181, 'lorry_waypoint', { 'lorry_idx': 0, 'location': 2 }),
+			(301, 'lorry_arrival', { 'lorry_idx': 0, 'location': 3 }),
+			(551, 'lorry_waypoint', { 'lorry_idx': 0, 'location': 2 }),
+			(731, 'lorry_arrival', { 'lorry_idx': 0, 'location': 0 })
+		])
+
+		# the depot is passed from bin 3 to bin 1, but is not a waypoint
+		dispatcher.events = []
+		area._schedule_arrival(3, { 'target': 1, 'distance': 7 })
+		self.assertEqual(sorted([(e.time - dispatcher.now, e.type, e.data['location']) for e in dispatcher.events]), [
+			(120, 'lorry_waypoint', 2),
+			(420, 'lorry_arrival', 1)
+		])
@@ -1,8 +1,17 @@
 #!/usr/bin/env python2.7
 from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
 import unittest
+import random
+import shutil
+import tempfile
+import numpy as np
 from pprint import pprint
 
+def random_layout(N, density, max_length):
+	"""Returns a random roads layout of N locations, each road there with the given probability, 1 to max_length long"""
+	return [[{ 'index': j, 'path_length': random.randint(1, max_length) }
+		for j in xrange(N) if j != k and random.random() < density] for k in xrange(N)]
+
 class DijkstraRoutePlannerTest(unittest.TestCase):
 	# TODO: document
 
@@ -149,3 +158,327 @@ class DijkstraRoutePlannerTest(unittest.TestCase):
 		]
 
 		self.assertEquals(route, expected_route)
+
+	def test_all_pairs_shortest_paths(self):
+		random.seed(1)
+		try:
+			for i in xrange(50):
+				# random maps with short roads, so there are ties between paths
+				N = random.randint(2, 15)
+				density = random.random()
+				roadsLayout = random_layout(N, density, 3)
+
+				paths = {}
+				for shortest_paths in ['point', 'dijkstra', 'floyd_warshall', 'lazy']:
+					DijkstraRoutePlanner.SHORTEST_PATHS = shortest_paths
+					planner = DijkstraRoutePlanner(roadsLayout, N)
+					paths[shortest_paths] = [planner._path(source, target, flatten_route = flatten_route)
+						for source in xrange(N) for target in xrange(N) for flatten_route in [False, True]]
+
+				self.assertEquals(paths['dijkstra'], paths['point'])
+				self.assertEquals(paths['floyd_warshall'], paths['point'])
+				self.assertEquals(paths['lazy'], paths['point'])
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+
+	def test_floyd_warshall_predecessors(self):
+		# through 1 is 0.001 longer than through 2, but 1 is visited first
+		roadsLayout = [
+			[{ 'index': 1, 'path_length': 1.0 }, { 'index': 2, 'path_length': 2.0 }],
+			[{ 'index': 3, 'path_length': 999.001 }],
+			[{ 'index': 3, 'path_length': 998.0 }],
+			[]
+		]
+
+		try:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_FLOYD_WARSHALL
+			planner = DijkstraRoutePlanner(roadsLayout, 4)
+			self.assertEquals(planner.predecessors.tolist(), [[0, 0, 0, 2], [-1, 1, -1, 1], [-1, -1, 2, 2], [-1, -1, -1, 3]])
+			self.assertEquals([step['target'] for step in planner._path(0, 3)], [2, 3])
+
+			# auto leaves large dense areas to Dijkstra
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+			self.assertEquals(DijkstraRoutePlanner(roadsLayout, 4).shortest_paths, DijkstraRoutePlanner.SHORTEST_PATHS_FLOYD_WARSHALL)
+			DijkstraRoutePlanner.FLOYD_WARSHALL_MAX_NODES = 3
+			self.assertEquals(DijkstraRoutePlanner(roadsLayout, 4).shortest_paths, DijkstraRoutePlanner.SHORTEST_PATHS_DIJKSTRA)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+			DijkstraRoutePlanner.FLOYD_WARSHALL_MAX_NODES = 1000
+
+	def test_lazy_shortest_paths(self):
+		roadsLayout = [
+			[{ 'index': 1, 'path_length': 1 }, { 'index': 2, 'path_length': 5 }],
+			[{ 'index': 2, 'path_length': 2 }],
+			[{ 'index': 0, 'path_length': 2 }, { 'index': 3, 'path_length': 1 }],
+			[{ 'index': 1, 'path_length': 2 }]
+		]
+
+		DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_LAZY
+		try:
+			planner = DijkstraRoutePlanner(roadsLayout, 4)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+
+		# nothing is computed up front
+		self.assertEquals(planner.distances, None)
+		self.assertEquals(planner.source_paths, {})
+
+		# the first query from a source computes the paths to all nodes
+		self.assertEquals(planner._path(0, 2, flatten_route = True), [{ 'target': 2, 'service': True, 'distance': 3 }])
+		self.assertEquals(planner.source_paths.keys(), [0])
+		self.assertEquals(planner.source_paths[0][0].tolist(), [0, 1, 3, 4])
+		self.assertEquals(planner.source_paths[0][1].tolist(), [0, 0, 1, 2])
+
+		# later queries from the source reuse them
+		self.assertEquals(planner._path(0, 3), [
+			{ 'target': 1, 'service': False },
+			{ 'target': 2, 'service': False },
+			{ 'target': 3, 'service': True, 'distance': 4 }
+		])
+		self.assertEquals(planner.source_paths.keys(), [0])
+
+	def test_waypoints(self):
+		random.seed(9)
+		N = 20
+		roadsLayout = random_layout(N, 0.2, 9)
+
+		try:
+			for shortest_paths in ['point', 'lazy', 'dijkstra', 'landmarks']:
+				DijkstraRoutePlanner.SHORTEST_PATHS = shortest_paths
+				planner = DijkstraRoutePlanner(roadsLayout, N)
+				for source in xrange(N):
+					for target in xrange(N):
+						# waypoints are the steps of the expanded path, with distances adding up to it
+						path = planner._path(source, target)
+						waypoints = planner.get_waypoints(source, target)
+						self.assertEqual([location for (location, _) in waypoints], [step['target'] for step in path[:-1]])
+
+						if len(waypoints) != 0 and path[-1]['distance'] < DijkstraRoutePlanner.INFINITY:
+							self.assertEqual(waypoints[-1][1] + planner.area_map.road_length(waypoints[-1][0], target),
+								path[-1]['distance'])
+
+			# flattened paths in the cache are expanded without searching again
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_POINT
+			planner = DijkstraRoutePlanner(roadsLayout, N)
+			flattened_path = planner._path(0, 5, flatten_route = True)
+			path = planner._path(0, 5)
+			self.assertEqual(path[-1], flattened_path[0])
+			self.assertEqual(planner.path_cache.counters()['misses'], 1)
+			self.assertEqual(planner.path_cache.counters()['hits'], 1)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+
+	def test_symmetric_paths(self):
+		random.seed(11)
+		N = 20
+		# short roads, so many shortest paths tie
+		roadsLayout = random_layout(N, 0.3, 2)
+		lengths = dict(((i, road['index']), road['path_length']) for i in xrange(N) for road in roadsLayout[i]
+			if i < road['index'])
+		lengths.update(dict(((j, i), length) for ((i, j), length) in lengths.items()))
+		roadsLayout = [[{ 'index': j, 'path_length': lengths[i, j] } for j in xrange(N) if (i, j) in lengths]
+			for i in xrange(N)]
+
+		pairs = [(source, target) for source in xrange(N) for target in xrange(N)]
+		try:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_DIJKSTRA
+			planner = DijkstraRoutePlanner(roadsLayout, N)
+			self.assertTrue(planner.area_map.symmetric)
+			paths = [planner._path(source, target) for (source, target) in pairs]
+
+			# paths found the other way first are not reversed, so they pass the same nodes in every mode
+			for shortest_paths in ['point', 'lazy', 'landmarks']:
+				DijkstraRoutePlanner.SHORTEST_PATHS = shortest_paths
+				planner = DijkstraRoutePlanner(roadsLayout, N)
+				for (source, target) in pairs[::-1]:
+					planner._path(target, source, flatten_route = True)
+					planner._path(target, source)
+
+				found = [planner._path(source, target) for (source, target) in pairs]
+				if shortest_paths == 'landmarks':
+					# A* may break ties otherwise, but not depending on the paths found before
+					planner = DijkstraRoutePlanner(roadsLayout, N)
+					paths = [planner._path(source, target) for (source, target) in pairs]
+				self.assertEqual(found, paths)
+
+			# distances are still shared by both ways
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_POINT
+			planner = DijkstraRoutePlanner(roadsLayout, N)
+			path = planner._path(3, 7)
+			self.assertEqual(planner._path(7, 3, flatten_route = True)[0]['distance'], path[-1]['distance'])
+			self.assertEqual(planner.path_cache.counters()['misses'], 1)
+			self.assertEqual(planner.path_cache.counters()['hits'], 1)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+
+	def test_persistent_cache(self):
+		roadsLayout = [
+			[{ 'index': 1, 'path_length': 1 }, { 'index': 2, 'path_length': 5 }],
+			[{ 'index': 2, 'path_length': 2 }],
+			[{ 'index': 0, 'path_length': 2 }, { 'index': 3, 'path_length': 1 }],
+			[{ 'index': 1, 'path_length': 2 }]
+		]
+
+		cache_dir = tempfile.mkdtemp()
+		DijkstraRoutePlanner.PERSISTENT_CACHE_DIR = cache_dir
+		try:
+			# the first planner computes and saves the paths, the second loads them
+			planner = DijkstraRoutePlanner(roadsLayout, 4)
+			self.assertFalse(planner.persistent_cache_hit)
+
+			loaded_planner = DijkstraRoutePlanner(roadsLayout, 4)
+			self.assertTrue(loaded_planner.persistent_cache_hit)
+			self.assertTrue(isinstance(loaded_planner.distances, np.memmap))
+			self.assertEquals(loaded_planner.distances.tolist(), planner.distances.tolist())
+			self.assertEquals(loaded_planner.predecessors.tolist(), planner.predecessors.tolist())
+			self.assertEquals(loaded_planner._path(0, 3), planner._path(0, 3))
+
+			# a changed map does not use the saved paths
+			roadsLayout[2][1]['path_length'] = 4
+			changed_planner = DijkstraRoutePlanner(roadsLayout, 4)
+			self.assertFalse(changed_planner.persistent_cache_hit)
+			self.assertEquals(changed_planner._path(0, 3, flatten_route = True)[0]['distance'], 7)
+		finally:
+			DijkstraRoutePlanner.PERSISTENT_CACHE_DIR = None
+			shutil.rmtree(cache_dir)
+
+	def test_search_cores(self):
+		random.seed(2)
+		try:
+			for i in xrange(50):
+				N = random.randint(2, 20)
+				density = random.random()
+				roadsLayout = random_layout(N, density, 3)
+
+				# all cores find the same distances and paths, also when stopping at a target
+				searches = {}
+				for (search_core, degree) in [('priority_queue', 64), ('heapq', 64), ('heapq', 0)]:
+					DijkstraRoutePlanner.SEARCH_CORE = search_core
+					DijkstraRoutePlanner.VECTORISED_SEARCH_DEGREE = degree
+					planner = DijkstraRoutePlanner(roadsLayout, N)
+					searches[(search_core, degree)] = [planner._search(source, target, N, roadsLayout)
+						for source in xrange(N) for target in range(N) + [None]]
+
+				self.assertEquals(searches[('heapq', 64)], searches[('priority_queue', 64)])
+				self.assertEquals(searches[('heapq', 0)], searches[('priority_queue', 64)])
+		finally:
+			DijkstraRoutePlanner.SEARCH_CORE = DijkstraRoutePlanner.SEARCH_CORE_HEAPQ
+			DijkstraRoutePlanner.VECTORISED_SEARCH_DEGREE = 64
+
+	def test_vectorised_priority(self):
+		random.seed(3)
+		for i in xrange(50):
+			N = random.randint(2, 20)
+			density = random.random()
+			roadsLayout = random_layout(N, density, 3)
+			bins = [{ 'idx': j } for j in xrange(1, N) if random.random() < 0.7]
+			if len(bins) == 0:
+				continue
+
+			# the argmin over distance rows picks the same bins as sorting the paths, ties included
+			planner = DijkstraRoutePlanner(roadsLayout, N)
+			for flatten_route in [False, True]:
+				self.assertEquals(planner._get_route_priority_vectorised(bins, flatten_route),
+					planner._get_route_priority_paths(bins, flatten_route))
+
+	def test_savings_planner(self):
+		random.seed(4)
+		N = 15
+		roadsLayout = random_layout(N, 1, 10)
+		bins = [{ 'idx': j, 'current_volume': random.uniform(0.5, 2), 'current_weight': random.uniform(10, 50) }
+			for j in xrange(1, N)]
+
+		# without a capacity, all bins are one trip
+		planner = DijkstraRoutePlanner(roadsLayout, N)
+		route = planner._get_route_savings(bins, flatten_route = True)
+		self.assertEquals([step['target'] for step in route].count(0), 1)
+		self.assertEquals(route[-1]['target'], 0)
+
+		for lorry_capacity in [(3, 1000), (100, 120)]:
+			planner = DijkstraRoutePlanner(roadsLayout, N, lorry_capacity = lorry_capacity)
+			route = planner._get_route_savings(bins, flatten_route = True)
+			targets = [step['target'] for step in route]
+
+			# every bin is serviced once, by trips ending at the depot, that fit the lorry
+			self.assertEquals(sorted(targets), [0] * targets.count(0) + range(1, N))
+			self.assertEquals(targets[-1], 0)
+			self.assertTrue(targets.count(0) > 1)
+
+			trip_volume = trip_weight = 0
+			for step in route:
+				if step['target'] == 0:
+					self.assertFalse(step['service'])
+					self.assertTrue(trip_volume <= lorry_capacity[0] and trip_weight <= lorry_capacity[1])
+					trip_volume = trip_weight = 0
+				else:
+					trip_volume += bins[step['target'] - 1]['current_volume'] / 2.0
+					trip_weight += bins[step['target'] - 1]['current_weight']
+
+		# point paths plan the same route without keeping the distances from every location
+		DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_POINT
+		DijkstraRoutePlanner.CACHE_MAX_SIZE = 20
+		try:
+			point_planner = DijkstraRoutePlanner(roadsLayout, N, lorry_capacity = lorry_capacity)
+			self.assertEquals(point_planner._get_route_savings(bins, flatten_route = True), route)
+			self.assertEquals(point_planner.source_paths, {})
+			self.assertTrue(len(point_planner.path_cache) <= 20)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+			DijkstraRoutePlanner.CACHE_MAX_SIZE = 100000
+
+	def test_incremental_route(self):
+		# locations on a line
+		roadsLayout = [[{ 'index': j, 'path_length': abs(i - j) } for j in xrange(5) if j != i] for i in xrange(5)]
+		bins = [{ 'idx': i, 'current_volume': 1, 'current_weight': 1, 'has_exceeded_occupancy': i != 4 }
+			for i in xrange(1, 5)]
+
+		planner = DijkstraRoutePlanner(roadsLayout, 5)
+		unserved_route = planner._trips_path([[1, 3]], flatten_route = True)
+
+		# the new bin goes where it adds the least distance, bins no longer needing service are dropped
+		route = planner.get_route_incremental(bins, unserved_route, flatten_route = True)
+		self.assertEquals([step['target'] for step in route], [1, 2, 3, 0])
+
+		bins[0]['has_exceeded_occupancy'] = False
+		route = planner.get_route_incremental(bins, unserved_route, flatten_route = True)
+		self.assertEquals([step['target'] for step in route], [2, 3, 0])
+
+		# bins that don't fit in any trip get their own
+		planner = DijkstraRoutePlanner(roadsLayout, 5, lorry_capacity = (1, 100))
+		bins[0]['has_exceeded_occupancy'] = True
+		route = planner.get_route_incremental(bins, unserved_route, flatten_route = True)
+		self.assertEquals([step['target'] for step in route], [1, 3, 0, 2, 0])
+
+		# nothing left to keep, so the route is planned from scratch
+		route = planner.get_route_incremental(bins, [{ 'target': 0, 'service': False, 'distance': 1 }], flatten_route = True)
+		self.assertEquals(route, planner.get_route(bins, flatten_route = True))
+
+	def test_route_memo(self):
+		roadsLayout = [[{ 'index': j, 'path_length': abs(i - j) } for j in xrange(5) if j != i] for i in xrange(5)]
+		bins = [{ 'idx': i, 'current_volume': i, 'current_weight': 1, 'has_exceeded_occupancy': i != 4 }
+			for i in xrange(1, 5)]
+
+		try:
+			for algorithm in ['greedy', 'priority', 'savings']:
+				DijkstraRoutePlanner.ALGORITHM = algorithm
+				planner = DijkstraRoutePlanner(roadsLayout, 5)
+
+				# a recurring service set gets the same route, from the memo
+				route = planner.get_route(bins, flatten_route = True)
+				self.assertTrue(planner.get_route(bins, flatten_route = True) is route)
+				self.assertEquals(planner.route_memo.counters()['hits'], 1)
+
+				# greedy routes depend on the order of the bins by volume, savings routes on the loads
+				bins[0]['current_volume'] = 10
+				changed_route = planner.get_route(bins, flatten_route = True)
+				self.assertEquals(planner.route_memo.counters()['hits'], 1 if algorithm != 'priority' else 2)
+				if algorithm == 'greedy':
+					self.assertEquals([step['target'] for step in changed_route], [1, 3, 2, 0])
+				bins[0]['current_volume'] = 1
+
+				# another service set is another route
+				bins[3]['has_exceeded_occupancy'] = True
+				self.assertEquals([step['target'] for step in planner.get_route(bins, flatten_route = True)].count(4), 1)
+				bins[3]['has_exceeded_occupancy'] = False
+		finally:
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from cslp.simulation.disposal_modeling import DisposalModeling, DisposalSampler
+
+class DisposalModelingTest(unittest.TestCase):
+	"""Tests the disposal delay and bag weight sampling"""
+
+	def test_sampler(self):
+		np.random.seed(1)
+		sampler = DisposalSampler(2, 2.0, 2, 8, block_size = 100)
+
+		# more than one block, so the buffer is refilled
+		samples = [sampler.next_disposal() for i in xrange(1000)]
+		delays = [delay for (delay, weight) in samples]
+		weights = [weight for (delay, weight) in samples]
+
+		# delays are whole seconds, weights are rounded to three digits
+		self.assertTrue(all([isinstance(delay, int) and delay >= 0 for delay in delays]))
+		self.assertTrue(all([2 <= weight <= 8 and round(weight, 3) == weight for weight in weights]))
+
+		# Erlang-k mean is k / l hours, bag weights are uniform
+		self.assertAlmostEqual(np.mean(delays) / (60 * 60), 1.0, delta = 0.1)
+		self.assertAlmostEqual(np.mean(weights), 5.0, delta = 0.3)
+
+	def test_sampler_distribution(self):
+		np.random.seed(1)
+		sampler = DisposalSampler(3, 1.5, 2, 8)
+		delays = [sampler.next_disposal()[0] / 3600.0 for i in xrange(5000)]
+		scalar_delays = [DisposalModeling.inv_erlang_k(3, 1.5) for i in xrange(5000)]
+
+		# both samplers agree on the mean and variance of Erlang-3 (rate 1.5)
+		for sample in [delays, scalar_delays]:
+			self.assertAlmostEqual(np.mean(sample), 3 / 1.5, delta = 0.1)
+			self.assertAlmostEqual(np.var(sample), 3 / 1.5 ** 2, delta = 0.15)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python2.7
+# Compares the per-disposal cost of scalar Erlang sampling (DisposalModeling.inv_erlang_k
+#	plus a bag weight) with the block-buffered DisposalSampler.
+#	Run from the project root: python2 test/disposal_sampling_benchmark.py
+
+import os
+import sys
+import numpy as np
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cslp.simulation.disposal_modeling import DisposalModeling, DisposalSampler
+
+NO_SAMPLES = 200000
+
+# (shape, rate) pairs
+DISTRIBUTIONS = [(1, 2.0), (2, 2.0), (5, 2.0)]
+
+BAG_WEIGHT_MIN = 2
+BAG_WEIGHT_MAX = 8
+
+def scalar_benchmark(k, l):
+	start_time = timer()
+	for i in xrange(NO_SAMPLES):
+		time = int(round(DisposalModeling.inv_erlang_k(k, l) * 60 * 60, 3))
+		bag_weight = round(np.random.uniform(BAG_WEIGHT_MIN, BAG_WEIGHT_MAX), 3)
+
+	return timer() - start_time
+
+def sampler_benchmark(k, l):
+	start_time = timer()
+	sampler = DisposalSampler(k, l, BAG_WEIGHT_MIN, BAG_WEIGHT_MAX)
+	for i in xrange(NO_SAMPLES):
+		time, bag_weight = sampler.next_disposal()
+
+	return timer() - start_time
+
+if __name__ == '__main__':
+	np.random.seed(42)
+	print('{0:<6} {1:<6} {2:>16} {3:>16} {4:>9}'.format('shape', 'rate', 'scalar (us)', 'sampler (us)', 'speedup'))
+
+	for (k, l) in DISTRIBUTIONS:
+		scalar_time = scalar_benchmark(k, l) / NO_SAMPLES * 1e6
+		sampler_time = sampler_benchmark(k, l) / NO_SAMPLES * 1e6
+
+		print('{0:<6} {1:<6} {2:>16.3f} {3:>16.3f} {4:>8.1f}x'.format(k, l, scalar_time, sampler_time,
+			scalar_time / sampler_time))
@@ -7,6 +7,12 @@ from numpy.random import uniform
 class EventDispatcherTest(unittest.TestCase):
 	"""Tests for the event dispatcher class."""
 
+	@classmethod
+	def setUpClass(cls):
+		# event types used by the tests below
+		for type in ['test', 'a', 'b', 'c']:
+			Event.register_type(type)
+
 	def test_event_sorting(self):
 		# dispatcher with one area
 		dispatcher = EventDispatcher(1000, 1)
@@ -32,3 +38,208 @@ class EventDispatcherTest(unittest.TestCase):
 		time = dispatcher.next_event()
 		self.assertEqual(time, 10)
 
+	def test_run_until(self):
+		dispatcher = EventDispatcher(1000, 1)
+
+		# every event schedules another one, 100 seconds later
+		fired = []
+		def observer(event):
+			fired.append(event.time)
+			dispatcher.add_event(Event(dispatcher.now + 100, 0, 'test'))
+
+		dispatcher.attach_observer(observer, 0)
+		dispatcher.add_event(Event(0, 0, 'test'))
+		dispatcher.add_event(Event(50, 0, 'test'))
+
+		counters = dispatcher.run_until(500)
+
+		self.assertEqual(fired, [0, 50, 100, 150, 200, 250, 300, 350, 400, 450, 500])
+		self.assertEqual(counters['events_processed'], 11)
+		self.assertEqual(counters['peak_queue_length'], 2)
+		# events after 500 are never added
+		self.assertEqual(len(dispatcher.events), 0)
+
+	def test_compact_events(self):
+		# names and dictionaries are converted
+		e = Event(5, 1, 'lorry_load_changed', { 'lorry_idx': 0, 'lorry_volume': 2, 'lorry_weight': 3 })
+		self.assertEqual(e.code, Event.LORRY_LOAD_CHANGED)
+		self.assertEqual(e.payload, (0, 2, 3))
+		self.assertEqual((e.time, e.area_index, e.type), (5, 1, 'lorry_load_changed'))
+		self.assertEqual(e.data, { 'lorry_idx': 0, 'lorry_volume': 2, 'lorry_weight': 3 })
+
+		# codes and tuples are kept as is
+		e = Event(5, 1, Event.BIN_DISPOSAL, (3, 2.5))
+		self.assertEqual(e.type, 'bin_disposal')
+		self.assertEqual(e.data, { 'bin_idx': 3, 'bag_weight': 2.5 })
+
+		# types without a layout keep their data
+		e = Event(5, 1, 'test', { 'value': 1 })
+		self.assertEqual(e.code, Event.type_code('test'))
+		self.assertEqual(e.data, { 'value': 1 })
+		self.assertFalse(hasattr(e, '__dict__'))
+
+		# unknown types are not added, registered types keep their code
+		no_types = len(Event.TYPES)
+		self.assertRaises(ValueError, Event, 5, 1, 'some_new_event')
+		self.assertRaises(ValueError, Event.type_code, 'some_new_event')
+		self.assertEqual(len(Event.TYPES), no_types)
+		self.assertEqual(Event.register_type('test'), Event.type_code('test'))
+		self.assertEqual(Event.register_type('lorry_arrival', ('lorry_idx', 'location')), Event.LORRY_ARRIVAL)
+		self.assertRaises(ValueError, Event.register_type, 'lorry_arrival')
+		self.assertEqual(len(Event.TYPES), no_types)
+
+	def test_typed_observers(self):
+		dispatcher = EventDispatcher(1000, 2)
+
+		calls = []
+		dispatcher.attach_observer(lambda e: calls.append(('all', e.type)), None)
+		dispatcher.attach_observer(lambda e: calls.append(('a', e.type)), 0, ['a'])
+		dispatcher.attach_observer(lambda e: calls.append(('a, b', e.type)), None, ['a', 'b'])
+
+		dispatcher.add_event(Event(1, 0, 'a'))
+		dispatcher.add_event(Event(2, 0, 'b'))
+		dispatcher.add_event(Event(3, 0, 'c'))
+		dispatcher.add_event(Event(4, 1, 'a'))
+		while dispatcher.next_event() is not False:
+			pass
+
+		# observers are called in the order they were attached
+		self.assertEqual(calls, [
+			('all', 'a'), ('a', 'a'), ('a, b', 'a'),
+			('all', 'b'), ('a, b', 'b'),
+			('all', 'c'),
+			('all', 'a'), ('a, b', 'a')
+		])
+
+	def test_same_time_ordering(self):
+		dispatcher = EventDispatcher(1000, 1)
+
+		# few distinct times, so many events share the same time
+		for i in xrange(1000):
+			dispatcher.add_event(Event(time = int(uniform(0, 10)), data = i))
+
+		# events with the same time should keep the insertion order
+		events = [(x.time, x.data) for x in dispatcher.events]
+		self.assertEqual(events, sorted(events))
+
+	def _assert_same_order(self, queue, times):
+		"""Checks the given queue fires events in the same order as the sorted list."""
+		EventDispatcher.QUEUE = queue
+		try:
+			dispatcher = EventDispatcher(1 << 30, 1)
+		finally:
+			EventDispatcher.QUEUE = EventDispatcher.QUEUE_SORTED
+		sorted_dispatcher = EventDispatcher(1 << 30, 1)
+
+		fired = { 'queue': [], 'sorted': [] }
+		dispatcher.attach_observer(lambda e: fired['queue'].append(e.data), 0)
+		sorted_dispatcher.attach_observer(lambda e: fired['sorted'].append(e.data), 0)
+
+		for (i, time) in enumerate(times):
+			dispatcher.add_event(Event(time, 0, 'test', i))
+			sorted_dispatcher.add_event(Event(time, 0, 'test', i))
+
+		while dispatcher.next_event() is not False:
+			pass
+		while sorted_dispatcher.next_event() is not False:
+			pass
+
+		self.assertEqual(len(fired['queue']), len(times))
+		self.assertEqual(fired['queue'], fired['sorted'])
+
+	def test_heap_queue(self):
+		times = [int(uniform(0, 100)) for i in xrange(1000)]
+		self._assert_same_order(EventDispatcher.QUEUE_HEAP, times)
+
+	def test_calendar_queue(self):
+		# many same-time events
+		times = [int(uniform(0, 100)) for i in xrange(1000)]
+		self._assert_same_order(EventDispatcher.QUEUE_CALENDAR, times)
+
+		# sparse events, far apart
+		times = [int(uniform(0, 1 << 20)) for i in xrange(1000)]
+		self._assert_same_order(EventDispatcher.QUEUE_CALENDAR, times)
+
+	def test_calendar_queue_hold(self):
+		EventDispatcher.QUEUE = EventDispatcher.QUEUE_CALENDAR
+		try:
+			dispatcher = EventDispatcher(1 << 30, 1)
+		finally:
+			EventDispatcher.QUEUE = EventDispatcher.QUEUE_SORTED
+
+		# every event schedules a new one in the future, as disposals do
+		fired = []
+		def observer(event):
+			fired.append(event.time)
+			if len(fired) < 5000:
+				dispatcher.add_event(Event(dispatcher.now + int(uniform(0, 3600)), 0, 'test'))
+
+		dispatcher.attach_observer(observer, 0)
+		for i in xrange(500):
+			dispatcher.add_event(Event(int(uniform(0, 3600)), 0, 'test'))
+
+		while dispatcher.next_event() is not False:
+			pass
+
+		self.assertEqual(len(fired), 5000 + 499)
+		self.assertEqual(fired, sorted(fired))
+
+	def test_immediate_queue(self):
+		for queue in [EventDispatcher.QUEUE_SORTED, EventDispatcher.QUEUE_HEAP, EventDispatcher.QUEUE_CALENDAR]:
+			EventDispatcher.QUEUE = queue
+			EventDispatcher.IMMEDIATE_QUEUE_ENABLED = True
+			try:
+				dispatcher = EventDispatcher(1 << 30, 1)
+			finally:
+				EventDispatcher.QUEUE = EventDispatcher.QUEUE_SORTED
+				EventDispatcher.IMMEDIATE_QUEUE_ENABLED = False
+			sorted_dispatcher = EventDispatcher(1 << 30, 1)
+
+			# every fired event schedules one event now and one in the future, as areas do
+			delays = [int(uniform(0, 10)) for i in xrange(3000)]
+			def schedule(dispatcher, fired):
+				def observer(event):
+					fired.append(event.data)
+					if len(fired) < 3000:
+						dispatcher.add_event(Event(dispatcher.now, 0, 'test', len(fired) * 2))
+						dispatcher.add_event(Event(dispatcher.now + delays[len(fired)], 0, 'test', len(fired) * 2 + 1))
+				return observer
+
+			fired, sorted_fired = [], []
+			dispatcher.attach_observer(schedule(dispatcher, fired), 0)
+			sorted_dispatcher.attach_observer(schedule(sorted_dispatcher, sorted_fired), 0)
+
+			for i in xrange(100):
+				time = int(uniform(0, 10))
+				dispatcher.add_event(Event(time, 0, 'test', -i))
+				sorted_dispatcher.add_event(Event(time, 0, 'test', -i))
+
+			while dispatcher.next_event() is not False:
+				pass
+			while sorted_dispatcher.next_event() is not False:
+				pass
+
+			self.assertEqual(fired, sorted_fired)
+
+	def test_remove_observer(self):
+		dispatcher = EventDispatcher(100, 2)
+		fired = []
+		observer = lambda event: fired.append(event.time)
+		dispatcher.attach_observer(observer)
+		dispatcher.attach_observer(observer, 1, ['lorry_arrival'])
+		self.assertTrue(dispatcher.is_observed(0, 'bin_disposal'))
+		self.assertTrue(dispatcher.is_observed(1, Event.LORRY_ARRIVAL))
+
+		# remove from area 0 only
+		dispatcher.remove_observer(observer, 0)
+		self.assertFalse(dispatcher.is_observed(0, 'bin_disposal'))
+		self.assertTrue(dispatcher.is_observed(1, 'bin_disposal'))
+
+		dispatcher.remove_observer(observer)
+		self.assertFalse(dispatcher.is_observed(1, Event.LORRY_ARRIVAL))
+
+		dispatcher.add_event(Event(1, 0, 'bin_disposal'))
+		dispatcher.add_event(Event(2, 1, 'lorry_arrival'))
+		while dispatcher.next_event() is not False:
+			pass
+		self.assertEqual(fired, [])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python2.7
+# Measures the memory used by pending events, compared to events with a
+#	__dict__, a type name and a data dictionary (the previous representation).
+#	Run from the project root: python2 test/event_memory_benchmark.py [input]
+#
+# NOTE: tracemalloc is not available in python 2.7, so sizes are computed
+#	with sys.getsizeof on the events in the queue.
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cslp.input_parser import InputParser
+from cslp.experiment_manager import ExperimentManager
+from cslp.simulation.event_dispatcher import Event
+
+DEFAULT_INPUT = 'test/inputs/performance_tests/big_area.txt'
+
+class DictEvent:
+	"""An event as it was before, with a __dict__ and a data dictionary"""
+
+	def __init__(self, time, area_index, type, data):
+		self.time = time
+		self.area_index = area_index
+		self.type = type
+		self.data = data
+
+def compact_size(event):
+	size = sys.getsizeof(event)
+	if event.payload is not None:
+		size += sys.getsizeof(event.payload)
+	return size
+
+def dict_size(event, config):
+	data = event.data
+	if event.code == Event.BIN_DISPOSAL:
+		# the constant bag volume was part of every disposal
+		data['bag_vol'] = config['bagVolume']
+
+	dict_event = DictEvent(event.time, event.area_index, event.type, data)
+	size = sys.getsizeof(dict_event) + sys.getsizeof(dict_event.__dict__)
+	if data is not None:
+		size += sys.getsizeof(data)
+	return size
+
+def report(stage, events, config):
+	compact = sum([compact_size(e) for e in events])
+	dict_based = sum([dict_size(e, config) for e in events])
+
+	print('{0}: {1} pending events'.format(stage, len(events)))
+	print('\tcompact: {0} bytes ({1:.1f} per event)'.format(compact, compact / float(max(1, len(events)))))
+	print('\tdict based: {0} bytes ({1:.1f} per event)'.format(dict_based, dict_based / float(max(1, len(events)))))
+	print('\treduction: {0:.2f}x'.format(dict_based / float(max(1, compact))))
+
+if __name__ == '__main__':
+	file_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INPUT
+
+	parser = InputParser(file_name)
+	if not parser.parse():
+		print('Could not parse {0}'.format(file_name))
+		sys.exit(1)
+
+	np.random.seed(42)
+	experiment_manager = ExperimentManager(parser.config, disable_output=True, disable_statistics=True)
+	dispatcher = experiment_manager.dispatcher
+	experiment_manager.output_formatter.enabled = False
+	experiment_manager.simulation.run()
+
+	report('after initialization', dispatcher.events, parser.config)
+
+	# run half of the simulation
+	while dispatcher.now < experiment_manager.stop_time / 2:
+		if dispatcher.next_event() is False:
+			break
+
+	report('half way through', dispatcher.events, parser.config)
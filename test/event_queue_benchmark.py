@@ -0,0 +1,92 @@
+#!/usr/bin/env python2.7
+# Compares the event queues of the event dispatcher on the performance test inputs.
+#	Run from the project root: python2 test/event_queue_benchmark.py
+#
+# Two benchmarks are run for every input and queue:
+#	hold - a queue-only benchmark: one pending event per bin, every event fired
+#		schedules the next one after an Erlang distributed delay, as disposals do
+#	simulation - a full simulation run, with all output disabled
+
+import os
+import sys
+import numpy as np
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cslp.input_parser import InputParser
+from cslp.experiment_manager import ExperimentManager
+from cslp.simulation.event_dispatcher import Event, EventDispatcher
+
+INPUTS = [
+	'test/inputs/performance_tests/small_area.txt',
+	'test/inputs/performance_tests/medium_area.txt',
+	'test/inputs/performance_tests/big_area.txt'
+]
+
+QUEUES = [
+	EventDispatcher.QUEUE_SORTED,
+	EventDispatcher.QUEUE_HEAP,
+	EventDispatcher.QUEUE_CALENDAR
+]
+
+HOLD_OPERATIONS = 200000
+"""Number of events fired in the hold benchmark"""
+
+SEED = 42
+
+def hold_benchmark(config, queue):
+	no_bins = sum([area['noBins'] for area in config['areas']])
+	stop_time = int(config['stopTime'] * 60 * 60)
+
+	# pre-sample the delays (in seconds), so only the queue is timed
+	np.random.seed(SEED)
+	delays = np.random.gamma(config['disposalDistrShape'], 1 / config['disposalDistrRate'],
+		no_bins + HOLD_OPERATIONS)
+	delays = [int(round(d * 60 * 60, 3)) for d in delays]
+
+	EventDispatcher.QUEUE = queue
+	dispatcher = EventDispatcher(stop_time + sum(delays), 1)
+
+	# every fired event schedules the next one
+	remaining = iter(delays[no_bins:])
+	def observer(event):
+		dispatcher.add_event(Event(dispatcher.now + next(remaining), 0, Event.BIN_DISPOSAL))
+
+	dispatcher.attach_observer(observer, 0)
+
+	start_time = timer()
+	for delay in delays[:no_bins]:
+		dispatcher.add_event(Event(delay, 0, Event.BIN_DISPOSAL))
+
+	for i in xrange(HOLD_OPERATIONS):
+		dispatcher.next_event()
+
+	return timer() - start_time
+
+def simulation_benchmark(config, queue):
+	np.random.seed(SEED)
+	EventDispatcher.QUEUE = queue
+
+	start_time = timer()
+	experiment_manager = ExperimentManager(config, disable_output=True, disable_statistics=True)
+	experiment_manager.run_all()
+
+	return timer() - start_time
+
+if __name__ == '__main__':
+	print('{0:<50} {1:<10} {2:>10} {3:>12}'.format('input', 'queue', 'hold (s)', 'simulation (s)'))
+
+	for file_name in INPUTS:
+		for queue in QUEUES:
+			parser = InputParser(file_name)
+			if not parser.parse():
+				print('Could not parse {0}'.format(file_name))
+				break
+
+			hold_time = hold_benchmark(parser.config, queue)
+			simulation_time = simulation_benchmark(parser.config, queue)
+
+			print('{0:<50} {1:<10} {2:>10.3f} {3:>12.3f}'.format(file_name, queue, hold_time, simulation_time))
+
+	EventDispatcher.QUEUE = EventDispatcher.QUEUE_SORTED
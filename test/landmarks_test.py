@@ -0,0 +1,86 @@
+import unittest
+import random
+from cslp.simulation.route_planning.road_graph import RoadGraph
+from cslp.simulation.route_planning.landmarks import Landmarks
+from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+from test.dijkstra_route_planner_test import random_layout
+
+class LandmarksTest(unittest.TestCase):
+	"""Tests the landmark (ALT) shortest paths"""
+
+	def _distances(self, planner, source):
+		return planner._search_heapq(source, None, planner.total_nodes)[0]
+
+	def test_bounds(self):
+		random.seed(6)
+		for i in xrange(20):
+			N = random.randint(1, 30)
+			graph = RoadGraph.from_layout(random_layout(N, random.random() * 0.4, 9))
+			planner = DijkstraRoutePlanner(graph, N)
+			landmarks = Landmarks(graph, 4, lambda g, source: planner._search_heapq(source, None, N, g)[0],
+				DijkstraRoutePlanner.INFINITY)
+
+			# the depot is the first landmark, the others are all different
+			self.assertEqual(landmarks.landmarks[0], 0)
+			self.assertEqual(len(set(landmarks.landmarks)), min(4, N))
+
+			# the bounds never exceed the distances
+			for source in xrange(N):
+				distances = self._distances(planner, source)
+				for target in xrange(N):
+					self.assertTrue(landmarks._bounds(source, target) <= distances[target])
+					self.assertTrue(landmarks._bounds_from(target, source) <= distances[target])
+
+	def test_search(self):
+		random.seed(7)
+		for i in xrange(50):
+			N = random.randint(1, 30)
+			layout = random_layout(N, random.random() * 0.4, 9)
+			planner = DijkstraRoutePlanner(layout, N)
+			landmarks = Landmarks(planner.area_map, random.randint(1, 5),
+				lambda g, source: planner._search_heapq(source, None, N, g)[0], DijkstraRoutePlanner.INFINITY)
+
+			# both searches find the shortest distances, along existing roads
+			for source in xrange(N):
+				distances = self._distances(planner, source)
+				for target in xrange(N):
+					for search in [landmarks.search, landmarks.search_bidirectional]:
+						distance, locations = search(source, target)
+						self.assertEqual(distance, distances[target])
+
+						if distance < DijkstraRoutePlanner.INFINITY:
+							path = [source] + locations
+							self.assertEqual(path[-1], target)
+							self.assertEqual(distance, sum([min([road['path_length'] for road in layout[u] if road['index'] == v])
+								for (u, v) in zip(path, path[1:])]))
+						else:
+							self.assertEqual(locations, [])
+
+	def test_route_planner_landmarks(self):
+		random.seed(8)
+		N = 40
+		layout = random_layout(N, 0.3, 9)
+		bins = [{ 'idx': j, 'current_volume': random.uniform(0.5, 2), 'current_weight': random.uniform(10, 50),
+			'has_exceeded_occupancy': True } for j in xrange(1, N)]
+
+		# auto uses landmarks for large areas, routes are as long as with all pairs
+		planner = DijkstraRoutePlanner(layout, N)
+		self.assertTrue(planner.distances.max() < DijkstraRoutePlanner.INFINITY)
+		DijkstraRoutePlanner.ALL_PAIRS_MAX_NODES = N - 1
+		try:
+			for bidirectional in [False, True]:
+				DijkstraRoutePlanner.LANDMARKS_BIDIRECTIONAL = bidirectional
+				landmarks_planner = DijkstraRoutePlanner(layout, N)
+				self.assertEqual(landmarks_planner.shortest_paths, DijkstraRoutePlanner.SHORTEST_PATHS_LANDMARKS)
+				self.assertTrue(landmarks_planner.distances is None)
+
+				for algorithm in ['greedy', 'priority', 'savings']:
+					DijkstraRoutePlanner.ALGORITHM = algorithm
+					route = planner.get_route(bins, flatten_route = True)
+					landmarks_route = landmarks_planner.get_route(bins, flatten_route = True)
+					self.assertEqual(sum([step['distance'] for step in landmarks_route]),
+						sum([step['distance'] for step in route]))
+		finally:
+			DijkstraRoutePlanner.ALL_PAIRS_MAX_NODES = 2000
+			DijkstraRoutePlanner.LANDMARKS_BIDIRECTIONAL = False
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
@@ -72,6 +72,31 @@ class OutputFormatterTest(unittest.TestCase):
 		dispatcher.next_event()
 		sys.stdout = sys_stdout
 		self.assertEqual(captured_out.getvalue(), '00:00:00:25 -> bin 3.0 overflowed\n')
-		
 
+	def test_waypoint_output(self):
+		"""
+			Tests that waypoints are only outputted if enabled, as arriving at and leaving the location.
+		"""
+		for enabled in [False, True]:
+			dispatcher = EventDispatcher(100, 1)
+			OutputFormatter.WAYPOINTS_ENABLED = enabled
+			try:
+				of = OutputFormatter(dispatcher)
+			finally:
+				OutputFormatter.WAYPOINTS_ENABLED = False
+
+			dispatcher.events = [
+				Event(time = 30, area_index = 0, type = 'lorry_waypoint', data = { 'lorry_idx': 0, 'location': 4 })
+			]
+
+			sys_stdout = sys.stdout
+			captured_out = StringIO()
+			sys.stdout = captured_out
+			dispatcher.next_event()
+			sys.stdout = sys_stdout
 
+			if enabled:
+				self.assertEqual(captured_out.getvalue(), '00:00:00:30 -> lorry 0 arrived at location 0.4\n' +
+					'00:00:00:30 -> lorry 0 left location 0.4\n')
+			else:
+				self.assertEqual(captured_out.getvalue(), '')
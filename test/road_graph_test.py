@@ -0,0 +1,88 @@
+import unittest
+import random
+from copy import deepcopy
+from cslp.simulation.route_planning.road_graph import RoadGraph
+from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+from test.dijkstra_route_planner_test import random_layout
+
+class RoadGraphTest(unittest.TestCase):
+	"""Tests the CSR road layout"""
+
+	def test_layout(self):
+		roadsLayout = [
+			[{ 'index': 1, 'path_length': 3 }, { 'index': 2, 'path_length': 1 }],
+			[],
+			[{ 'index': 0, 'path_length': 2 }]
+		]
+		graph = RoadGraph.from_rows([[(1, 3), (2, 1)], [], [(0, 2)]])
+
+		self.assertEqual(graph.indptr.tolist(), [0, 2, 2, 3])
+		self.assertEqual(graph.indices.tolist(), [1, 2, 0])
+		self.assertEqual(graph.weights.tolist(), [3, 1, 2])
+		self.assertEqual(graph.sources().tolist(), [0, 0, 2])
+		self.assertEqual(graph.no_roads(), 3)
+
+		# it still reads as (and compares equal to) the list of dictionaries
+		self.assertEqual(len(graph), 3)
+		self.assertEqual(graph[0], roadsLayout[0])
+		self.assertEqual(list(graph), roadsLayout)
+		self.assertEqual(graph, roadsLayout)
+		self.assertEqual({ 'roadsLayout': roadsLayout }, { 'roadsLayout': graph })
+		self.assertNotEqual(graph, roadsLayout[:2])
+		self.assertEqual(RoadGraph.from_layout(roadsLayout), graph)
+
+		# the reversed graph has every road the other way
+		reversed_graph = graph.reversed()
+		self.assertEqual(reversed_graph.rows(), [[(2, 2)], [(0, 3)], [(0, 1)]])
+		self.assertEqual(reversed_graph.reversed(), graph)
+
+		# copies share the graph
+		self.assertTrue(deepcopy({ 'roadsLayout': graph })['roadsLayout'] is graph)
+		self.assertTrue(RoadGraph.from_layout(graph) is graph)
+
+		# locations missing from the end have no roads
+		padded = RoadGraph.from_layout(graph, 5)
+		self.assertEqual(len(padded), 5)
+		self.assertEqual(padded[4], [])
+
+		# integer lengths stay integers
+		self.assertEqual(graph.weights.dtype.kind, 'i')
+		self.assertEqual(RoadGraph.from_rows([[(1, 0.5)], []]).weights.dtype.kind, 'f')
+
+	def test_symmetric(self):
+		# every road has one of the same length back, in any order
+		graph = RoadGraph.from_rows([[(2, 1), (1, 3)], [(0, 3)], [(0, 1), (2, 5), (2, 5)]])
+		self.assertTrue(graph.symmetric)
+		self.assertTrue(graph.reversed() is graph)
+		self.assertTrue(RoadGraph.from_layout(graph, 5).symmetric)
+		self.assertTrue(RoadGraph.from_rows([]).symmetric)
+
+		# a missing road back, a road back of another length or a road repeated one way only
+		self.assertFalse(RoadGraph.from_rows([[(1, 3)], []]).symmetric)
+		self.assertFalse(RoadGraph.from_rows([[(1, 3)], [(0, 2)]]).symmetric)
+		self.assertFalse(RoadGraph.from_rows([[(1, 3), (1, 3)], [(0, 3)]]).symmetric)
+		self.assertFalse(RoadGraph.from_rows([[(1, 3), (2, 1)], [], [(0, 2)]]).symmetric)
+
+	def test_memory(self):
+		# a fully connected area of 1000 bins fits in 12 bytes per road
+		N = 1001
+		graph = RoadGraph.from_rows([[(j, 1) for j in xrange(N) if j != i] for i in xrange(N)])
+		self.assertEqual(graph.no_roads(), N * (N - 1))
+		self.assertTrue(graph.nbytes() <= 12 * graph.no_roads() + 8 * (N + 1))
+
+	def test_route_planner_graph(self):
+		random.seed(4)
+		N = 30
+		roadsLayout = random_layout(N, 0.3, 10)
+
+		# the planner finds the same paths from the list and from the graph
+		for shortest_paths in ['floyd_warshall', 'dijkstra', 'lazy', 'point']:
+			DijkstraRoutePlanner.SHORTEST_PATHS = shortest_paths
+			try:
+				from_list = DijkstraRoutePlanner(roadsLayout, N)
+				from_graph = DijkstraRoutePlanner(RoadGraph.from_layout(roadsLayout), N)
+				for source in xrange(N):
+					for target in xrange(N):
+						self.assertEqual(from_list._path(source, target), from_graph._path(source, target))
+			finally:
+				DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
@@ -0,0 +1,57 @@
+import unittest
+from cslp.simulation.route_planning.route_cache import RouteCache
+from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+
+class RouteCacheTest(unittest.TestCase):
+	"""Tests the CLOCK route cache"""
+
+	def test_eviction(self):
+		cache = RouteCache(3)
+		for key in xrange(3):
+			cache.put(key, [key])
+
+		# 0 and 2 are used again, so 1 is evicted
+		self.assertEqual(cache.get(0), [0])
+		self.assertEqual(cache.get(2), [2])
+		cache.put(3, [3])
+
+		self.assertEqual(len(cache), 3)
+		self.assertFalse(1 in cache)
+		self.assertEqual(cache.get(1), None)
+		self.assertEqual(cache.get(3), [3])
+
+		# the hand passed 0 since it was last used, so it goes next
+		cache.put(4, [4])
+		self.assertFalse(0 in cache)
+		self.assertTrue(2 in cache and 3 in cache and 4 in cache)
+
+		self.assertEqual(cache.counters(), { 'hits': 3, 'misses': 1, 'evictions': 2 })
+
+		# a cache without capacity keeps nothing
+		cache = RouteCache(0)
+		cache.put(0, [0])
+		self.assertEqual(cache.get(0), None)
+		self.assertEqual(len(cache), 0)
+
+	def test_route_planner_cache(self):
+		roads_layout = [
+			[{ 'index': 1, 'path_length': 1 }, { 'index': 2, 'path_length': 4 }],
+			[{ 'index': 2, 'path_length': 1 }],
+			[{ 'index': 0, 'path_length': 1 }]
+		]
+
+		DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_POINT
+		DijkstraRoutePlanner.CACHE_MAX_SIZE = 2
+		try:
+			planner = DijkstraRoutePlanner(roads_layout, 3)
+			for (source, target) in [(0, 2), (0, 2), (1, 0), (2, 1), (0, 2)]:
+				path = planner._path(source, target, flatten_route = True)
+				self.assertEqual(path[-1]['target'], target)
+
+			# the cache stays bounded, routes found again are hits
+			self.assertEqual(len(planner.path_cache), 2)
+			self.assertEqual(planner.path_cache.counters(), { 'hits': 2, 'misses': 3, 'evictions': 1 })
+			self.assertEqual(planner._path(0, 2, flatten_route = True)[0]['distance'], 2)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+			DijkstraRoutePlanner.CACHE_MAX_SIZE = 100000
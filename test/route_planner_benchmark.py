@@ -0,0 +1,110 @@
+#!/usr/bin/env python2.7
+# Compares the Dijkstra search cores of the route planner (Queue.PriorityQueue
+#	and heapq, over the map's `RoadGraph`) on random maps
+#	of increasing size, checking that both find the same paths. Then compares the
+#	priority algorithm sorting the paths to all remaining bins with the argmin over
+#	distance rows, for routes through every bin.
+#	Run from the project root: python2 test/route_planner_benchmark.py
+
+import os
+import sys
+import random
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+
+# (number of locations, fraction of all possible roads)
+MAPS = [(50, 0.1), (50, 1.0), (200, 0.05), (200, 1.0), (500, 0.02), (500, 0.5)]
+
+CORES = [
+	DijkstraRoutePlanner.SEARCH_CORE_PRIORITY_QUEUE,
+	DijkstraRoutePlanner.SEARCH_CORE_HEAPQ
+]
+
+PRIORITY_MAPS = [(100, 0.1), (300, 0.05), (500, 0.02)]
+
+PRIORITY_VERSIONS = ['_get_route_priority_paths', '_get_route_priority_vectorised']
+
+NO_QUERIES = 200
+"""Number of point to point searches per map and core"""
+
+SEED = 42
+
+def random_map(N, density):
+	# a ring keeps every location reachable
+	roads_layout = []
+	for i in xrange(N):
+		roads = [{ 'index': (i + 1) % N, 'path_length': random.randint(1, 10) }]
+		for j in xrange(N):
+			if j != i and j != (i + 1) % N and random.random() < density:
+				roads.append({ 'index': j, 'path_length': random.randint(1, 10) })
+		roads_layout.append(roads)
+
+	return roads_layout
+
+def benchmark(roads_layout, queries, core):
+	DijkstraRoutePlanner.SEARCH_CORE = core
+	DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_POINT
+	planner = DijkstraRoutePlanner(roads_layout, len(roads_layout))
+
+	start_time = timer()
+	results = [planner._search(source, target, len(roads_layout), roads_layout) for (source, target) in queries]
+
+	return timer() - start_time, results
+
+def priority_benchmark(roads_layout, version):
+	DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_DIJKSTRA
+	planner = DijkstraRoutePlanner(roads_layout, len(roads_layout))
+	bins = [{ 'idx': i } for i in xrange(1, len(roads_layout))]
+
+	start_time = timer()
+	route = getattr(planner, version)(bins, flatten_route = True)
+
+	return timer() - start_time, route
+
+if __name__ == '__main__':
+	random.seed(SEED)
+	print('{0:>6} {1:>8} {2:>8} {3:>20} {4:>12} {5:>9}'.format('nodes', 'density', 'roads', 'priority_queue (ms)',
+		'heapq (ms)', 'speedup'))
+
+	for (N, density) in MAPS:
+		roads_layout = random_map(N, density)
+		queries = [(random.randint(0, N - 1), random.randint(0, N - 1)) for i in xrange(NO_QUERIES)]
+
+		times = []
+		results = []
+		for core in CORES:
+			time, result = benchmark(roads_layout, queries, core)
+			times.append(time / NO_QUERIES * 1000)
+			results.append(result)
+
+		if results[0] != results[1]:
+			print('Search cores disagree on {0} nodes, density {1}'.format(N, density))
+
+		print('{0:>6} {1:>8} {2:>8} {3:>20.3f} {4:>12.3f} {5:>8.1f}x'.format(N, density,
+			sum([len(roads) for roads in roads_layout]), times[0], times[1], times[0] / times[1]))
+
+	print('')
+	print('{0:>6} {1:>8} {2:>16} {3:>16} {4:>9}'.format('bins', 'density', 'paths (ms)', 'vectorised (ms)',
+		'speedup'))
+
+	for (N, density) in PRIORITY_MAPS:
+		roads_layout = random_map(N, density)
+
+		times = []
+		routes = []
+		for version in PRIORITY_VERSIONS:
+			time, route = priority_benchmark(roads_layout, version)
+			times.append(time * 1000)
+			routes.append(route)
+
+		if routes[0] != routes[1]:
+			print('Priority versions disagree on {0} nodes, density {1}'.format(N, density))
+
+		print('{0:>6} {1:>8} {2:>16.3f} {3:>16.3f} {4:>8.1f}x'.format(N - 1, density, times[0], times[1],
+			times[0] / times[1]))
+
+	DijkstraRoutePlanner.SEARCH_CORE = DijkstraRoutePlanner.SEARCH_CORE_HEAPQ
+	DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
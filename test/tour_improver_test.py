@@ -0,0 +1,97 @@
+import unittest
+import random
+import itertools
+from timeit import default_timer as timer
+from cslp.simulation.route_planning.tour_improver import TourImprover
+from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+
+class TourImproverTest(unittest.TestCase):
+	"""Tests the 2-opt/Or-opt trip improvement"""
+
+	def _length(self, order, distances):
+		tour = [0] + order + [0]
+		return sum([distances[tour[k]][tour[k + 1]] for k in xrange(len(tour) - 1)])
+
+	def test_improve(self):
+		# locations on a line, visited out of order
+		positions = [0, 5, 1, 4, 2, 3]
+		distances = [[abs(a - b) for b in positions] for a in positions]
+
+		improver = TourImprover()
+		order = improver.improve(distances, timer() + 1)
+		self.assertEquals(self._length(order, distances), 10)
+		self.assertEquals(improver.counters()['length_saved'], 18 - 10)
+
+		random.seed(5)
+		for i in xrange(50):
+			n = random.randint(2, 8)
+			# one way roads, so reversing parts of the trip changes their length
+			distances = [[0 if a == b else random.randint(1, 20) for b in xrange(n + 1)] for a in xrange(n + 1)]
+
+			order = improver.improve(distances, timer() + 1)
+			self.assertEquals(sorted(order), range(1, n + 1))
+
+			# never longer, and no single 2-opt or Or-opt move would shorten it
+			length = self._length(order, distances)
+			self.assertTrue(length <= self._length(range(1, n + 1), distances))
+			for (a, b) in itertools.combinations(xrange(n + 1), 2):
+				self.assertTrue(self._length(order[:a] + order[a:b][::-1] + order[b:], distances) >= length)
+				for c in xrange(n + 1):
+					moved = order[:a] + order[b:]
+					if b - a <= TourImprover.OR_OPT_SEGMENT and c <= len(moved):
+						self.assertTrue(self._length(moved[:c] + order[a:b] + moved[c:], distances) >= length)
+
+		self.assertEquals(improver.counters()['trips'], 51)
+
+	def test_time_budget(self):
+		positions = [0, 5, 1, 4, 2, 3]
+		distances = [[abs(a - b) for b in positions] for a in positions]
+
+		# nothing is changed once the deadline has passed
+		improver = TourImprover()
+		self.assertEquals(improver.improve(distances, timer()), range(1, 6))
+		self.assertEquals(improver.counters()['length_saved'], 0)
+
+	def test_route_planner_improvement(self):
+		positions = [0, 5, 1, 4, 2, 3]
+		roadsLayout = [[{ 'index': j, 'path_length': abs(positions[i] - positions[j]) }
+			for j in xrange(6) if j != i] for i in xrange(6)]
+		bins = [{ 'idx': i, 'current_volume': 10 - i, 'current_weight': 1, 'has_exceeded_occupancy': True }
+			for i in xrange(1, 6)]
+
+		# the greedy algorithm visits the bins by index (their volume), the improved route goes along the line and back
+		DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_GREEDY
+		DijkstraRoutePlanner.IMPROVEMENT_BUDGET = 100
+		try:
+			planner = DijkstraRoutePlanner(roadsLayout, 6)
+			route = planner.get_route(bins, flatten_route = True)
+		finally:
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
+			DijkstraRoutePlanner.IMPROVEMENT_BUDGET = 0
+
+		self.assertEquals(sorted([step['target'] for step in route]), [0, 1, 2, 3, 4, 5])
+		self.assertEquals(route[-1]['target'], 0)
+		self.assertEquals(sum([step['distance'] for step in route]), 10)
+		self.assertEquals(planner.tour_improver.counters()['length_saved'], 8)
+
+		# once the budget is spent, no more distances are found for trips, and the time spent counts them
+		DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_GREEDY
+		DijkstraRoutePlanner.IMPROVEMENT_BUDGET = 1e-9
+		try:
+			planner = DijkstraRoutePlanner(roadsLayout, 6)
+			matrices = []
+			distance_matrix = planner._distance_matrix
+			def record_matrix(locations):
+				matrices.append(locations)
+				return distance_matrix(locations)
+			planner._distance_matrix = record_matrix
+
+			route = planner.get_route(bins, flatten_route = True)
+		finally:
+			DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
+			DijkstraRoutePlanner.IMPROVEMENT_BUDGET = 0
+
+		self.assertEquals([step['target'] for step in route], [1, 2, 3, 4, 5, 0])
+		self.assertEquals(matrices, [])
+		self.assertEquals(planner.tour_improver.counters()['trips'], 0)
+		self.assertTrue(planner.tour_improver.counters()['time_spent'] > 0)
@@ -0,0 +1,118 @@
+import unittest
+import random
+import shutil
+import tempfile
+import numpy as np
+from cslp.simulation.route_planning.triangular_distances import TriangularDistances
+from cslp.simulation.route_planning.dijkstra_route_planner import DijkstraRoutePlanner
+
+class TriangularDistancesTest(unittest.TestCase):
+	"""Tests the packed distances of symmetric areas"""
+
+	def _symmetric_layout(self, N, density):
+		roads = {}
+		for i in xrange(N):
+			for j in xrange(i + 1, N):
+				if random.random() < density:
+					roads[i, j] = roads[j, i] = random.randint(1, 9)
+		return [[{ 'index': j, 'path_length': roads[i, j] } for j in xrange(N) if (i, j) in roads] for i in xrange(N)]
+
+	def test_pack(self):
+		infinity = DijkstraRoutePlanner.INFINITY
+		distances = np.array([
+			[0, 3, 254],
+			[3, 0, infinity],
+			[254, infinity, 0]
+		])
+
+		# the smallest type that fits, keeping its largest value for unreachable locations
+		packed = TriangularDistances.pack(distances, infinity)
+		self.assertEqual(packed.packed.dtype, np.uint8)
+		self.assertEqual(packed.packed.tolist(), [0, 3, 254, 0, 255, 0])
+		self.assertEqual(TriangularDistances.size(3), 6)
+
+		distances[0, 2] = distances[2, 0] = 255
+		self.assertEqual(TriangularDistances.pack(distances, infinity).packed.dtype, np.uint16)
+		distances[0, 2] = distances[2, 0] = 100000
+		self.assertEqual(TriangularDistances.pack(distances, infinity).packed.dtype, np.uint32)
+		self.assertEqual(TriangularDistances.pack(distances / 2.0, infinity).packed.dtype, np.float64)
+
+		# it reads as the full matrix
+		packed = TriangularDistances.pack(distances, infinity)
+		self.assertEqual(packed.tolist(), distances.tolist())
+		self.assertEqual(packed[2].tolist(), distances[2].tolist())
+		self.assertEqual(packed[1, 2].item(), infinity)
+		self.assertEqual(packed[np.ix_([2, 0], [0, 1, 2])].tolist(), distances[np.ix_([2, 0], [0, 1, 2])].tolist())
+		self.assertEqual(packed.max(), infinity)
+
+	def test_route_planner_distances(self):
+		random.seed(8)
+		N = 30
+		roadsLayout = self._symmetric_layout(N, 0.15)
+
+		# the symmetric planner keeps the upper triangle, with the same paths as the full matrix
+		for shortest_paths in ['floyd_warshall', 'dijkstra']:
+			DijkstraRoutePlanner.SHORTEST_PATHS = shortest_paths
+			try:
+				planner = DijkstraRoutePlanner(roadsLayout, N)
+				self.assertTrue(isinstance(planner.distances, TriangularDistances))
+				self.assertTrue(planner.distances.nbytes <= TriangularDistances.size(N) * 2)
+
+				full = [planner._search_heapq(source, None, N)[0] for source in xrange(N)]
+				self.assertEqual(planner.distances.tolist(), full)
+				for source in xrange(N):
+					for target in xrange(N):
+						self.assertEqual(planner._path(source, target, flatten_route = True)[0]['distance'],
+							full[source][target])
+
+				# routes use the packed distances
+				bins = [{ 'idx': i, 'current_volume': i, 'current_weight': i,
+					'has_exceeded_occupancy': True } for i in xrange(1, N, 3)]
+				for algorithm in ['greedy', 'priority', 'savings']:
+					DijkstraRoutePlanner.ALGORITHM = algorithm
+					self.assertTrue(planner.get_route(bins))
+			finally:
+				DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+				DijkstraRoutePlanner.ALGORITHM = DijkstraRoutePlanner.ALGORITHM_DYNAMIC
+
+	def test_route_planner_cache(self):
+		random.seed(9)
+		N = 20
+		roadsLayout = self._symmetric_layout(N, 0.2)
+
+		DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_POINT
+		try:
+			planner = DijkstraRoutePlanner(roadsLayout, N)
+			for source in xrange(N):
+				for target in xrange(N):
+					path = planner._path(source, target)
+					self.assertEqual(path[-1]['target'], target)
+
+					# the distance back is as long, found in the cache from the path this way
+					back = planner._path(target, source, flatten_route = True)
+					self.assertEqual(back[0]['distance'], path[-1]['distance'])
+
+			# the nodes passed are only cached one way, as the path back may pass others when paths tie
+			self.assertEqual(len(planner.path_cache), N * N)
+			self.assertEqual(planner.path_cache.counters()['misses'], N * N)
+			self.assertEqual(planner.path_cache.counters()['hits'], N * N)
+		finally:
+			DijkstraRoutePlanner.SHORTEST_PATHS = DijkstraRoutePlanner.SHORTEST_PATHS_AUTO
+
+	def test_persistent_cache(self):
+		random.seed(10)
+		N = 10
+		roadsLayout = self._symmetric_layout(N, 0.3)
+
+		cache_dir = tempfile.mkdtemp()
+		DijkstraRoutePlanner.PERSISTENT_CACHE_DIR = cache_dir
+		try:
+			# the upper triangle is saved and loaded memory mapped
+			planner = DijkstraRoutePlanner(roadsLayout, N)
+			loaded_planner = DijkstraRoutePlanner(roadsLayout, N)
+			self.assertTrue(loaded_planner.persistent_cache_hit)
+			self.assertTrue(isinstance(loaded_planner.distances.packed, np.memmap))
+			self.assertEqual(loaded_planner.distances.tolist(), planner.distances.tolist())
+		finally:
+			DijkstraRoutePlanner.PERSISTENT_CACHE_DIR = None
+			shutil.rmtree(cache_dir)